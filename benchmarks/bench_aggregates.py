@@ -0,0 +1,79 @@
+import argparse
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+from hasaki_sentiment_analysis_aggregates import FeedbackAggregates
+from hasaki_sentiment_analysis_data import prepare_data_feedbacks, PRODUCT_ANALYSIS_FEEDBACK_COLUMNS
+
+# Cách đếm cũ của show_overview và show_feedback_count trên các dòng feedback được chọn
+def count_by_scan(data_feedbacks, product_ids):
+    product_feedbacks = data_feedbacks[data_feedbacks['ma_san_pham'].isin(product_ids)]
+    star_counts = product_feedbacks["so_sao"].value_counts().reindex([5, 4, 3, 2, 1], fill_value=0)
+    sentiment_counts = product_feedbacks["sentiment_label"].value_counts()
+    topic_counts = {label: product_feedbacks[product_feedbacks["sentiment_label"] == label]["topics"].value_counts() for label in ["positive", "negative"]}
+
+    months = pd.to_datetime(product_feedbacks['ngay_binh_luan'], format='%d/%m/%Y').dt.to_period('M')
+    monthly_counts = months.value_counts().sort_index()
+    monthly_counts = monthly_counts.reindex(pd.period_range(start=monthly_counts.index.min(), end=monthly_counts.index.max(), freq='M'), fill_value=0)
+
+    hours = pd.to_datetime(product_feedbacks['gio_binh_luan'].str.replace(' ', ''), format='%H:%M').dt.hour
+    hourly_counts = hours.value_counts().sort_index().reindex(range(24), fill_value=0)
+
+    return len(product_feedbacks), star_counts, sentiment_counts, topic_counts, monthly_counts, hourly_counts
+
+def same_counts(scan_result, summary):
+    total, star_counts, sentiment_counts, topic_counts, monthly_counts, hourly_counts = scan_result
+    return (total == summary["total"]
+            and star_counts.tolist() == summary["star_counts"].tolist()
+            and sentiment_counts.to_dict() == summary["sentiment_counts"].to_dict()
+            and all(counts.to_dict() == summary["topic_counts"].get(label, pd.Series(dtype=int)).to_dict() for label, counts in topic_counts.items())
+            and monthly_counts.index.equals(summary["monthly_counts"].index) and monthly_counts.tolist() == summary["monthly_counts"].tolist()
+            and hourly_counts.tolist() == summary["hourly_counts"].tolist())
+
+def median_seconds(function, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies)
+
+# So sánh value_counts trên feedback được chọn với cộng các dòng của bảng tổng hợp theo sản phẩm.
+# Cách cũ chạy trên dữ liệu chưa chuyển kiểu (ngày, giờ dạng chuỗi) như trước đây.
+# replicate nhân bản dữ liệu thật với mã sản phẩm mới để giả lập bộ dữ liệu lớn hơn
+def run_benchmark(replicate, repeat, seed=42):
+    data_feedbacks = prepare_data_feedbacks(compact=False)[PRODUCT_ANALYSIS_FEEDBACK_COLUMNS]
+    if replicate > 1:
+        offset = int(data_feedbacks['ma_san_pham'].max()) + 1
+        data_feedbacks = pd.concat([data_feedbacks.assign(ma_san_pham=data_feedbacks['ma_san_pham'] + i * offset) for i in range(replicate)], ignore_index=True)
+
+    start = time.perf_counter()
+    aggregates = FeedbackAggregates(data_feedbacks)
+    build_seconds = time.perf_counter() - start
+
+    product_ids = data_feedbacks['ma_san_pham'].unique()
+    rng = np.random.default_rng(seed)
+    print(f"Số feedback: {len(data_feedbacks):,}, số sản phẩm: {len(product_ids):,}, build bảng tổng hợp: {build_seconds:.2f} s")
+
+    mismatches = 0
+    for n_selected in [1, 50, len(product_ids) // 2, len(product_ids)]:
+        selected = rng.choice(product_ids, n_selected, replace=False)
+        matched = same_counts(count_by_scan(data_feedbacks, selected), aggregates.summarize(selected))
+        mismatches += not matched
+        scan_seconds = median_seconds(lambda: count_by_scan(data_feedbacks, selected), repeat)
+        summary_seconds = median_seconds(lambda: aggregates.summarize(selected), repeat)
+        print(f"{n_selected:,} sản phẩm: quét {scan_seconds * 1000:.2f} ms, bảng tổng hợp {summary_seconds * 1000:.2f} ms, kết quả giống nhau: {matched}")
+
+    return mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark bảng tổng hợp feedback theo sản phẩm")
+    parser.add_argument("--replicate", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    mismatches = run_benchmark(args.replicate, args.repeat)
+    raise SystemExit(1 if mismatches else 0)
@@ -0,0 +1,69 @@
+import argparse
+import time
+
+from hasaki_sentiment_analysis_boost_words import read_boost_words, build_boost_words_trie, apply_boost_words
+from benchmarks.synthetic import generate_reviews
+
+# Cách làm cũ của apply_boost_words, giữ lại để so sánh kết quả và tốc độ
+def is_existed_legacy(addded_words, word):
+    for x in addded_words:
+        if word in x:
+            return True
+    return False
+
+def apply_boost_words_legacy(text, boost_words):
+    parts = text.split()
+    added_words = []
+
+    for i in range(5, 0, -1):
+        for j in range(len(parts) - i + 1):
+            sub_text = ' '.join(parts[j:j+i])
+            if sub_text in boost_words and not is_existed_legacy(added_words, sub_text):
+                added_words.append(sub_text)
+
+    for word in added_words:
+        num_boost = word.count(' ')
+        text = text.replace(word, word.replace(" ", "_"))
+        for i in range(num_boost):
+            text = text + " " + word.replace(" ", "_")
+
+    return text
+
+def run_benchmark(n_reviews, n_legacy_reviews):
+    boost_words = read_boost_words()
+    reviews = generate_reviews(n_reviews, boost_words)
+
+    start = time.perf_counter()
+    boost_words_trie = build_boost_words_trie(boost_words)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = [apply_boost_words(review, boost_words_trie) for review in reviews]
+    trie_seconds = time.perf_counter() - start
+
+    # Cách làm cũ rất chậm nên chỉ chạy trên một phần corpus rồi ngoại suy
+    legacy_reviews = reviews[:n_legacy_reviews]
+    start = time.perf_counter()
+    legacy_results = [apply_boost_words_legacy(review, boost_words) for review in legacy_reviews]
+    legacy_seconds = time.perf_counter() - start
+
+    mismatches = sum(1 for legacy, result in zip(legacy_results, results) if legacy != result)
+    legacy_seconds_full = legacy_seconds * n_reviews / max(len(legacy_reviews), 1)
+
+    print(f"Số bình luận: {n_reviews:,} (so sánh với cách cũ trên {len(legacy_reviews):,} bình luận)")
+    print(f"Build trie: {build_seconds * 1000:.2f} ms")
+    print(f"Trie: {trie_seconds:.2f} s ({n_reviews / trie_seconds:,.0f} bình luận/s)")
+    print(f"Cách cũ (ngoại suy): {legacy_seconds_full:.2f} s ({len(legacy_reviews) / legacy_seconds:,.0f} bình luận/s)")
+    print(f"Tăng tốc: {legacy_seconds_full / trie_seconds:.1f}x")
+    print(f"Số kết quả khác cách cũ: {mismatches}")
+
+    return mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark apply_boost_words: trie so với cách duyệt n-gram cũ")
+    parser.add_argument("--n-reviews", type=int, default=1_000_000)
+    parser.add_argument("--n-legacy-reviews", type=int, default=50_000)
+    args = parser.parse_args()
+
+    mismatches = run_benchmark(args.n_reviews, args.n_legacy_reviews)
+    raise SystemExit(1 if mismatches else 0)
@@ -0,0 +1,45 @@
+import argparse
+import resource
+import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from hasaki_sentiment_analysis_aggregates import FeedbackAggregates
+from hasaki_sentiment_analysis_charts import chart_cache, make_chart_key
+from hasaki_sentiment_analysis_data import ProductRowIndex, feedbacks_data_version, load_prepared_feedbacks, PRODUCT_ANALYSIS_FEEDBACK_COLUMNS
+from hasaki_sentiment_analysis_visualization import analyze_and_visualize
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# Xem lần lượt các sản phẩm rồi xem lại: lần đầu phải vẽ, lần sau lấy ảnh từ cache.
+# Chạy ngoài streamlit (bare mode) nên các lệnh st.* không hiển thị gì, chỉ đo phần vẽ và render.
+# Mỗi lệnh st.* in cảnh báo "missing ScriptRunContext" ra stderr, chạy với 2>/dev/null để bỏ qua
+def run_benchmark(n_products, seed=42):
+
+    data_feedbacks = load_prepared_feedbacks(columns=PRODUCT_ANALYSIS_FEEDBACK_COLUMNS)
+    row_index = ProductRowIndex(data_feedbacks)
+    aggregates = FeedbackAggregates(data_feedbacks)
+    data_version = feedbacks_data_version()
+
+    # Chọn các sản phẩm nhiều feedback nhất để word cloud có dữ liệu
+    counts = row_index.counts().sort_values(ascending=False)
+    product_ids = counts.index[:n_products].tolist()
+    np.random.default_rng(seed).shuffle(product_ids)
+
+    for visit in ["lần đầu", "xem lại"]:
+        start = time.perf_counter()
+        for product_id in product_ids:
+            analyze_and_visualize(None, row_index.select([product_id]), aggregates.summarize([product_id]), make_chart_key([product_id], data_version))
+        seconds = time.perf_counter() - start
+        cache_stats = chart_cache.stats()
+        print(f"{visit}: {seconds / len(product_ids) * 1000:.1f} ms/sản phẩm, hit {cache_stats['hits']:,} / miss {cache_stats['misses']:,}, "
+              f"{cache_stats['entries']:,} ảnh ({cache_stats['bytes'] / 2**20:.1f} MB), figure đang mở: {len(plt.get_fignums())}, max RSS {max_rss_mb():.0f} MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cache ảnh biểu đồ")
+    parser.add_argument("--n-products", type=int, default=20)
+    args = parser.parse_args()
+
+    run_benchmark(args.n_products)
@@ -0,0 +1,79 @@
+import argparse
+import os
+import tempfile
+import time
+import warnings
+
+import pandas as pd
+
+from hasaki_sentiment_analysis_aggregates import FeedbackAggregates
+from hasaki_sentiment_analysis_boost_words import read_boost_words, build_boost_words_trie
+from hasaki_sentiment_analysis_data import prepare_data_feedbacks, FeedbackSegmentStore, ProductRowIndex, SegmentedRowIndex, FEEDBACKS_FILE, PRODUCT_ANALYSIS_FEEDBACK_COLUMNS
+from hasaki_sentiment_analysis_dataset import extend_feedback_aggregates, extend_feedback_row_index
+from hasaki_sentiment_analysis_ingestion import prepare_feedback_segment
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+# Bộ dữ liệu gốc lớn hơn: nhân bản file feedback thật với mã sản phẩm mới
+def write_corpus(folder, replicate):
+    data = pd.read_csv(FEEDBACKS_FILE)
+    offset = int(data['ma_san_pham'].max()) + 1
+    data = pd.concat([data.assign(ma_san_pham=data['ma_san_pham'] + i * offset) for i in range(replicate)], ignore_index=True)
+    corpus_file = os.path.join(folder, "corpus.csv")
+    data.to_csv(corpus_file, index=False)
+    return corpus_file, data
+
+# Lô bình luận mới của một ngày: lấy ngẫu nhiên từ dữ liệu gốc, chỉ giữ các cột thô
+def make_batch(data, n_reviews, seed=42):
+    return data.sample(n_reviews, random_state=seed, replace=n_reviews > len(data))[['noi_dung_binh_luan', 'ngay_binh_luan', 'gio_binh_luan', 'so_sao', 'ma_san_pham']]
+
+# So sánh cách cũ (ghi lại file CSV đầy đủ rồi build lại dữ liệu, chỉ mục và bảng đếm từ đầu)
+# với nạp lô mới thành segment và cập nhật chỉ mục, bảng đếm đã có. Gán nhãn lô mới là chung cho cả hai
+def run_benchmark(replicate, n_reviews):
+    warnings.simplefilter("ignore", FutureWarning)
+    boost_words_trie = build_boost_words_trie(read_boost_words())
+
+    with tempfile.TemporaryDirectory() as folder:
+        corpus_file, corpus = write_corpus(folder, replicate)
+        batch = make_batch(corpus, n_reviews)
+        base = prepare_data_feedbacks(corpus_file)[PRODUCT_ANALYSIS_FEEDBACK_COLUMNS]
+        row_index = SegmentedRowIndex([ProductRowIndex(base)])
+        aggregates = FeedbackAggregates(base)
+        print(f"Dữ liệu gốc: {len(base):,} bình luận, lô mới: {n_reviews:,} bình luận")
+
+        segment, label_seconds = timed(lambda: prepare_feedback_segment(batch, boost_words_trie, n_workers=1))
+        print(f"gán nhãn + boost words lô mới: {label_seconds * 1000:.0f} ms")
+
+        def full_rebuild():
+            labeled = segment.assign(ngay_binh_luan=segment['ngay_binh_luan'].dt.strftime('%d/%m/%Y'), gio_binh_luan=segment['gio_binh_luan'].astype(str) + ":00")
+            pd.concat([corpus, labeled.drop(columns=['normalized_text_with_boost_words'])], ignore_index=True).to_csv(corpus_file, index=False)
+            data = prepare_data_feedbacks(corpus_file)[PRODUCT_ANALYSIS_FEEDBACK_COLUMNS]
+            return ProductRowIndex(data), FeedbackAggregates(data)
+
+        (full_index, full_aggregates), full_seconds = timed(full_rebuild)
+        print(f"ghi lại CSV và build lại toàn bộ (cũ): {full_seconds * 1000:.0f} ms")
+
+        store = FeedbackSegmentStore(os.path.join(folder, "segments"))
+
+        def incremental():
+            store.append(segment, sources=["benchmark"])
+            frames = store.load(columns=PRODUCT_ANALYSIS_FEEDBACK_COLUMNS).frames
+            return extend_feedback_row_index(row_index, frames), extend_feedback_aggregates(aggregates, frames)
+
+        (new_index, new_aggregates), incremental_seconds = timed(incremental)
+        print(f"ghi segment và cập nhật chỉ mục, bảng đếm (mới): {incremental_seconds * 1000:.0f} ms ({full_seconds / incremental_seconds:.0f}x)")
+
+        same = (new_aggregates.summarize()["total"] == full_aggregates.summarize()["total"]
+                and new_index.counts().sort_index().equals(full_index.counts().sort_index()))
+        print(f"kết quả giống build lại toàn bộ: {same}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark nạp thêm bình luận mới")
+    parser.add_argument("--replicate", type=int, default=20, help="Nhân bản dữ liệu gốc để giả lập bộ dữ liệu lớn")
+    parser.add_argument("--n-reviews", type=int, default=1000, help="Số bình luận trong lô mới")
+    args = parser.parse_args()
+
+    run_benchmark(args.replicate, args.n_reviews)
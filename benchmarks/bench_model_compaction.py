@@ -0,0 +1,46 @@
+import argparse
+import time
+import warnings
+
+from hasaki_sentiment_analysis_model_compaction import read_validation_texts, compact_model, compact_vectorizer, used_feature_indices, count_mismatches, VALIDATION_FILE
+from hasaki_sentiment_analysis_registry import read_pickle, MODEL_FILE, VECTORIZER_FILE
+
+def best_seconds(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+# So sánh bước tfidf_transform và model_predict của predict_sentiment giữa cặp gốc và cặp rút gọn
+# trên các bình luận đã chuẩn hoá của file kiểm tra
+def run_benchmark(replicate, repeat):
+    warnings.simplefilter("ignore", FutureWarning)
+    texts = read_validation_texts(VALIDATION_FILE) * replicate
+    model = read_pickle(MODEL_FILE)
+    vectorizer = read_pickle(VECTORIZER_FILE)
+    feature_indices = used_feature_indices(model)
+    pairs = {
+        "gốc": (model, vectorizer),
+        "rút gọn": (compact_model(model, feature_indices), compact_vectorizer(vectorizer, feature_indices)),
+    }
+    print(f"{len(texts):,} bình luận, model dùng {len(feature_indices):,} / {len(vectorizer.vocabulary_):,} cột")
+
+    for name, (pair_model, pair_vectorizer) in pairs.items():
+        features = pair_vectorizer.transform(texts)
+        transform_seconds = best_seconds(lambda: pair_vectorizer.transform(texts), repeat)
+        predict_seconds = best_seconds(lambda: pair_model.predict(features), repeat)
+        features_kib = (features.data.nbytes + features.indices.nbytes + features.indptr.nbytes) / 1024
+        print(f"{name}: transform {transform_seconds * 1000:.0f} ms, predict {predict_seconds * 1000:.0f} ms, "
+              f"ma trận {features.shape[1]:,} cột, {features.nnz:,} giá trị khác 0 ({features_kib:.0f} KiB)")
+
+    print(f"số bình luận có kết quả khác: {count_mismatches(model, vectorizer, *pairs['rút gọn'], texts)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cặp vectorizer và model rút gọn")
+    parser.add_argument("--replicate", type=int, default=1, help="Nhân bản các bình luận kiểm tra")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    run_benchmark(args.replicate, args.repeat)
@@ -0,0 +1,51 @@
+import argparse
+import time
+
+from hasaki_sentiment_analysis_normalization import normalize_texts, NORMALIZATION_STAGES
+from hasaki_sentiment_analysis_prediction import normalize_text_manually
+from benchmarks.synthetic import generate_raw_comments
+
+# Kiểm tra normalize_texts cho kết quả giống normalize_text_manually và đo throughput từng bước
+def run_benchmark(n_comments, comments_file=None):
+    if comments_file:
+        with open(comments_file, 'r', encoding='utf-8') as file:
+            comments = [line.rstrip('\n') for line in file if line.strip()][:n_comments]
+    else:
+        comments = generate_raw_comments(n_comments)
+
+    # Gọi trước một lần để nạp underthesea và lexicon, không tính vào thời gian đo
+    normalize_texts(comments[:10])
+    normalize_text_manually(comments[0])
+
+    start = time.perf_counter()
+    expected = [normalize_text_manually(comment) for comment in comments]
+    manual_seconds = time.perf_counter() - start
+
+    stage_times = {}
+    start = time.perf_counter()
+    results = normalize_texts(comments, stage_times=stage_times)
+    batch_seconds = time.perf_counter() - start
+
+    mismatches = [(comment, result, expected_result) for comment, result, expected_result in zip(comments, results, expected) if result != expected_result]
+
+    print(f"Số bình luận: {len(comments):,}")
+    print(f"normalize_text_manually: {manual_seconds:.2f} s ({len(comments) / manual_seconds:,.0f} bình luận/s)")
+    print(f"normalize_texts: {batch_seconds:.2f} s ({len(comments) / batch_seconds:,.0f} bình luận/s, tăng tốc {manual_seconds / batch_seconds:.1f}x)")
+    for stage in NORMALIZATION_STAGES:
+        seconds = stage_times.get(stage, 0.0)
+        throughput = len(comments) / seconds if seconds else float("inf")
+        print(f"  {stage}: {seconds:.3f} s ({throughput:,.0f} bình luận/s)")
+    print(f"Số kết quả khác normalize_text_manually: {len(mismatches)}")
+    for comment, result, expected_result in mismatches[:5]:
+        print(f"  {comment!r}: {result!r} != {expected_result!r}")
+
+    return len(mismatches)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kiểm tra và benchmark chuẩn hoá văn bản theo batch")
+    parser.add_argument("--n-comments", type=int, default=20_000)
+    parser.add_argument("--comments-file", default=None, help="File văn bản, mỗi dòng một bình luận thật để kiểm tra")
+    args = parser.parse_args()
+
+    mismatches = run_benchmark(args.n_comments, args.comments_file)
+    raise SystemExit(1 if mismatches else 0)
@@ -0,0 +1,42 @@
+import argparse
+import os
+import time
+
+from hasaki_sentiment_analysis_prediction import preprocess_text, preprocess_texts, shutdown_preprocess_pool
+from benchmarks.synthetic import generate_raw_comments
+
+# So sánh vòng lặp tuần tự cũ với preprocess_texts ở nhiều số worker khác nhau
+def run_benchmark(n_comments, workers_list, chunk_size):
+    comments = generate_raw_comments(n_comments)
+
+    start = time.perf_counter()
+    expected = [preprocess_text(comment) for comment in comments]
+    serial_seconds = time.perf_counter() - start
+    print(f"Số bình luận: {n_comments:,}")
+    print(f"Vòng lặp tuần tự: {serial_seconds:.2f} s ({n_comments / serial_seconds:,.0f} bình luận/s)")
+
+    mismatches = 0
+    for n_workers in workers_list:
+        # Lần gọi đầu để khởi tạo pool, không tính vào thời gian đo
+        preprocess_texts(comments[:chunk_size * n_workers], n_workers=n_workers, chunk_size=chunk_size)
+
+        start = time.perf_counter()
+        results = preprocess_texts(comments, n_workers=n_workers, chunk_size=chunk_size)
+        seconds = time.perf_counter() - start
+
+        mismatches += sum(1 for result, expected_result in zip(results, expected) if result != expected_result)
+        print(f"{n_workers} worker: {seconds:.2f} s ({n_comments / seconds:,.0f} bình luận/s, tăng tốc {serial_seconds / seconds:.1f}x)")
+
+    shutdown_preprocess_pool()
+    print(f"Số kết quả khác vòng lặp tuần tự: {mismatches}")
+    return mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tiền xử lý song song so với vòng lặp tuần tự")
+    parser.add_argument("--n-comments", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, os.cpu_count() or 1])
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    mismatches = run_benchmark(args.n_comments, args.workers, args.chunk_size)
+    raise SystemExit(1 if mismatches else 0)
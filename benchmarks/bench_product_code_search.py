@@ -0,0 +1,64 @@
+import argparse
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+from hasaki_sentiment_analysis_search import ProductCodeIndex, SEARCH_TOP_K
+from benchmarks.synthetic import generate_products
+
+def time_calls(function, queries, repeat):
+    latencies = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            function(query)
+            latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies), max(latencies)
+
+# So sánh cách quét str.contains + parse int cũ với chỉ mục prefix/suffix trên mã sản phẩm giả lập
+def run_benchmark(n_products, repeat, seed=42):
+    data_products = pd.DataFrame(generate_products(n_products))
+    data_products['ma_san_pham_sl_danh_gia'] = data_products['ma_san_pham'].astype(str) + " (" + data_products['so_luong_danh_gia'].astype(str) + " đánh giá)"
+
+    # Từ khoá: prefix ngắn, chuỗi con ở giữa mã, mã đầy đủ và từ khoá không khớp
+    rng = np.random.default_rng(seed)
+    sample_codes = data_products['ma_san_pham'].astype(str).values[rng.integers(0, n_products, 4)]
+    queries = ["1", "12", "123", sample_codes[0][:5], sample_codes[1][3:7], sample_codes[2][-4:], sample_codes[3], "000000"]
+
+    start = time.perf_counter()
+    index = ProductCodeIndex(data_products['ma_san_pham'].values, data_products['so_luong_danh_gia'].values)
+    build_seconds = time.perf_counter() - start
+
+    def scan(query):
+        product = data_products[data_products['ma_san_pham_sl_danh_gia'].astype(str).str.contains(query, case=False)]
+        return [int(x.split(" ")[0]) for x in product['ma_san_pham_sl_danh_gia'].values]
+
+    def search_top_k(query):
+        rows = index.search(query, top_k=SEARCH_TOP_K)
+        return list(zip(data_products['ma_san_pham_sl_danh_gia'].values[rows], data_products['ma_san_pham'].values[rows]))
+
+    def search_all(query):
+        return data_products['ma_san_pham'].values[index.search(query)].tolist()
+
+    # Kiểm tra chỉ mục trả về đúng tập mã như khi quét (chỉ xét phần mã, không xét phần "đánh giá")
+    codes = data_products['ma_san_pham'].astype(str)
+    mismatches = [query for query in queries if set(search_all(query)) != set(data_products['ma_san_pham'][codes.str.contains(query, regex=False)])]
+
+    print(f"Số sản phẩm: {n_products:,}, build chỉ mục: {build_seconds:.2f} s")
+    for name, function in [("str.contains + int() (cũ)", scan), (f"chỉ mục top-{SEARCH_TOP_K}", search_top_k), ("chỉ mục tìm tất cả", search_all)]:
+        median_seconds, max_seconds = time_calls(function, queries, repeat)
+        print(f"{name}: trung vị {median_seconds * 1000:.3f} ms, lớn nhất {max_seconds * 1000:.3f} ms")
+    print(f"Số từ khoá cho kết quả khác cách quét: {len(mismatches)} {mismatches}")
+
+    return len(mismatches)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tìm kiếm mã sản phẩm")
+    parser.add_argument("--n-products", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    mismatches = run_benchmark(args.n_products, args.repeat)
+    raise SystemExit(1 if mismatches else 0)
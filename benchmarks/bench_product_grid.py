@@ -0,0 +1,70 @@
+import argparse
+import os
+import tempfile
+import time
+
+from PIL import Image
+from streamlit.testing.v1 import AppTest
+
+# Ảnh sản phẩm giả lập kích thước thật (~1000px) trong thư mục tạm, dùng làm nguồn ảnh local
+def write_product_images(folder, n_images):
+    for number in range(n_images):
+        image = Image.effect_noise((1000, 1000), 40 + number).convert("RGB")
+        image.save(os.path.join(folder, f"product_{number}.jpg"), quality=90)
+
+# Chạy trong AppTest nên phải tự import, không dùng biến bên ngoài hàm
+def render_products(n_products, image_folder, paginated):
+    import os
+    import pandas as pd
+    import streamlit as st
+    import hasaki_sentiment_analysis_ui as ui
+    from benchmarks.synthetic import generate_products
+    from hasaki_sentiment_analysis_thumbnails import LocalImageSource, thumbnail_cache
+
+    product_infos = pd.DataFrame(generate_products(n_products))
+    product_infos['hinh_san_pham'] = [f"https://hasaki.vn/images/product_{row % 50}.jpg" for row in range(n_products)]
+
+    if paginated:
+        thumbnail_cache.source = LocalImageSource(image_folder)
+        thumbnail_cache.folder = os.path.join(image_folder, "thumbnails")
+        ui.show_product_grid(product_infos, page_key="product_page")
+        return
+
+    # Cách cũ: mọi sản phẩm cùng lúc, ảnh gốc được đọc và thu nhỏ lại mỗi lần chạy
+    with st.container(height=600):
+        col1, col2 = st.columns(2)
+        for index_counter, product_info in enumerate(product_infos.itertuples()):
+            with col1 if index_counter % 2 == 0 else col2:
+                ui.show_product_card(product_info, os.path.join(image_folder, os.path.basename(product_info.hinh_san_pham)))
+
+def time_runs(n_products, image_folder, paginated, repeat):
+    app = AppTest.from_function(render_products, args=(n_products, image_folder, paginated), default_timeout=600)
+    start = time.perf_counter()
+    app.run()
+    first_seconds = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+
+    rerun_seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        app.run()
+        rerun_seconds.append(time.perf_counter() - start)
+    return first_seconds, min(rerun_seconds), len(app.get("imgs"))
+
+def run_benchmark(match_counts, repeat):
+    with tempfile.TemporaryDirectory() as image_folder:
+        write_product_images(image_folder, 50)
+        for n_products in match_counts:
+            for name, paginated in [("render tất cả (cũ)", False), ("lưới phân trang", True)]:
+                first_seconds, rerun_seconds, n_images = time_runs(n_products, image_folder, paginated, repeat)
+                print(f"{n_products:>6,} sản phẩm, {name}: lần đầu {first_seconds * 1000:.0f} ms, "
+                      f"rerun {rerun_seconds * 1000:.0f} ms, {n_images} ảnh")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark lưới sản phẩm")
+    parser.add_argument("--match-counts", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    run_benchmark(args.match_counts, args.repeat)
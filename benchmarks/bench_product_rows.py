@@ -0,0 +1,63 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from hasaki_sentiment_analysis_data import ProductRowIndex, load_prepared_feedbacks, read_snapshot, write_snapshot_atomic, PRODUCT_ANALYSIS_FEEDBACK_COLUMNS
+
+def median_seconds(function, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies)
+
+# So sánh lọc feedback bằng isin (cũ) với lấy khoảng dòng qua ProductRowIndex.
+# replicate nhân bản dữ liệu thật với mã sản phẩm mới để giả lập bộ dữ liệu lớn hơn, bản nhân
+# được ghi ra snapshot rồi đọc lại để có cùng bố cục (memory-map, nhiều record batch) như khi chạy thật
+def run_benchmark(replicate, repeat, seed=42):
+    data_feedbacks = load_prepared_feedbacks(columns=PRODUCT_ANALYSIS_FEEDBACK_COLUMNS)
+    if replicate > 1:
+        offset = int(data_feedbacks['ma_san_pham'].max()) + 1
+        data_feedbacks = data_feedbacks.astype({column: object for column, dtype in data_feedbacks.dtypes.items() if isinstance(dtype, pd.StringDtype)})
+        data_feedbacks = pd.concat([data_feedbacks.assign(ma_san_pham=data_feedbacks['ma_san_pham'] + i * offset) for i in range(replicate)], ignore_index=True)
+        snapshot_file = os.path.join(tempfile.mkdtemp(), "feedbacks.arrow")
+        write_snapshot_atomic(data_feedbacks, snapshot_file)
+        data_feedbacks = read_snapshot(snapshot_file)
+
+    start = time.perf_counter()
+    row_index = ProductRowIndex(data_feedbacks)
+    build_seconds = time.perf_counter() - start
+    data_feedbacks = row_index.data
+
+    product_ids = row_index.product_ids
+    rng = np.random.default_rng(seed)
+    print(f"Số feedback: {len(data_feedbacks):,}, số sản phẩm: {len(product_ids):,}, build chỉ mục: {build_seconds * 1000:.1f} ms")
+
+    mismatches = 0
+    for n_selected in [1, min(1000, len(product_ids))]:
+        selected = rng.choice(product_ids, n_selected, replace=False).tolist()
+        expected = data_feedbacks[data_feedbacks['ma_san_pham'].isin(selected)]
+        matched = row_index.select(selected).equals(expected)
+        mismatches += not matched
+
+        scan_seconds = median_seconds(lambda: data_feedbacks[data_feedbacks['ma_san_pham'].isin(selected)], repeat)
+        select_seconds = median_seconds(lambda: row_index.select(selected), repeat)
+        print(f"{n_selected:,} sản phẩm ({len(expected):,} feedback): isin {scan_seconds * 1000:.3f} ms, "
+              f"chỉ mục {select_seconds * 1000:.3f} ms (x{scan_seconds / select_seconds:.1f}), kết quả giống nhau: {matched}")
+
+    return mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark lấy feedback theo mã sản phẩm")
+    parser.add_argument("--replicate", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    mismatches = run_benchmark(args.replicate, args.repeat)
+    raise SystemExit(1 if mismatches else 0)
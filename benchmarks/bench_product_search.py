@@ -0,0 +1,55 @@
+import argparse
+import statistics
+import time
+
+import pandas as pd
+
+from hasaki_sentiment_analysis_search import ProductNameIndex, SEARCH_TOP_K
+from benchmarks.synthetic import generate_products
+
+QUERIES = ["k", "kem", "kem chong", "Kem Chống Nắng", "sữa rửa mặt cetaphil", "cocoon", "hoa hồng 50ml", "xyz"]
+
+def time_calls(function, queries, repeat):
+    latencies = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            function(query)
+            latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies), max(latencies)
+
+# So sánh cách quét str.contains cũ với chỉ mục trigram trên danh mục sản phẩm giả lập
+def run_benchmark(n_products, repeat):
+    data_products = pd.DataFrame(generate_products(n_products))
+    data_products['ten_san_pham_sl_danh_gia'] = data_products['ten_san_pham'] + " (" + data_products['so_luong_danh_gia'].astype(str) + " đánh giá)"
+
+    start = time.perf_counter()
+    index = ProductNameIndex(data_products['ten_san_pham'].tolist(), data_products['so_luong_danh_gia'].values)
+    build_seconds = time.perf_counter() - start
+
+    def scan(query):
+        return data_products[data_products['ten_san_pham_sl_danh_gia'].str.contains(query, case=False)]
+
+    def search_top_k(query):
+        rows = index.search(query, top_k=SEARCH_TOP_K)
+        return data_products['ten_san_pham_sl_danh_gia'].values[rows]
+
+    def search_all(query):
+        return data_products['ma_san_pham'].values[index.search(query)]
+
+    print(f"Số sản phẩm: {n_products:,}, build chỉ mục: {build_seconds:.2f} s")
+    for name, function in [("str.contains (cũ)", scan), (f"chỉ mục top-{SEARCH_TOP_K}", search_top_k), ("chỉ mục tìm tất cả", search_all)]:
+        median_seconds, max_seconds = time_calls(function, QUERIES, repeat)
+        print(f"{name}: trung vị {median_seconds * 1000:.3f} ms, lớn nhất {max_seconds * 1000:.3f} ms")
+
+    for query in QUERIES:
+        rows = index.search(query, top_k=5)
+        print(f"  {query!r}: {list(data_products['ten_san_pham'].values[rows][:3])}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tìm kiếm tên sản phẩm")
+    parser.add_argument("--n-products", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    run_benchmark(args.n_products, args.repeat)
@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+
+from benchmarks.synthetic import generate_raw_comments
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = min(int(round(percent / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+async def wait_until_ready(url, timeout=120):
+    client = AsyncHTTPClient()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.fetch(url + "/health")
+            return
+        except (ConnectionError, HTTPClientError, OSError):
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"Service tại {url} không sẵn sàng sau {timeout} s")
+
+# Gửi các request /predict đơn lẻ với số request đồng thời cố định, đo độ trễ từng request
+async def run_load(url, comments, concurrency):
+    client = AsyncHTTPClient(max_clients=concurrency)
+    latencies = []
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < len(comments):
+            comment = comments[next_index]
+            next_index += 1
+
+            start = time.perf_counter()
+            await client.fetch(url + "/predict", method="POST", body=json.dumps({"text": comment}))
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    health = json.loads((await client.fetch(url + "/health")).body)
+    return latencies, elapsed, health["batcher"]
+
+async def main(args):
+    server = None
+    url = args.url
+    if url is None:
+        port = args.port
+        url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen([
+            sys.executable, "hasaki_sentiment_analysis_service.py", "--port", str(port),
+            "--max-batch-size", str(args.max_batch_size), "--max-wait-ms", str(args.max_wait_ms),
+        ])
+
+    try:
+        await wait_until_ready(url)
+        comments = generate_raw_comments(args.n_requests, seed=args.seed)
+        latencies, elapsed, batcher_stats = await run_load(url, comments, args.concurrency)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(f"Số request: {len(latencies):,}, đồng thời: {args.concurrency}")
+    print(f"Throughput: {len(latencies) / elapsed:,.0f} request/s")
+    print(f"Độ trễ p50: {percentile(latencies, 50) * 1000:.1f} ms, p99: {percentile(latencies, 99) * 1000:.1f} ms, "
+          f"trung bình: {statistics.mean(latencies) * 1000:.1f} ms")
+    print(f"Micro-batch: {batcher_stats['num_batches']:,} batch, trung bình {batcher_stats['mean_batch_size']:.1f} bình luận/batch")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load generator cho sentiment service, đo p50/p99 và throughput")
+    parser.add_argument("--url", default=None, help="URL của service đang chạy; bỏ trống để tự khởi động service")
+    parser.add_argument("--port", type=int, default=8601)
+    parser.add_argument("--n-requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    # Dùng seed khác nhau giữa các lần chạy để không đo nhầm cache dự đoán
+    parser.add_argument("--seed", type=int, default=int(time.time()))
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
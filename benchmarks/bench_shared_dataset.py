@@ -0,0 +1,55 @@
+import argparse
+import threading
+import time
+import tracemalloc
+
+from hasaki_sentiment_analysis_registry import registry
+from hasaki_sentiment_analysis_dataset import load_data_feedbacks, load_data_products
+
+# Mỗi session cũ nhận một bản copy từ st.cache_data rồi giữ trong session_state
+def copied_session():
+    return load_data_products().copy(deep=True), load_data_feedbacks().copy(deep=True)
+
+def shared_session():
+    return load_data_products(), load_data_feedbacks()
+
+# Mở n session cùng lúc, đo thời gian và bộ nhớ Python được cấp phát thêm để giữ dữ liệu của các session
+def run_sessions(open_session, n_sessions):
+    sessions = []
+    barrier = threading.Barrier(n_sessions)
+
+    def worker():
+        barrier.wait()
+        sessions.append(open_session())
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(n_sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    allocated_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    distinct = len({id(products) for products, _ in sessions})
+    return seconds, allocated_bytes, distinct
+
+def run_benchmark(n_sessions):
+    # Lần nạp đầu tiên: mọi session cùng chờ một lần nạp duy nhất
+    seconds, _, distinct = run_sessions(shared_session, n_sessions)
+    print(f"{n_sessions} session mở cùng lúc (process mới): {seconds * 1000:.1f} ms, {distinct} bản dữ liệu")
+    for name, seconds in registry.load_times().items():
+        print(f"  nạp {name}: {seconds * 1000:.1f} ms")
+
+    for name, open_session in [("copy mỗi session (cũ)", copied_session), ("dùng chung read-only", shared_session)]:
+        seconds, allocated_bytes, distinct = run_sessions(open_session, n_sessions)
+        print(f"{name}: {seconds * 1000:.1f} ms, {allocated_bytes / 2**20:.1f} MB cấp phát thêm, {distinct} bản dữ liệu")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dữ liệu dùng chung giữa các session")
+    parser.add_argument("--n-sessions", type=int, default=32)
+    args = parser.parse_args()
+
+    run_benchmark(args.n_sessions)
@@ -0,0 +1,52 @@
+import argparse
+import time
+
+from wordcloud import WordCloud
+
+from hasaki_sentiment_analysis_aggregates import FeedbackAggregates
+from hasaki_sentiment_analysis_data import ProductRowIndex, load_prepared_feedbacks, PRODUCT_ANALYSIS_FEEDBACK_COLUMNS
+from hasaki_sentiment_analysis_registry import registry
+
+# Cách cũ: nối toàn bộ bình luận, WordCloud tách từ lại, lọc stopwords bằng list rồi tạo word cloud lần hai
+def word_cloud_by_text(product_feedbacks, label):
+    feedbacks = ' '.join(product_feedbacks[product_feedbacks['sentiment_label'] == label]['normalized_text_with_boost_words'].values)
+    wordcloud = WordCloud(width=800, height=400, background_color='white').generate(feedbacks)
+    vietnamese_stopwords_list = registry.get("vietnamese_stopwords_list")
+    filtered_words = {word: weight for word, weight in wordcloud.words_.items() if word not in vietnamese_stopwords_list}
+    return WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(filtered_words)
+
+# Cách mới: cộng bảng đếm từ theo sản phẩm rồi tạo word cloud một lần
+def word_cloud_by_frequencies(feedback_summary, label):
+    return WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(feedback_summary["word_frequencies"](label))
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+def run_benchmark(label):
+    data_feedbacks = load_prepared_feedbacks(columns=PRODUCT_ANALYSIS_FEEDBACK_COLUMNS)
+    row_index = ProductRowIndex(data_feedbacks)
+    aggregates, build_seconds = timed(lambda: FeedbackAggregates(data_feedbacks))
+    print(f"Số feedback: {len(data_feedbacks):,}, build bảng tổng hợp (gồm bảng đếm từ): {build_seconds:.2f} s")
+
+    counts = row_index.counts().sort_values(ascending=False)
+    for name, product_ids in [("sản phẩm nhiều feedback nhất", counts.index[:1].tolist()), ("tất cả sản phẩm", counts.index.tolist())]:
+        product_feedbacks = row_index.select(product_ids)
+        feedback_summary = aggregates.summarize(product_ids)
+
+        old_cloud, old_seconds = timed(lambda: word_cloud_by_text(product_feedbacks, label))
+        frequencies, frequency_seconds = timed(lambda: feedback_summary["word_frequencies"](label))
+        new_cloud, new_seconds = timed(lambda: word_cloud_by_frequencies(feedback_summary, label))
+
+        old_words = {word for (word, _), *_ in old_cloud.layout_}
+        new_words = {word for (word, _), *_ in new_cloud.layout_}
+        print(f"{name} ({len(product_feedbacks):,} feedback, {label}): cũ {old_seconds:.2f} s, mới {new_seconds:.2f} s "
+              f"(cộng bảng đếm {frequency_seconds * 1000:.1f} ms), {len(old_words & new_words)}/{len(old_words)} từ của word cloud cũ có trong word cloud mới")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tạo word cloud từ bảng đếm từ")
+    parser.add_argument("--label", default="positive")
+    args = parser.parse_args()
+
+    run_benchmark(args.label)
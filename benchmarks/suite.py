@@ -0,0 +1,350 @@
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from datetime import datetime
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_feedbacks, generate_products, generate_raw_comments, generate_reviews
+
+# Cách dùng baseline:
+#   python -m benchmarks.suite --save NAME            chạy và lưu kết quả vào benchmarks/baselines/NAME.json
+#   python -m benchmarks.suite --compare NAME --fail-on-regression
+# benchmarks/baselines/reference.json là baseline tham chiếu đi kèm repo, đo với --scale 1 --repeat 5
+# (máy và commit ghi trong mục "environment" của file). Số liệu chỉ so sánh được trên cùng một máy:
+# trên máy khác hãy --save một baseline riêng từ commit gốc rồi --compare với baseline đó
+BASELINE_FOLDER = "benchmarks/baselines/"
+# Mỗi mẫu chạy lặp hàm đủ lâu để đo được cả các hàm chỉ mất vài micro giây
+MIN_SAMPLE_SECONDS = 0.05
+# Chậm hơn baseline quá 10% (theo trung vị) thì báo là regression
+REGRESSION_THRESHOLD = 0.10
+PREDICTION_BATCH_SIZES = [1, 100, 1000]
+NAME_QUERIES = ["k", "kem", "kem chong", "Kem Chống Nắng", "sữa rửa mặt cetaphil", "cocoon", "hoa hồng 50ml", "xyz"]
+CODE_QUERIES = ["1", "10", "123", "4567", "99999", "123456789", "abc"]
+# Các biểu đồ mà analyze_and_visualize vẽ, theo tên dùng trong cache ảnh biểu đồ
+CHART_NAMES = ["star_counts", "sentiment_counts", "topic_counts_positive", "topic_counts_negative", "monthly_counts", "hourly_counts", "word_cloud_positive", "word_cloud_negative"]
+
+# Benchmark không chạy được trong môi trường hiện tại (ví dụ thiếu model)
+class SkipBenchmark(Exception):
+    pass
+
+# Dữ liệu giả lập dùng chung cho mọi benchmark, chỉ sinh phần nào benchmark cần đến.
+# Quy mô mặc định gần với dữ liệu thật (~10k sản phẩm, ~100k feedback), nhân thêm bằng --scale
+class SyntheticData:
+    def __init__(self, scale=1.0, seed=42):
+        self.scale = scale
+        self.seed = seed
+
+    @cached_property
+    def boost_words(self):
+        from hasaki_sentiment_analysis_boost_words import read_boost_words
+        return read_boost_words()
+
+    @cached_property
+    def raw_comments(self):
+        return generate_raw_comments(200, seed=self.seed)
+
+    @cached_property
+    def reviews(self):
+        return generate_reviews(200, self.boost_words, seed=self.seed)
+
+    # Thay dữ liệu sản phẩm và feedback trong registry bằng dữ liệu giả lập, các hàm của UI
+    # (tìm kiếm, get_product_info) và bảng tổng hợp dùng nguyên cách nạp như khi chạy thật
+    @cached_property
+    def installed(self):
+        from hasaki_sentiment_analysis_boost_words import apply_boost_words, build_boost_words_trie
+        from hasaki_sentiment_analysis_data import compact_feedbacks, FeedbackSegments, PRODUCT_ANALYSIS_FEEDBACK_COLUMNS, PRODUCT_ANALYSIS_PRODUCT_COLUMNS
+        from hasaki_sentiment_analysis_dataset import build_feedback_snapshot, read_only_frame
+        from hasaki_sentiment_analysis_registry import registry
+
+        products = pd.DataFrame(generate_products(int(10_000 * self.scale), seed=self.seed))[PRODUCT_ANALYSIS_PRODUCT_COLUMNS]
+        feedbacks = pd.DataFrame(generate_feedbacks(products['ma_san_pham'].tolist(), int(100_000 * self.scale), self.boost_words, seed=self.seed))
+
+        boost_words_trie = build_boost_words_trie(self.boost_words)
+        feedbacks['normalized_text_with_boost_words'] = feedbacks['normalized_text'].map(lambda text: apply_boost_words(text, boost_words_trie))
+        feedbacks = feedbacks.sort_values('ma_san_pham', kind='stable').reset_index(drop=True)
+        feedbacks = read_only_frame(compact_feedbacks(feedbacks)[PRODUCT_ANALYSIS_FEEDBACK_COLUMNS])
+
+        registry.register("data_feedbacks", lambda: feedbacks)
+        registry.register("base_data_products", lambda: products)
+        registry.register("base_feedbacks_data_version", lambda: f"synthetic-{self.scale}-{self.seed}")
+        registry.register("feedback_snapshot", lambda: build_feedback_snapshot(FeedbackSegments(None, [], [])))
+        return True
+
+    # Các sản phẩm nhiều feedback nhất, dùng cho get_product_info và biểu đồ
+    def top_product_ids(self, n_products):
+        from hasaki_sentiment_analysis_dataset import load_feedback_row_index
+        counts = load_feedback_row_index().counts().sort_values(ascending=False, kind='stable')
+        return counts.index[:n_products].tolist()
+
+BENCHMARKS = {}
+
+# Đăng ký một benchmark: setup(data) chuẩn bị dữ liệu và trả về hàm không tham số cần đo
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+@benchmark("normalize_text_manually[200 comments]")
+def setup_normalize_text_manually(data):
+    from hasaki_sentiment_analysis_prediction import normalize_text_manually
+    comments = data.raw_comments
+    return lambda: [normalize_text_manually(comment) for comment in comments]
+
+def setup_predict_sentiment(data, batch_size):
+    from hasaki_sentiment_analysis_registry import LABEL_ENCODER_FILE, MODEL_FILE, VECTORIZER_FILE
+    missing_files = [file for file in [MODEL_FILE, VECTORIZER_FILE, LABEL_ENCODER_FILE] if not os.path.exists(file)]
+    if missing_files:
+        raise SkipBenchmark(f"thiếu {', '.join(missing_files)}")
+
+    from hasaki_sentiment_analysis_prediction import predict_sentiment
+    comments = generate_raw_comments(batch_size, seed=data.seed)
+    return lambda: predict_sentiment(comments, use_cache=False)
+
+for batch_size in PREDICTION_BATCH_SIZES:
+    benchmark(f"predict_sentiment[batch={batch_size}]")(lambda data, batch_size=batch_size: setup_predict_sentiment(data, batch_size))
+
+@benchmark("apply_boost_words[200 reviews]")
+def setup_apply_boost_words(data):
+    from hasaki_sentiment_analysis_boost_words import apply_boost_words, build_boost_words_trie
+    boost_words_trie = build_boost_words_trie(data.boost_words)
+    reviews = data.reviews
+    return lambda: [apply_boost_words(review, boost_words_trie) for review in reviews]
+
+@benchmark(f"search_product_name[{len(NAME_QUERIES)} queries]")
+def setup_search_product_name(data):
+    from hasaki_sentiment_analysis_ui import search_product_name
+    data.installed
+    return lambda: [search_product_name(query) for query in NAME_QUERIES]
+
+@benchmark(f"search_product_code[{len(CODE_QUERIES)} queries]")
+def setup_search_product_code(data):
+    from hasaki_sentiment_analysis_ui import search_product_code
+    data.installed
+    return lambda: [search_product_code(query) for query in CODE_QUERIES]
+
+def setup_get_product_info(data, product_ids):
+    from hasaki_sentiment_analysis_ui import get_product_info
+    return lambda: get_product_info(product_ids)
+
+@benchmark("get_product_info[1 product]")
+def setup_get_product_info_single(data):
+    data.installed
+    return setup_get_product_info(data, data.top_product_ids(1))
+
+@benchmark("get_product_info[20 products]")
+def setup_get_product_info_group(data):
+    data.installed
+    return setup_get_product_info(data, data.top_product_ids(20))
+
+@benchmark("get_product_info[find all 'kem']")
+def setup_get_product_info_find_all(data):
+    from hasaki_sentiment_analysis_ui import find_product_ids_by_name
+    data.installed
+    return setup_get_product_info(data, find_product_ids_by_name("kem"))
+
+# Lấy hàm vẽ của từng biểu đồ bằng cách chạy analyze_and_visualize với show_chart chỉ ghi lại draw()
+def collect_chart_draws(feedback_summary):
+    import hasaki_sentiment_analysis_visualization as visualization
+
+    draws = {}
+    def record_chart(chart_name, chart_key, draw):
+        draws[chart_name] = draw
+        return True
+
+    show_chart = visualization.show_chart
+    visualization.show_chart = record_chart
+    try:
+        visualization.analyze_and_visualize(None, None, feedback_summary)
+    finally:
+        visualization.show_chart = show_chart
+    return draws
+
+# Vẽ và render một biểu đồ cho nhóm 20 sản phẩm nhiều feedback nhất, không qua cache ảnh
+def setup_chart(data, chart_name):
+    from hasaki_sentiment_analysis_charts import render_figure
+    from hasaki_sentiment_analysis_dataset import load_feedback_aggregates
+    data.installed
+
+    draw = collect_chart_draws(load_feedback_aggregates().summarize(data.top_product_ids(20))).get(chart_name)
+    if draw is None:
+        raise SkipBenchmark("không có dữ liệu để vẽ")
+    return lambda: render_figure(draw())
+
+for chart_name in CHART_NAMES:
+    benchmark(f"chart.{chart_name}")(lambda data, chart_name=chart_name: setup_chart(data, chart_name))
+
+# Đo hàm: chạy thử một lần, chọn số vòng lặp để mỗi mẫu đủ dài rồi lấy repeat mẫu (giây mỗi lần gọi)
+def measure(function, repeat, min_sample_seconds=MIN_SAMPLE_SECONDS):
+    function()
+
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_sample_seconds:
+            break
+        loops *= 10 if elapsed < min_sample_seconds / 10 else 2
+
+    samples = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        samples.append((time.perf_counter() - start) / loops)
+
+    quartiles = np.percentile(samples, [25, 75])
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "iqr": float(quartiles[1] - quartiles[0]),
+        "loops": loops,
+        "samples": samples,
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment_info(scale, repeat):
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "scale": scale,
+        "repeat": repeat,
+    }
+
+# Chạy ngoài streamlit nên mỗi lệnh st.* in cảnh báo "missing ScriptRunContext". Mức log được đặt
+# lại khi streamlit đọc config lần đầu nên phải đọc config trước khi hạ mức log.
+# sklearn cũng in FutureWarning mỗi lần model dự đoán
+def silence_warnings():
+    from streamlit import config, logger
+    config.get_option("logger.level")
+    logger.set_log_level("error")
+    warnings.filterwarnings("ignore", category=FutureWarning)
+
+def format_seconds(seconds):
+    for unit, factor in [("s", 1), ("ms", 1e-3), ("µs", 1e-6)]:
+        if seconds >= factor:
+            return f"{seconds / factor:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+def run_suite(names, scale, repeat):
+    silence_warnings()
+    data = SyntheticData(scale)
+    results = {}
+    skipped = {}
+
+    for name in names:
+        try:
+            function = BENCHMARKS[name](data)
+        except SkipBenchmark as reason:
+            skipped[name] = str(reason)
+            print(f"{name}: bỏ qua ({reason})")
+            continue
+
+        result = measure(function, repeat)
+        results[name] = result
+        print(f"{name}: {format_seconds(result['median'])} (min {format_seconds(result['min'])}, IQR {format_seconds(result['iqr'])}, {result['loops']} vòng/mẫu)")
+
+    return {"environment": environment_info(scale, repeat), "results": results, "skipped": skipped}
+
+def baseline_path(name):
+    return name if name.endswith(".json") else os.path.join(BASELINE_FOLDER, name + ".json")
+
+def save_report(report, file_path):
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+def load_report(file_path):
+    with open(file_path, encoding="utf-8") as file:
+        return json.load(file)
+
+# So sánh trung vị với baseline: chậm hơn quá threshold là regression, nhanh hơn quá threshold là cải thiện.
+# Chỉ tính khi khoảng các mẫu của hai lần chạy không chồng lên nhau, để nhiễu của máy không bị báo là regression.
+# Trả về danh sách benchmark bị regression
+def compare_reports(baseline, current, threshold=REGRESSION_THRESHOLD):
+    for key in ["scale", "machine", "cpu_count", "python"]:
+        if baseline["environment"].get(key) != current["environment"].get(key):
+            print(f"Lưu ý: {key} khác baseline ({baseline['environment'].get(key)} -> {current['environment'].get(key)}), kết quả có thể không so sánh được")
+
+    print(f"\nSo sánh với baseline (commit {baseline['environment'].get('commit')}, {baseline['environment'].get('date')}):")
+    rows = []
+    regressions = []
+    for name, result in current["results"].items():
+        baseline_result = baseline["results"].get(name)
+        if baseline_result is None:
+            rows.append((name, "-", format_seconds(result["median"]), "-", "mới"))
+            continue
+
+        ratio = result["median"] / baseline_result["median"]
+        if ratio > 1 + threshold and result["min"] > max(baseline_result["samples"]):
+            status = "REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / (1 + threshold) and max(result["samples"]) < baseline_result["min"]:
+            status = "nhanh hơn"
+        else:
+            status = "không đổi"
+        rows.append((name, format_seconds(baseline_result["median"]), format_seconds(result["median"]), f"{(ratio - 1) * 100:+.1f}%", status))
+
+    for name in baseline["results"]:
+        if name not in current["results"]:
+            rows.append((name, format_seconds(baseline["results"][name]["median"]), "-", "-", "không chạy"))
+
+    headers = ("benchmark", "baseline", "hiện tại", "thay đổi", "")
+    widths = [max(len(str(row[column])) for row in rows + [headers]) for column in range(len(headers))]
+    for row in [headers] + rows:
+        print("  ".join(str(value).ljust(width) for value, width in zip(row, widths)).rstrip())
+
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bộ micro-benchmark cho các đường xử lý chính, chạy trên dữ liệu giả lập")
+    parser.add_argument("--filter", help="regex chọn benchmark theo tên")
+    parser.add_argument("--list", action="store_true", help="liệt kê các benchmark")
+    parser.add_argument("--scale", type=float, default=1.0, help="nhân quy mô dữ liệu giả lập")
+    parser.add_argument("--repeat", type=int, default=5, help="số mẫu đo cho mỗi benchmark")
+    parser.add_argument("--save", metavar="NAME", help=f"lưu kết quả làm baseline vào {BASELINE_FOLDER}NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="so sánh với baseline đã lưu (tên hoặc đường dẫn .json)")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true", help="thoát với mã 1 nếu có regression")
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if args.filter is None or re.search(args.filter, name)]
+    if args.list:
+        print("\n".join(names))
+        sys.exit(0)
+
+    baseline = load_report(baseline_path(args.compare)) if args.compare else None
+    report = run_suite(names, args.scale, args.repeat)
+
+    if args.save:
+        save_report(report, baseline_path(args.save))
+        print(f"\nĐã lưu baseline: {baseline_path(args.save)}")
+
+    if baseline is not None:
+        regressions = compare_reports(baseline, report, args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
@@ -0,0 +1,87 @@
+import random
+
+# Các cụm từ thông dụng trong bình luận mỹ phẩm dùng để sinh dữ liệu giả lập
+FILLER_WORDS = [
+    "sản phẩm", "rất", "tốt", "mình", "dùng", "thấy", "da", "mùi", "thơm", "giao hàng",
+    "nhanh", "đóng gói", "kỹ", "sẽ", "ủng hộ", "tiếp", "không", "được", "hơi", "khô",
+    "dưỡng ẩm", "sữa rửa mặt", "kem", "chống nắng", "giá", "rẻ", "shop", "ok", "lắm", "nha",
+]
+
+# Các token "bẩn" thường gặp trong bình luận thô: teencode, tiếng Anh, số, dấu câu, emoji
+NOISY_WORDS = ["sp", "k", "ko", "mn", "hàng chuẩn", "good", "nice", "100%", "10/10", "!!!", "...", "❤", "👍", "😍"]
+
+# Sinh các bình luận giả lập đã chuẩn hoá, trộn từ thông dụng với các cụm boost words
+def generate_reviews(n_reviews, boost_words, boost_ratio=0.15, seed=42):
+    rng = random.Random(seed)
+    reviews = []
+
+    for _ in range(n_reviews):
+        num_phrases = rng.randint(3, 25)
+        phrases = [rng.choice(boost_words) if rng.random() < boost_ratio else rng.choice(FILLER_WORDS) for _ in range(num_phrases)]
+        reviews.append(' '.join(phrases))
+
+    return reviews
+
+# Sinh các bình luận thô giống dữ liệu người dùng tải lên, có chữ hoa, dấu câu và teencode
+def generate_raw_comments(n_comments, noise_ratio=0.2, seed=42):
+    rng = random.Random(seed)
+    comments = []
+
+    for _ in range(n_comments):
+        num_phrases = rng.randint(2, 30)
+        phrases = [rng.choice(NOISY_WORDS) if rng.random() < noise_ratio else rng.choice(FILLER_WORDS) for _ in range(num_phrases)]
+        comment = ' '.join(phrases)
+        comments.append(comment[:1].upper() + comment[1:] + rng.choice([".", "!", "", " ^^"]))
+
+    return comments
+
+PRODUCT_TYPES = ["Kem Chống Nắng", "Sữa Rửa Mặt", "Nước Tẩy Trang", "Serum", "Toner", "Mặt Nạ", "Son Kem", "Dầu Gội", "Sữa Tắm", "Kem Dưỡng Ẩm", "Xịt Khoáng", "Tẩy Tế Bào Chết"]
+PRODUCT_BRANDS = ["La Roche-Posay", "Cetaphil", "Bioderma", "Innisfree", "Cocoon", "Some By Mi", "Senka", "Hada Labo", "Klairs", "Vichy", "Eucerin", "Simple"]
+PRODUCT_DETAILS = ["Cho Da Dầu Mụn", "Cho Da Nhạy Cảm", "Dưỡng Ẩm", "Làm Sáng Da", "Kiềm Dầu", "Phục Hồi Da", "Không Mùi", "Hương Hoa Hồng"]
+
+# Sinh danh mục sản phẩm giả lập với mã sản phẩm 9 chữ số giống dữ liệu Hasaki
+def generate_products(n_products, seed=42):
+    rng = random.Random(seed)
+    product_ids = rng.sample(range(100_000_000, 999_999_999), n_products)
+    products = []
+
+    for product_id in product_ids:
+        name = f"{rng.choice(PRODUCT_TYPES)} {rng.choice(PRODUCT_BRANDS)} {rng.choice(PRODUCT_DETAILS)} {rng.choice([30, 50, 100, 200, 400])}ml"
+        products.append({
+            "ma_san_pham": product_id,
+            "ten_san_pham": name,
+            "gia_ban": rng.randint(50, 2000) * 1000,
+            "diem_trung_binh": round(rng.uniform(3, 5), 1),
+            "hinh_san_pham": "media/logo.jpg",
+            "link_san_pham": f"https://hasaki.vn/san-pham/{product_id}.html",
+            "so_luong_danh_gia": int(rng.paretovariate(1.2)) - 1,
+        })
+    return products
+
+SENTIMENT_TOPICS = {
+    "positive": ["No label", "good_fragrance", "good_body_impact", "good_pricing", "good_usage_experience"],
+    "negative": ["No label", "bad_fragrance", "bad_body_impact", "bad_pricing", "bad_usage_experience"],
+}
+
+# Sinh feedback giả lập cho danh sách mã sản phẩm theo định dạng của file feedback gốc
+# (ngày "dd/mm/yyyy", giờ "HH: MM"). Số feedback mỗi sản phẩm lệch theo phân phối Pareto như dữ liệu thật
+def generate_feedbacks(product_ids, n_feedbacks, boost_words, seed=42):
+    rng = random.Random(seed)
+    weights = [rng.paretovariate(1.2) for _ in product_ids]
+    feedback_product_ids = rng.choices(product_ids, weights=weights, k=n_feedbacks)
+    reviews = generate_reviews(n_feedbacks, boost_words, seed=seed)
+    feedbacks = []
+
+    for product_id, review in zip(feedback_product_ids, reviews):
+        stars = rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 2, 4, 12])[0]
+        label = "positive" if stars >= 4 else "negative"
+        feedbacks.append({
+            "ma_san_pham": product_id,
+            "ngay_binh_luan": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2019, 2024)}",
+            "gio_binh_luan": f"{rng.randint(0, 23):02d}: {rng.randint(0, 59):02d}",
+            "so_sao": stars,
+            "sentiment_label": label,
+            "topics": rng.choice(SENTIMENT_TOPICS[label]),
+            "normalized_text": review,
+        })
+    return feedbacks
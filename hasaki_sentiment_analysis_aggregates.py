@@ -0,0 +1,303 @@
+import copy
+import functools
+import re
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from wordcloud import STOPWORDS
+
+from hasaki_sentiment_analysis_data import compact_feedbacks
+from hasaki_sentiment_analysis_registry import registry
+
+# Thứ tự các cột số sao trên biểu đồ (5 sao trước)
+STAR_VALUES = [5, 4, 3, 2, 1]
+HOURS = list(range(24))
+AGGREGATE_COLUMNS = ['ma_san_pham', 'ngay_binh_luan', 'gio_binh_luan', 'so_sao', 'sentiment_label', 'topics']
+WORD_CLOUD_TEXT_COLUMN = 'normalized_text_with_boost_words'
+
+# Tách từ, stopwords tiếng Anh, ngưỡng collocation và số từ tối đa giống giá trị mặc định của WordCloud
+WORD_CLOUD_TOKEN_PATTERN = re.compile(r"\w[\w']*")
+WORD_CLOUD_STOPWORDS = {word.lower() for word in STOPWORDS}
+WORD_CLOUD_COLLOCATION_THRESHOLD = 30
+WORD_CLOUD_MAX_WORDS = 200
+
+# Đếm số feedback theo (sản phẩm, nhóm) bằng một lần bincount, bỏ qua các dòng có nhóm không hợp lệ (-1)
+def count_matrix(product_codes, category_codes, n_products, n_categories):
+    valid = category_codes >= 0
+    flat_codes = product_codes[valid] * n_categories + category_codes[valid]
+    counts = np.bincount(flat_codes, minlength=n_products * n_categories)
+    return counts.reshape(n_products, n_categories).astype(np.int32)
+
+# Sắp xếp giảm dần theo số lượng và bỏ các nhóm bằng 0, giống value_counts
+def to_value_counts(counts, labels):
+    order = np.argsort(-counts, kind='stable')
+    order = order[counts[order] > 0]
+    return pd.Series(counts[order], index=pd.Index(np.asarray(labels, dtype=object)[order]), name='count')
+
+# Tách từ như WordCloud.process_text: bỏ đuôi 's và các token toàn chữ số
+def tokenize_for_word_cloud(text):
+    words = [word[:-2] if word.lower().endswith("'s") else word for word in WORD_CLOUD_TOKEN_PATTERN.findall(text)]
+    return [word for word in words if not word.isdigit()]
+
+# log-likelihood của Dunning, giống wordcloud.tokenization.l nhưng tính trên mảng
+def _log_likelihood(k, n, x):
+    return np.log(np.maximum(x, 1e-10)) * k + np.log(np.maximum(1 - x, 1e-10)) * (n - k)
+
+# Điểm collocation của các bigram, giống wordcloud.tokenization.score nhưng tính trên mảng
+def collocation_scores(bigram_counts, counts1, counts2, n_words):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = counts2 / n_words
+        p1 = bigram_counts / counts1
+        p2 = (counts2 - bigram_counts) / (n_words - counts1)
+        scores = -2 * (_log_likelihood(bigram_counts, counts1, p) + _log_likelihood(counts2 - bigram_counts, n_words - counts1, p)
+                       - _log_likelihood(bigram_counts, counts1, p1) - _log_likelihood(counts2 - bigram_counts, n_words - counts1, p2))
+    # Một từ chiếm toàn bộ văn bản thì không tính collocation
+    return np.where((n_words <= counts1) | (n_words <= counts2), 0, scores)
+
+# Bảng đếm từ đơn và cặp từ liền nhau cho word cloud theo từng (sản phẩm, nhãn), build một lần khi nạp dữ liệu
+# (đã bỏ stopwords tiếng Anh như WordCloud). Word cloud của một nhóm sản phẩm chỉ cần cộng các dòng
+# của ma trận thưa rồi chọn collocation trên số đếm đã cộng như WordCloud.process_text
+# và gọi generate_from_frequencies một lần, không phải nối và tách từ lại toàn bộ bình luận
+class WordCloudFrequencies:
+    def __init__(self, row_codes, texts, n_rows):
+        vocabulary = {}
+        bigram_vocabulary = {}
+        unigram_rows, unigram_columns = [], []
+        bigram_rows, bigram_columns = [], []
+
+        for row_code, text in zip(row_codes, texts):
+            if row_code < 0 or not isinstance(text, str):
+                continue
+            words = tokenize_for_word_cloud(text)
+            is_stopword = [word.lower() in WORD_CLOUD_STOPWORDS for word in words]
+
+            for word, stopword in zip(words, is_stopword):
+                if not stopword:
+                    unigram_rows.append(row_code)
+                    unigram_columns.append(vocabulary.setdefault(word, len(vocabulary)))
+
+            # Cặp từ được tạo trước khi bỏ stopwords và không chứa stopword nào, giống WordCloud
+            for position in range(len(words) - 1):
+                if not is_stopword[position] and not is_stopword[position + 1]:
+                    bigram = (vocabulary[words[position]], vocabulary[words[position + 1]])
+                    bigram_rows.append(row_code)
+                    bigram_columns.append(bigram_vocabulary.setdefault(bigram, len(bigram_vocabulary)))
+
+        words = np.array(list(vocabulary), dtype=object)
+        bigram_words = np.array(list(bigram_vocabulary), dtype=np.int64).reshape(-1, 2)
+        self._set_counts(words, bigram_words,
+                         self._count_matrix(unigram_rows, unigram_columns, n_rows, len(words)),
+                         self._count_matrix(bigram_rows, bigram_columns, n_rows, len(bigram_words)))
+
+    def _set_counts(self, words, bigram_words, unigram_counts, bigram_counts):
+        self.words = words
+        self.bigram_words = bigram_words
+        self.unigram_counts = unigram_counts
+        self.bigram_counts = bigram_counts
+
+        # Stopwords tiếng Việt được lọc sau khi lấy các từ nhiều nhất như trước đây (danh sách có cả cụm hai từ), tra sẵn cho mọi từ
+        vietnamese_stopwords = registry.get("vietnamese_stopwords_set")
+        self.bigram_texts = np.array([self.words[first] + " " + self.words[second] for first, second in self.bigram_words], dtype=object)
+        self.is_vietnamese_stopword = np.array([word in vietnamese_stopwords for word in self.words], dtype=bool)
+        self.is_vietnamese_stopword_bigram = np.array([bigram in vietnamese_stopwords for bigram in self.bigram_texts], dtype=bool)
+
+    @staticmethod
+    def _count_matrix(rows, columns, n_rows, n_columns):
+        data = np.ones(len(rows), dtype=np.int32)
+        return sparse.csr_matrix((data, (np.asarray(rows, dtype=np.int64), np.asarray(columns, dtype=np.int64))), shape=(n_rows, n_columns))
+
+    # Đổi chỉ số dòng và cột của ma trận đếm sang bảng đã gộp, các ô trùng nhau được cộng lại
+    @staticmethod
+    def _remap_counts(counts, row_map, column_map, shape):
+        counts = counts.tocoo()
+        return sparse.csr_matrix((counts.data, (row_map[counts.row], column_map[counts.col])), shape=shape)
+
+    # Gộp bảng đếm từ của hai phần dữ liệu: từ và cặp từ của other được thêm vào cuối từ điển,
+    # row_map và other_row_map là vị trí dòng của mỗi phần trong bảng đã gộp (n_rows dòng)
+    def combine(self, other, row_map, other_row_map, n_rows):
+        vocabulary = {word: position for position, word in enumerate(self.words.tolist())}
+        other_word_map = np.array([vocabulary.setdefault(word, len(vocabulary)) for word in other.words.tolist()], dtype=np.int64)
+
+        bigram_vocabulary = {bigram: position for position, bigram in enumerate(map(tuple, self.bigram_words.tolist()))}
+        other_bigram_map = np.array([bigram_vocabulary.setdefault(bigram, len(bigram_vocabulary))
+                                     for bigram in map(tuple, other_word_map[other.bigram_words].tolist())], dtype=np.int64)
+
+        words = np.array(list(vocabulary), dtype=object)
+        bigram_words = np.array(list(bigram_vocabulary), dtype=np.int64).reshape(-1, 2)
+        unigram_shape, bigram_shape = (n_rows, len(words)), (n_rows, len(bigram_words))
+
+        combined = WordCloudFrequencies.__new__(WordCloudFrequencies)
+        combined._set_counts(
+            words, bigram_words,
+            self._remap_counts(self.unigram_counts, row_map, np.arange(len(self.words)), unigram_shape)
+            + self._remap_counts(other.unigram_counts, other_row_map, other_word_map, unigram_shape),
+            self._remap_counts(self.bigram_counts, row_map, np.arange(len(self.bigram_words)), bigram_shape)
+            + self._remap_counts(other.bigram_counts, other_row_map, other_bigram_map, bigram_shape),
+        )
+        return combined
+
+    # Tần suất từ cho word cloud của các dòng được chọn: dict {từ hoặc cụm hai từ: số lần}
+    def frequencies(self, rows, max_words=WORD_CLOUD_MAX_WORDS):
+        unigram_counts = np.asarray(self.unigram_counts[rows].sum(axis=0)).ravel().astype(np.int64)
+        bigram_counts = np.asarray(self.bigram_counts[rows].sum(axis=0)).ravel().astype(np.int64)
+        original_counts = unigram_counts.copy()
+
+        # Cặp từ có điểm collocation vượt ngưỡng được giữ như một từ và trừ khỏi số đếm của từng từ đơn
+        bigram_ids = np.flatnonzero(bigram_counts)
+        first_words, second_words = self.bigram_words[bigram_ids, 0], self.bigram_words[bigram_ids, 1]
+        scores = collocation_scores(bigram_counts[bigram_ids], original_counts[first_words], original_counts[second_words], unigram_counts.sum())
+        collocations = bigram_ids[scores > WORD_CLOUD_COLLOCATION_THRESHOLD]
+        np.subtract.at(unigram_counts, self.bigram_words[collocations, 0], bigram_counts[collocations])
+        np.subtract.at(unigram_counts, self.bigram_words[collocations, 1], bigram_counts[collocations])
+
+        words = np.concatenate([self.words, self.bigram_texts[collocations]])
+        counts = np.concatenate([unigram_counts, bigram_counts[collocations]])
+        is_vietnamese_stopword = np.concatenate([self.is_vietnamese_stopword, self.is_vietnamese_stopword_bigram[collocations]])
+        keep = counts > 0
+        words, counts, is_vietnamese_stopword = words[keep], counts[keep], is_vietnamese_stopword[keep]
+
+        # Lấy max_words từ nhiều nhất trước rồi mới bỏ stopwords tiếng Việt, đúng thứ tự của word cloud cũ
+        # (words_ của WordCloud rồi lọc VIETNAMESE_STOPWORDS_LIST), nên word cloud có thể ít hơn max_words từ
+        top = np.argsort(-counts, kind='stable')[:max_words]
+        top = top[~is_vietnamese_stopword[top]]
+        return dict(zip(words[top].tolist(), counts[top].tolist()))
+
+# Bảng đếm feedback theo từng sản phẩm (số sao, sentiment, topic theo sentiment, tháng, giờ),
+# build một lần khi nạp dữ liệu. Biểu đồ cho một nhóm sản phẩm bất kỳ chỉ cần cộng các dòng
+# của những sản phẩm đó: O(số sản phẩm được chọn x số nhóm) thay vì quét lại toàn bộ feedback
+class FeedbackAggregates:
+    def __init__(self, data_feedbacks):
+        texts = data_feedbacks[WORD_CLOUD_TEXT_COLUMN].to_numpy(dtype=object) if WORD_CLOUD_TEXT_COLUMN in data_feedbacks else None
+        # Dữ liệu nạp qua load_prepared_feedbacks đã có kiểu gọn, compact_feedbacks không chuyển lại
+        data_feedbacks = compact_feedbacks(data_feedbacks[AGGREGATE_COLUMNS])
+
+        self.product_ids, product_codes = np.unique(data_feedbacks['ma_san_pham'].to_numpy(), return_inverse=True)
+        n_products = len(self.product_ids)
+        self.total_counts = np.bincount(product_codes, minlength=n_products).astype(np.int32)
+
+        stars = data_feedbacks['so_sao'].to_numpy().astype(np.int64)
+        star_codes = np.where(np.isin(stars, STAR_VALUES), 5 - stars, -1)
+        self.star_counts = count_matrix(product_codes, star_codes, n_products, len(STAR_VALUES))
+
+        # Mã category là -1 với giá trị thiếu, giống value_counts bỏ qua NaN
+        label_codes = data_feedbacks['sentiment_label'].cat.codes.to_numpy().astype(np.int64)
+        topic_codes = data_feedbacks['topics'].cat.codes.to_numpy().astype(np.int64)
+        self.sentiment_labels = data_feedbacks['sentiment_label'].cat.categories
+        self.topics = data_feedbacks['topics'].cat.categories
+        self.sentiment_counts = count_matrix(product_codes, label_codes, n_products, len(self.sentiment_labels))
+        label_topic_codes = np.where((label_codes >= 0) & (topic_codes >= 0), label_codes * len(self.topics) + topic_codes, -1)
+        self.sentiment_topic_counts = count_matrix(product_codes, label_topic_codes, n_products, len(self.sentiment_labels) * len(self.topics))
+
+        # Tháng được đánh số liên tục từ tháng sớm nhất của toàn bộ dữ liệu
+        dates = data_feedbacks['ngay_binh_luan']
+        month_numbers = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype=float)
+        valid_months = ~np.isnan(month_numbers)
+        self.first_month = int(month_numbers[valid_months].min()) if valid_months.any() else 0
+        n_months = int(month_numbers[valid_months].max()) - self.first_month + 1 if valid_months.any() else 0
+        month_codes = np.where(valid_months, np.nan_to_num(month_numbers) - self.first_month, -1).astype(np.int64)
+        self.month_counts = count_matrix(product_codes, month_codes, n_products, n_months)
+
+        hours = data_feedbacks['gio_binh_luan'].to_numpy().astype(np.int64)
+        hour_codes = np.where((hours >= 0) & (hours < len(HOURS)), hours, -1)
+        self.hour_counts = count_matrix(product_codes, hour_codes, n_products, len(HOURS))
+
+        # Mỗi dòng của bảng đếm từ là một cặp (sản phẩm, nhãn sentiment)
+        self.word_frequencies = None
+        if texts is not None:
+            word_row_codes = np.where(label_codes >= 0, product_codes * len(self.sentiment_labels) + label_codes, -1)
+            self.word_frequencies = WordCloudFrequencies(word_row_codes, texts, n_products * len(self.sentiment_labels))
+
+    # Gộp bảng đếm của hai phần dữ liệu (vd. dữ liệu gốc và các segment feedback nạp thêm) mà không quét lại
+    # feedback: mã sản phẩm, nhãn, topic và tháng được hợp lại rồi cộng các ma trận đếm vào đúng vị trí
+    def combine(self, other):
+        combined = copy.copy(self)
+        combined.product_ids = np.union1d(self.product_ids, other.product_ids)
+        combined.sentiment_labels = self.sentiment_labels.union(other.sentiment_labels)
+        combined.topics = self.topics.union(other.topics)
+        n_products, n_labels, n_topics = len(combined.product_ids), len(combined.sentiment_labels), len(combined.topics)
+
+        parts = [self, other]
+        month_parts = [part for part in parts if part.month_counts.shape[1]]
+        combined.first_month = min([part.first_month for part in month_parts], default=0)
+        n_months = max([part.first_month + part.month_counts.shape[1] for part in month_parts], default=combined.first_month) - combined.first_month
+
+        combined.total_counts = np.zeros(n_products, dtype=np.int32)
+        combined.star_counts = np.zeros((n_products, len(STAR_VALUES)), dtype=np.int32)
+        combined.sentiment_counts = np.zeros((n_products, n_labels), dtype=np.int32)
+        sentiment_topic_counts = np.zeros((n_products, n_labels, n_topics), dtype=np.int32)
+        combined.month_counts = np.zeros((n_products, n_months), dtype=np.int32)
+        combined.hour_counts = np.zeros((n_products, len(HOURS)), dtype=np.int32)
+
+        word_row_maps = []
+        for part in parts:
+            rows = np.searchsorted(combined.product_ids, part.product_ids)
+            labels = combined.sentiment_labels.get_indexer(part.sentiment_labels)
+            topics = combined.topics.get_indexer(part.topics)
+            months = np.arange(part.month_counts.shape[1]) + part.first_month - combined.first_month
+
+            combined.total_counts[rows] += part.total_counts
+            combined.star_counts[rows] += part.star_counts
+            combined.sentiment_counts[np.ix_(rows, labels)] += part.sentiment_counts
+            sentiment_topic_counts[np.ix_(rows, labels, topics)] += part.sentiment_topic_counts.reshape(len(rows), len(labels), len(topics))
+            combined.month_counts[np.ix_(rows, months)] += part.month_counts
+            combined.hour_counts[rows] += part.hour_counts
+            word_row_maps.append((rows[:, None] * n_labels + labels[None, :]).ravel())
+
+        combined.sentiment_topic_counts = sentiment_topic_counts.reshape(n_products, n_labels * n_topics)
+
+        combined.word_frequencies = None
+        if self.word_frequencies is not None and other.word_frequencies is not None:
+            combined.word_frequencies = self.word_frequencies.combine(other.word_frequencies, word_row_maps[0], word_row_maps[1], n_products * n_labels)
+        return combined
+
+    # Vị trí dòng của các sản phẩm có feedback, bỏ qua mã không có trong dữ liệu. None là tất cả sản phẩm
+    def product_rows(self, product_ids=None):
+        if product_ids is None:
+            return slice(None)
+        product_ids = np.unique(np.asarray(list(product_ids), dtype=self.product_ids.dtype))
+        if len(self.product_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.product_ids, product_ids), len(self.product_ids) - 1)
+        return rows[self.product_ids[rows] == product_ids]
+
+    # Tổng hợp số liệu cho các biểu đồ của một nhóm sản phẩm, kết quả có cùng dạng với value_counts cũ
+    def summarize(self, product_ids=None):
+        rows = self.product_rows(product_ids)
+
+        star_counts = pd.Series(self.star_counts[rows].sum(axis=0), index=STAR_VALUES, name='count')
+        sentiment_counts = to_value_counts(self.sentiment_counts[rows].sum(axis=0), self.sentiment_labels)
+
+        sentiment_topic_counts = self.sentiment_topic_counts[rows].sum(axis=0).reshape(len(self.sentiment_labels), len(self.topics))
+        topic_counts = {label: to_value_counts(sentiment_topic_counts[code], self.topics) for code, label in enumerate(self.sentiment_labels)}
+
+        # Chỉ hiển thị từ tháng đầu tiên đến tháng cuối cùng có feedback của nhóm sản phẩm, tháng trống là 0
+        month_counts = self.month_counts[rows].sum(axis=0)
+        nonzero_months = np.flatnonzero(month_counts)
+        if len(nonzero_months):
+            first, last = nonzero_months[0], nonzero_months[-1]
+            start_period = pd.Period(year=(self.first_month + first) // 12, month=(self.first_month + first) % 12 + 1, freq='M')
+            monthly_counts = pd.Series(month_counts[first:last + 1], index=pd.period_range(start=start_period, periods=last - first + 1, freq='M'), name='count')
+        else:
+            monthly_counts = pd.Series([], index=pd.PeriodIndex([], freq='M'), dtype=np.int64, name='count')
+
+        hourly_counts = pd.Series(self.hour_counts[rows].sum(axis=0), index=HOURS, name='count')
+
+        return {
+            "total": int(self.total_counts[rows].sum()),
+            "star_counts": star_counts,
+            "sentiment_counts": sentiment_counts,
+            "topic_counts": topic_counts,
+            "monthly_counts": monthly_counts,
+            "hourly_counts": hourly_counts,
+            # Chỉ tính khi thật sự vẽ word cloud (không có sẵn ảnh trong cache): word_frequencies(label)
+            "word_frequencies": functools.partial(self.word_cloud_frequencies, rows),
+        }
+
+    # Tần suất từ cho word cloud của nhãn sentiment trên các dòng sản phẩm, {} nếu không có dữ liệu
+    def word_cloud_frequencies(self, rows, label):
+        if self.word_frequencies is None or label not in self.sentiment_labels:
+            return {}
+        code = self.sentiment_labels.get_loc(label)
+        product_rows = np.arange(len(self.product_ids))[rows]
+        return self.word_frequencies.frequencies(product_rows * len(self.sentiment_labels) + code)
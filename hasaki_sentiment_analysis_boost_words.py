@@ -0,0 +1,67 @@
+BOOST_WORDS_FILE = "data/tools/boost_words.txt"
+
+# Độ dài tối đa (số từ) của một cụm boost word được so khớp
+MAX_BOOST_WORDS_LENGTH = 5
+
+# Khoá đánh dấu node kết thúc một cụm boost word trong trie (token luôn là chuỗi nên không trùng)
+_END_OF_BOOST_WORD = None
+
+def read_boost_words(file_path=BOOST_WORDS_FILE):
+    with open(file_path, 'r', encoding='utf-8') as file:
+        boost_words = [line.strip() for line in file]
+    return boost_words
+
+# Xây trie theo từng token cho danh sách boost words, chỉ cần build một lần
+def build_boost_words_trie(boost_words):
+    boost_words_trie = {}
+
+    for boost_word in boost_words:
+        tokens = boost_word.split(' ')
+        # Cụm dài hơn 5 từ hoặc có token rỗng không bao giờ khớp với ' '.join(parts[j:j+i])
+        if len(tokens) > MAX_BOOST_WORDS_LENGTH or '' in tokens:
+            continue
+
+        node = boost_words_trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node[_END_OF_BOOST_WORD] = boost_word
+
+    return boost_words_trie
+
+# Tìm các boost words xuất hiện trong câu bằng một lượt duyệt trie,
+# trả về theo đúng thứ tự cách làm cũ: cụm dài trước, cùng độ dài thì cụm xuất hiện trước
+def find_boost_words(parts, boost_words_trie):
+    found_words = {}
+    num_parts = len(parts)
+
+    for j in range(num_parts):
+        node = boost_words_trie
+        for k in range(j, min(j + MAX_BOOST_WORDS_LENGTH, num_parts)):
+            node = node.get(parts[k])
+            if node is None:
+                break
+
+            word = node.get(_END_OF_BOOST_WORD)
+            if word is not None and word not in found_words:
+                found_words[word] = (j - k - 1, j)
+
+    return sorted(found_words, key=found_words.get)
+
+def apply_boost_words(text, boost_words_trie):
+    found_words = find_boost_words(text.split(), boost_words_trie)
+    if not found_words:
+        return text
+
+    # Bỏ các cụm là chuỗi con của cụm đã chọn trước đó (giữ nguyên kết quả như is_existed cũ)
+    added_words = []
+    for word in found_words:
+        if not any(word in added_word for added_word in added_words):
+            added_words.append(word)
+
+    for word in added_words:
+        num_boost = word.count(' ')
+        boosted_word = word.replace(" ", "_")
+        text = text.replace(word, boosted_word)
+        text = text + (" " + boosted_word) * num_boost
+
+    return text
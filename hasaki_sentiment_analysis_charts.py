@@ -0,0 +1,111 @@
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from hasaki_sentiment_analysis_metrics import metrics
+
+# Dung lượng tối đa (MB) của cache ảnh biểu đồ trong mỗi process, đặt HASAKI_CHART_CACHE_MB=0 để tắt cache
+CHART_CACHE_MAX_BYTES = int(float(os.environ.get("HASAKI_CHART_CACHE_MB", 64)) * 2**20)
+# Định dạng ảnh biểu đồ: png hoặc svg
+CHART_IMAGE_FORMAT = os.environ.get("HASAKI_CHART_FORMAT", "png")
+# Streamlit thu nhỏ và encode lại mọi ảnh rộng hơn 1460px mỗi lần hiển thị (st.pyplot lưu với dpi=200
+# nên luôn bị), figure 10 inch ở dpi 120 đủ nét mà vẫn nằm dưới giới hạn này kể cả khi có legend bên ngoài
+CHART_DPI = 120
+
+# Lưu figure thành bytes rồi luôn đóng figure để pyplot không giữ lại figure cũ trong bộ nhớ
+def render_figure(fig, image_format=CHART_IMAGE_FORMAT):
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=image_format, dpi=CHART_DPI, bbox_inches='tight')
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+# Khoá của một nhóm sản phẩm: hash của tập mã sản phẩm đã sắp xếp (không phụ thuộc thứ tự chọn)
+# kèm version dữ liệu, để biểu đồ cũ không được dùng lại khi dữ liệu thay đổi
+def make_chart_key(product_ids, data_version):
+    product_ids = np.unique(np.asarray(list(product_ids), dtype=np.int64))
+    return (data_version, hashlib.sha1(product_ids.tobytes()).hexdigest())
+
+# Cache LRU trong bộ nhớ cho ảnh biểu đồ đã render, giới hạn theo tổng số bytes.
+# Xem lại một sản phẩm đã xem thì không tốn thời gian matplotlib
+class ChartCache:
+    def __init__(self, max_bytes=CHART_CACHE_MAX_BYTES, image_format=CHART_IMAGE_FORMAT):
+        self.max_bytes = max_bytes
+        self.image_format = image_format
+        self.hits = 0
+        self.misses = 0
+        self.render_seconds = 0.0
+        self._images = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    # Trả về ảnh của biểu đồ theo khoá, nếu chưa có thì gọi draw() để vẽ figure rồi render.
+    # draw() trả về None khi không có gì để vẽ, kết quả None cũng không được lưu cache
+    def get_or_render(self, key, draw):
+        if key is not None:
+            with self._lock:
+                image = self._images.get(key)
+                if image is not None:
+                    self._images.move_to_end(key)
+                    self.hits += 1
+                    return image
+                self.misses += 1
+
+        start = time.perf_counter()
+        fig = draw()
+        if fig is None:
+            return None
+        image = render_figure(fig, self.image_format)
+        with self._lock:
+            self.render_seconds += time.perf_counter() - start
+
+        if key is not None and len(image) <= self.max_bytes:
+            self._put(key, image)
+        return image
+
+    def _put(self, key, image):
+        with self._lock:
+            old_image = self._images.pop(key, None)
+            if old_image is not None:
+                self._total_bytes -= len(old_image)
+            self._images[key] = image
+            self._total_bytes += len(image)
+
+            while self._total_bytes > self.max_bytes:
+                _, evicted_image = self._images.popitem(last=False)
+                self._total_bytes -= len(evicted_image)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._images),
+                "bytes": self._total_bytes,
+                "render_seconds": self.render_seconds,
+                "open_figures": len(plt.get_fignums()),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self._total_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.render_seconds = 0.0
+
+chart_cache = ChartCache()
+
+metrics.callback("hasaki_chart_cache_lookups_total", "Số lần tra cache ảnh biểu đồ", "counter",
+                 lambda: {("hit",): chart_cache.hits, ("miss",): chart_cache.misses}, ["result"])
+metrics.callback("hasaki_chart_cache_bytes", "Dung lượng ảnh trong cache biểu đồ", "gauge", lambda: {(): chart_cache.stats()["bytes"]})
+metrics.callback("hasaki_open_figures", "Số figure matplotlib đang mở", "gauge", lambda: {(): len(plt.get_fignums())})
@@ -0,0 +1,184 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from hasaki_sentiment_analysis_prediction import predict_sentiment, shutdown_preprocess_pool, PREPROCESS_WORKERS
+
+FEEDBACK_COLUMN = "noi_dung_binh_luan"
+SENTIMENT_COLUMN = "sentiment"
+DEFAULT_CHUNK_SIZE = 10_000
+CHECKPOINT_FILE = "_checkpoint.json"
+SUPPORTED_FORMATS = ("csv", "parquet", "jsonl")
+
+def detect_format(input_file):
+    extension = os.path.splitext(input_file)[1].lower().lstrip(".")
+    # File .json thường là một mảng JSON, không đọc được theo từng chunk như JSON Lines
+    if extension == "json":
+        raise ValueError(f"Không hỗ trợ file JSON thường: {input_file}, hãy chuyển sang JSON Lines (.jsonl), mỗi dòng một bình luận")
+    if extension not in SUPPORTED_FORMATS:
+        raise ValueError(f"Không hỗ trợ định dạng file: {input_file}")
+    return extension
+
+# Đọc file đầu vào theo từng chunk để bộ nhớ không phụ thuộc kích thước file
+def iter_input_chunks(input_file, chunk_size):
+    input_format = detect_format(input_file)
+
+    if input_format == "csv":
+        yield from pd.read_csv(input_file, chunksize=chunk_size)
+    elif input_format == "parquet":
+        parquet_file = pq.ParquetFile(input_file)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_json(input_file, lines=True, chunksize=chunk_size)
+
+# Thêm cột sentiment cho một chunk, các dòng không có nội dung bình luận để trống
+def score_chunk(data, column=FEEDBACK_COLUMN, n_workers=None, use_cache=True):
+    if column not in data.columns:
+        raise KeyError(f"File đầu vào không có cột {column}")
+
+    feedbacks = data[column]
+    has_feedback = feedbacks.notna() & feedbacks.astype(str).str.strip().ne("")
+
+    data = data.copy()
+    # Kiểu string cố định để chunk không có bình luận nào cũng có cùng schema, các shard parquet đọc chung được
+    data[SENTIMENT_COLUMN] = pd.Series(pd.NA, index=data.index, dtype="string")
+    if has_feedback.any():
+        result = predict_sentiment(feedbacks[has_feedback].astype(str).tolist(), n_workers=n_workers, use_cache=use_cache)
+        data.loc[has_feedback, SENTIMENT_COLUMN] = result["sentiment"].values
+    return data
+
+# Ghi ra file tạm rồi đổi tên: shard đã tồn tại nghĩa là đã được ghi đầy đủ
+def write_shard(data, shard_file, output_format):
+    temp_file = shard_file + ".tmp"
+    if output_format == "parquet":
+        data.to_parquet(temp_file, index=False)
+    else:
+        data.to_csv(temp_file, index=False)
+    os.replace(temp_file, shard_file)
+
+def write_json_atomic(content, file_path):
+    temp_file = file_path + ".tmp"
+    with open(temp_file, "w", encoding="utf-8") as file:
+        json.dump(content, file, ensure_ascii=False, indent=2)
+    os.replace(temp_file, file_path)
+
+# Các thông tin xác định một lần chạy, checkpoint chỉ được dùng lại khi các thông tin này không đổi
+def make_job_signature(input_file, column, chunk_size, output_format):
+    stat = os.stat(input_file)
+    return {
+        "input": os.path.abspath(input_file),
+        "input_size": stat.st_size,
+        "input_mtime": stat.st_mtime,
+        "column": column,
+        "chunk_size": chunk_size,
+        "output_format": output_format,
+    }
+
+# Chạy lại từ đầu thì xoá các shard cũ để không lẫn với kết quả mới
+def remove_shards(shard_folder):
+    for file_name in os.listdir(shard_folder):
+        if file_name.startswith("part-"):
+            os.remove(os.path.join(shard_folder, file_name))
+
+def load_checkpoint(checkpoint_file, signature, restart=False):
+    if restart or not os.path.exists(checkpoint_file):
+        remove_shards(os.path.dirname(checkpoint_file))
+        return {"signature": signature, "completed_chunks": [], "num_rows": 0, "done": False}
+
+    with open(checkpoint_file, "r", encoding="utf-8") as file:
+        checkpoint = json.load(file)
+
+    if checkpoint.get("signature") != signature:
+        raise RuntimeError(
+            f"Checkpoint {checkpoint_file} thuộc về một lần chạy khác (file đầu vào hoặc tham số đã thay đổi), "
+            "dùng --restart để chạy lại từ đầu"
+        )
+    return checkpoint
+
+# Thư mục shard của một file đầu vào. Giữ cả phần mở rộng để in.csv và in.parquet không ghi đè shard của nhau,
+# thêm hash của đường dẫn tuyệt đối để a/reviews.csv và b/reviews.csv không dùng chung shard và checkpoint
+def make_shard_folder(output_dir, input_file):
+    path_hash = hashlib.sha256(os.path.abspath(input_file).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(output_dir, f"{os.path.basename(input_file)}-{path_hash}")
+
+# Phân tích một file: mỗi chunk ghi ra một shard riêng và cập nhật checkpoint ngay sau đó,
+# nên khi job bị dừng giữa chừng, lần chạy sau sẽ bỏ qua các chunk đã xong
+def score_file(input_file, output_dir, column=FEEDBACK_COLUMN, chunk_size=DEFAULT_CHUNK_SIZE,
+               n_workers=None, output_format="csv", restart=False, use_cache=True):
+    shard_folder = make_shard_folder(output_dir, input_file)
+    os.makedirs(shard_folder, exist_ok=True)
+
+    checkpoint_file = os.path.join(shard_folder, CHECKPOINT_FILE)
+    signature = make_job_signature(input_file, column, chunk_size, output_format)
+    checkpoint = load_checkpoint(checkpoint_file, signature, restart=restart)
+
+    if checkpoint["done"]:
+        print(f"{input_file}: đã phân tích xong trước đó ({checkpoint['num_rows']:,} dòng), bỏ qua")
+        return checkpoint
+
+    completed_chunks = set(checkpoint["completed_chunks"])
+    start = time.perf_counter()
+
+    for chunk_index, data in enumerate(iter_input_chunks(input_file, chunk_size)):
+        if chunk_index in completed_chunks:
+            continue
+
+        result = score_chunk(data, column=column, n_workers=n_workers, use_cache=use_cache)
+        shard_file = os.path.join(shard_folder, f"part-{chunk_index:05d}.{output_format}")
+        write_shard(result, shard_file, output_format)
+
+        completed_chunks.add(chunk_index)
+        checkpoint["completed_chunks"] = sorted(completed_chunks)
+        checkpoint["num_rows"] += len(result)
+        write_json_atomic(checkpoint, checkpoint_file)
+
+        elapsed = time.perf_counter() - start
+        print(f"{input_file}: chunk {chunk_index} xong, tổng {checkpoint['num_rows']:,} dòng ({elapsed:.1f} s)")
+
+    checkpoint["done"] = True
+    write_json_atomic(checkpoint, checkpoint_file)
+    return checkpoint
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Phân tích sentiment cho các file bình luận (csv, parquet, jsonl) không cần giao diện")
+    parser.add_argument("inputs", nargs="+", help="Các file bình luận cần phân tích")
+    parser.add_argument("--output-dir", required=True, help="Thư mục ghi các shard kết quả và checkpoint")
+    parser.add_argument("--column", default=FEEDBACK_COLUMN, help="Tên cột chứa nội dung bình luận")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Số dòng trong mỗi shard")
+    parser.add_argument("--workers", type=int, default=PREPROCESS_WORKERS, help="Số process dùng để tiền xử lý")
+    parser.add_argument("--output-format", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--restart", action="store_true", help="Bỏ qua checkpoint cũ và chạy lại từ đầu")
+    parser.add_argument("--no-cache", action="store_true", help="Không dùng cache kết quả dự đoán")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    try:
+        for input_file in args.inputs:
+            score_file(
+                input_file,
+                args.output_dir,
+                column=args.column,
+                chunk_size=args.chunk_size,
+                n_workers=args.workers,
+                output_format=args.output_format,
+                restart=args.restart,
+                use_cache=not args.no_cache,
+            )
+    except (ValueError, KeyError, RuntimeError, OSError) as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    finally:
+        shutdown_preprocess_pool()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,428 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from hasaki_sentiment_analysis_boost_words import BOOST_WORDS_FILE, read_boost_words, build_boost_words_trie, apply_boost_words
+
+FEEDBACKS_FILE = "data/Danh_gia_with_label.csv"
+PRODUCTS_FILE = "data/san_pham_processed.csv"
+
+# Thư mục lưu snapshot dạng cột (Arrow IPC) của dữ liệu sản phẩm và feedback đã xử lý
+CACHE_FOLDER = "data/cache/"
+SNAPSHOT_EXTENSION = ".arrow"
+# Định dạng snapshot cũ (parquet), không còn được đọc nên bị xoá hết
+LEGACY_SNAPSHOT_EXTENSIONS = (".parquet",)
+FEEDBACKS_CACHE_PREFIX = "feedbacks_"
+PRODUCTS_CACHE_PREFIX = "products_"
+# Thư mục lưu các segment feedback được nạp thêm sau file CSV gốc (xem hasaki_sentiment_analysis_ingestion)
+SEGMENTS_FOLDER = "data/segments/"
+SEGMENT_MANIFEST_FILE = "manifest.json"
+SEGMENT_LOCK_FILE = "writer.lock"
+SEGMENT_PREFIX = "segment_"
+# Tăng khi cách build snapshot thay đổi để các snapshot cũ được build lại
+SNAPSHOT_VERSION = "3"
+# Số thế hệ cache được giữ lại, các bản cũ hơn sẽ bị xoá
+CACHE_GENERATIONS_TO_KEEP = 2
+
+# Các cột mà trang "Phân tích sản phẩm" thực sự dùng
+PRODUCT_ANALYSIS_PRODUCT_COLUMNS = ['ma_san_pham', 'ten_san_pham', 'gia_ban', 'diem_trung_binh', 'hinh_san_pham', 'link_san_pham']
+PRODUCT_ANALYSIS_FEEDBACK_COLUMNS = ['ma_san_pham', 'ngay_binh_luan', 'gio_binh_luan', 'so_sao', 'sentiment_label', 'topics', 'normalized_text_with_boost_words']
+
+# Tính hash theo nội dung của các file đầu vào, đọc theo từng khối để không tốn bộ nhớ
+def hash_files(file_paths, block_size=1 << 20, salt=""):
+    sha256 = hashlib.sha256(salt.encode('utf-8'))
+    for file_path in file_paths:
+        sha256.update(os.path.basename(file_path).encode('utf-8'))
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(block_size), b''):
+                sha256.update(block)
+    return sha256.hexdigest()[:16]
+
+# Chuyển các cột dùng cho biểu đồ sang kiểu gọn một lần khi nạp dữ liệu, các bước vẽ không phải parse lại:
+# ngày -> datetime64, giờ bình luận ("09: 28") -> giờ int8, số sao -> int8, nhãn và topic -> category.
+# Giờ hoặc số sao không đọc được là -1 và 0. Gọi lại trên dữ liệu đã chuyển kiểu thì không đổi gì
+def compact_feedbacks(data):
+    data = data.copy()
+
+    if not pd.api.types.is_datetime64_any_dtype(data['ngay_binh_luan']):
+        data['ngay_binh_luan'] = pd.to_datetime(data['ngay_binh_luan'], format='%d/%m/%Y', errors='coerce')
+
+    if not pd.api.types.is_integer_dtype(data['gio_binh_luan']):
+        hours = pd.to_datetime(data['gio_binh_luan'].astype(str).str.replace(' ', ''), format='%H:%M', errors='coerce').dt.hour
+        data['gio_binh_luan'] = hours.fillna(-1).astype(np.int8)
+
+    data['so_sao'] = pd.to_numeric(data['so_sao'], errors='coerce').fillna(0).astype(np.int8)
+
+    for column in ['sentiment_label', 'topics']:
+        if not isinstance(data[column].dtype, pd.CategoricalDtype):
+            data[column] = data[column].astype(object).astype('category')
+
+    return data
+
+# So sánh bộ nhớ (deep) từng cột trước và sau khi chuyển kiểu, đơn vị MB
+def memory_report(before, after):
+    report = pd.DataFrame({
+        'before_mb': before.memory_usage(index=False, deep=True) / 2**20,
+        'after_mb': after.memory_usage(index=False, deep=True) / 2**20,
+        'before_dtype': before.dtypes.astype(str),
+        'after_dtype': after.dtypes.astype(str),
+    })
+    report.loc['total'] = [report['before_mb'].sum(), report['after_mb'].sum(), '', '']
+    return report
+
+def add_boost_words_column(data, boost_words_trie):
+    data['normalized_text_with_boost_words'] = data['normalized_text'].apply(lambda x: apply_boost_words(x, boost_words_trie))
+    return data
+
+def prepare_data_feedbacks(feedbacks_file=FEEDBACKS_FILE, boost_words_file=BOOST_WORDS_FILE, compact=True):
+    data = pd.read_csv(feedbacks_file)
+    boost_words_trie = build_boost_words_trie(read_boost_words(boost_words_file))
+
+    data = add_boost_words_column(data, boost_words_trie)
+
+    # Sắp xếp theo mã sản phẩm (giữ thứ tự gốc trong cùng sản phẩm) để feedback của mỗi sản phẩm nằm liền nhau
+    data = data.sort_values('ma_san_pham', kind='stable').reset_index(drop=True)
+
+    return compact_feedbacks(data) if compact else data
+
+# Ghi snapshot ra file tạm rồi đổi tên để process khác không bao giờ đọc phải file ghi dở.
+# Không nén để khi đọc có thể memory-map trực tiếp các cột
+def write_snapshot_atomic(data, file_path):
+    folder = os.path.dirname(file_path) or "."
+    file_descriptor, temp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    os.close(file_descriptor)
+    try:
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        feather.write_feather(table, temp_path, compression='uncompressed')
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+ARROW_TYPES_MAPPER = {pa.string(): pd.StringDtype("pyarrow"), pa.large_string(): pd.StringDtype("pyarrow")}.get
+
+# Chỉ đọc các cột cần dùng, dữ liệu được memory-map từ file; cột chuỗi giữ ở dạng Arrow
+# (string[pyarrow]) thay vì tạo ra hàng triệu object Python. split_blocks giữ mỗi cột một block
+# nên cột số là view read-only trên vùng memory-map thay vì bị gộp (copy) thành mảng 2 chiều
+def read_snapshot(file_path, columns=None):
+    table = feather.read_table(file_path, columns=columns, memory_map=True)
+    return table.to_pandas(types_mapper=ARROW_TYPES_MAPPER, split_blocks=True)
+
+# Xoá các thế hệ cache cũ, giữ lại file hiện tại và các file mới nhất
+def evict_cache_generations(cache_folder, prefix, current_file, keep=CACHE_GENERATIONS_TO_KEEP):
+    cache_files = glob.glob(os.path.join(cache_folder, prefix + "*" + SNAPSHOT_EXTENSION))
+    cache_files = [file for file in cache_files if os.path.abspath(file) != os.path.abspath(current_file)]
+    cache_files.sort(key=os.path.getmtime, reverse=True)
+
+    for file in cache_files[max(keep - 1, 0):]:
+        try:
+            os.remove(file)
+        except FileNotFoundError:
+            pass
+
+def remove_legacy_snapshots(cache_folder, prefix):
+    for extension in LEGACY_SNAPSHOT_EXTENSIONS:
+        for file in glob.glob(os.path.join(cache_folder, prefix + "*" + extension)):
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass
+
+# Đọc snapshot tương ứng với nội dung hiện tại của các file nguồn, build lại khi nguồn thay đổi
+def load_snapshot(prefix, source_files, build_data, columns=None, cache_folder=CACHE_FOLDER):
+    cache_key = hash_files(source_files, salt=SNAPSHOT_VERSION)
+    cache_file = os.path.join(cache_folder, prefix + cache_key + SNAPSHOT_EXTENSION)
+
+    if not os.path.exists(cache_file):
+        os.makedirs(cache_folder, exist_ok=True)
+        write_snapshot_atomic(build_data(), cache_file)
+        evict_cache_generations(cache_folder, prefix, cache_file)
+    # Snapshot parquet từ trước khi chuyển sang Arrow không bao giờ bị evict_cache_generations xoá
+    remove_legacy_snapshots(cache_folder, prefix)
+
+    return read_snapshot(cache_file, columns)
+
+# Version của dữ liệu feedback đã xử lý, trùng với khoá snapshot: đổi khi file nguồn hoặc cách build thay đổi
+def feedbacks_data_version(feedbacks_file=FEEDBACKS_FILE, boost_words_file=BOOST_WORDS_FILE):
+    return hash_files([feedbacks_file, boost_words_file], salt=SNAPSHOT_VERSION)
+
+# Đọc dữ liệu feedback đã xử lý từ cache trên đĩa, cache được đánh khoá theo nội dung
+# file feedback và boost_words.txt nên sẽ tự build lại khi một trong hai file thay đổi
+def load_prepared_feedbacks(columns=None, feedbacks_file=FEEDBACKS_FILE, boost_words_file=BOOST_WORDS_FILE, cache_folder=CACHE_FOLDER):
+    return load_snapshot(
+        FEEDBACKS_CACHE_PREFIX,
+        [feedbacks_file, boost_words_file],
+        lambda: prepare_data_feedbacks(feedbacks_file, boost_words_file),
+        columns=columns,
+        cache_folder=cache_folder,
+    )
+
+def load_products(columns=None, products_file=PRODUCTS_FILE, cache_folder=CACHE_FOLDER):
+    return load_snapshot(
+        PRODUCTS_CACHE_PREFIX,
+        [products_file],
+        lambda: pd.read_csv(products_file),
+        columns=columns,
+        cache_folder=cache_folder,
+    )
+
+# Chỉ mục mã sản phẩm -> khoảng dòng [start, end) trên bảng đã sắp xếp theo mã sản phẩm.
+# Lấy dữ liệu của một sản phẩm là một lát cắt liên tục, nhiều sản phẩm là một lần take,
+# không phải quét cả bảng bằng isin mỗi lần widget thay đổi
+class ProductRowIndex:
+    # Chọn nhiều hơn 1/DENSE_SELECTION_RATIO số dòng thì lọc bằng mask sẽ nhanh hơn take
+    DENSE_SELECTION_RATIO = 8
+
+    def __init__(self, data, key='ma_san_pham'):
+        if not data[key].is_monotonic_increasing:
+            data = data.sort_values(key, kind='stable').reset_index(drop=True)
+        self.data = data
+
+        keys = data[key].to_numpy()
+        self.product_ids = pd.unique(keys)
+        self.starts = np.searchsorted(keys, self.product_ids, side='left')
+        self.ends = np.searchsorted(keys, self.product_ids, side='right')
+
+        # take của pyarrow trên cột nhiều chunk (snapshot memory-map) gộp cả cột trước khi lấy,
+        # nên với cột Arrow ta take trên từng record batch (không copy) rồi mới đổi sang pandas
+        self.table = None
+        if any(isinstance(dtype, pd.StringDtype) and dtype.storage == "pyarrow" for dtype in data.dtypes):
+            self.table = pa.Table.from_pandas(data, preserve_index=False)
+            self.batches = self.table.to_batches()
+            self.batch_starts = np.cumsum([0] + [batch.num_rows for batch in self.batches])
+
+    # Vị trí trong product_ids của các mã có dữ liệu, theo thứ tự tăng dần và không trùng
+    def _positions(self, product_ids):
+        product_ids = np.unique(np.asarray(list(product_ids), dtype=self.product_ids.dtype))
+        if len(self.product_ids) == 0 or len(product_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.product_ids, product_ids), len(self.product_ids) - 1)
+        return positions[self.product_ids[positions] == product_ids]
+
+    # Lấy các dòng theo chỉ số tăng dần, mỗi record batch chỉ take phần chỉ số thuộc về nó
+    def _take(self, row_indices):
+        if self.table is None:
+            return self.data.take(row_indices)
+
+        batch_cuts = np.searchsorted(row_indices, self.batch_starts)
+        pieces = []
+        for batch_number, batch in enumerate(self.batches):
+            start, end = batch_cuts[batch_number], batch_cuts[batch_number + 1]
+            if end > start:
+                pieces.append(batch.take(pa.array(row_indices[start:end] - self.batch_starts[batch_number])))
+
+        result = pa.Table.from_batches(pieces, schema=self.table.schema).to_pandas(types_mapper=ARROW_TYPES_MAPPER)
+        result.index = self.data.index[row_indices]
+        return result
+
+    # Số dòng của mỗi mã sản phẩm
+    def counts(self):
+        return pd.Series(self.ends - self.starts, index=self.product_ids)
+
+    # Các dòng của những sản phẩm được chọn, nhóm theo mã sản phẩm tăng dần
+    def select(self, product_ids):
+        positions = self._positions(product_ids)
+        if len(positions) == 1:
+            return self.data.iloc[self.starts[positions[0]]:self.ends[positions[0]]]
+
+        starts = self.starts[positions]
+        lengths = self.ends[positions] - starts
+        # Ghép các khoảng [start, end) thành một mảng chỉ số: start của từng khoảng + vị trí trong khoảng
+        offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        row_indices = offsets + np.arange(lengths.sum())
+
+        if len(row_indices) * self.DENSE_SELECTION_RATIO > len(self.data):
+            mask = np.zeros(len(self.data), dtype=bool)
+            mask[row_indices] = True
+            return self.data[mask]
+        return self._take(row_indices)
+
+# Chỉ mục dòng trên nhiều phần dữ liệu (dữ liệu gốc và các segment feedback nạp thêm), mỗi phần
+# có ProductRowIndex riêng nên thêm một segment không phải sắp xếp lại hay copy các phần đã có
+class SegmentedRowIndex:
+    def __init__(self, indexes):
+        self.indexes = list(indexes)
+
+    # Chỉ mục mới gồm các phần hiện có và các phần được thêm
+    def extend(self, indexes):
+        return SegmentedRowIndex(self.indexes + list(indexes))
+
+    def counts(self):
+        if len(self.indexes) == 1:
+            return self.indexes[0].counts()
+        return pd.concat([index.counts() for index in self.indexes]).groupby(level=0).sum()
+
+    # Các dòng của những sản phẩm được chọn từ mọi phần, nhóm theo mã sản phẩm tăng dần
+    def select(self, product_ids):
+        product_ids = list(product_ids)
+        parts = [index.select(product_ids) for index in self.indexes]
+        non_empty_parts = [part for part in parts if len(part)]
+        if len(non_empty_parts) <= 1:
+            return non_empty_parts[0] if non_empty_parts else parts[0]
+
+        # Category của các phần có thể khác nhau nên pd.concat trả về object, chuyển lại thành category
+        result = pd.concat(non_empty_parts, ignore_index=True)
+        for column, dtype in non_empty_parts[0].dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype):
+                result[column] = result[column].astype(object).astype('category')
+        return result.sort_values('ma_san_pham', kind='stable').reset_index(drop=True)
+
+# Các segment feedback đã nạp: chữ ký của manifest lúc đọc, tên file và dữ liệu của từng segment
+class FeedbackSegments:
+    def __init__(self, signature, files, frames):
+        self.signature = signature
+        self.files = files
+        self.frames = frames
+
+# Kho segment feedback chỉ ghi thêm: mỗi lần nạp dữ liệu mới là một file Arrow đã xử lý xong
+# (gán nhãn, boost words, chuyển kiểu, sắp xếp theo mã sản phẩm). manifest.json là danh sách
+# segment hợp lệ theo thứ tự, được ghi nguyên tử nên người đọc luôn thấy một tập segment nhất quán.
+# Chỉ một process được ghi tại một thời điểm: lệnh ingest/compact giữ lock() trong suốt lúc chạy
+class FeedbackSegmentStore:
+    def __init__(self, folder=SEGMENTS_FOLDER, boost_words_file=BOOST_WORDS_FILE):
+        self.folder = folder
+        self.boost_words_file = boost_words_file
+
+    @property
+    def manifest_file(self):
+        return os.path.join(self.folder, SEGMENT_MANIFEST_FILE)
+
+    # Thay đổi mỗi khi manifest được ghi lại, chỉ tốn một lần stat
+    def signature(self):
+        try:
+            stat = os.stat(self.manifest_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    # Khoá file (flock) cho người ghi, được hệ điều hành tự nhả khi process kết thúc kể cả khi bị kill.
+    # Người đọc (app) không cần khoá vì manifest được ghi nguyên tử. fcntl chỉ có trên Unix nên chỉ import ở đây,
+    # app chỉ đọc segment vẫn chạy được trên mọi hệ điều hành
+    @contextmanager
+    def lock(self):
+        import fcntl
+        os.makedirs(self.folder, exist_ok=True)
+        with open(os.path.join(self.folder, SEGMENT_LOCK_FILE), "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                print(f"Đang có lệnh khác ghi vào {self.folder}, chờ lệnh đó chạy xong...", file=sys.stderr)
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {"next_sequence": 0, "segments": []}
+
+    def write_manifest(self, manifest):
+        os.makedirs(self.folder, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.manifest_file)
+
+    def boost_words_version(self):
+        return hash_files([self.boost_words_file])
+
+    # Segment được xử lý với boost_words.txt cũ thì tính lại cột boost words khi đọc (chỉ trên segment đó)
+    def read_segment(self, entry, columns=None, boost_words_version=None):
+        file_path = os.path.join(self.folder, entry["file"])
+        if entry["boost_words_version"] == (boost_words_version or self.boost_words_version()):
+            return read_snapshot(file_path, columns)
+        if columns is not None and 'normalized_text_with_boost_words' not in columns:
+            return read_snapshot(file_path, columns)
+
+        read_columns = None if columns is None else list(dict.fromkeys(list(columns) + ['normalized_text']))
+        data = read_snapshot(file_path, read_columns)
+        data = add_boost_words_column(data, build_boost_words_trie(read_boost_words(self.boost_words_file)))
+        return data if columns is None else data[list(columns)]
+
+    # Đọc các segment trong manifest; các segment đầu trùng với lần đọc trước (loaded) được dùng lại
+    def load(self, columns=None, loaded=None):
+        signature = self.signature()
+        entries = self.read_manifest()["segments"]
+        files = [entry["file"] for entry in entries]
+
+        frames = []
+        if loaded is not None and files[:len(loaded.files)] == loaded.files:
+            frames = list(loaded.frames)
+        boost_words_version = self.boost_words_version() if len(entries) > len(frames) else None
+        frames += [self.read_segment(entry, columns, boost_words_version) for entry in entries[len(frames):]]
+        return FeedbackSegments(signature, files, frames)
+
+    def _write_segment(self, manifest, data, sources):
+        file_name = f"{SEGMENT_PREFIX}{manifest['next_sequence']:08d}{SNAPSHOT_EXTENSION}"
+        os.makedirs(self.folder, exist_ok=True)
+        write_snapshot_atomic(data, os.path.join(self.folder, file_name))
+        manifest["next_sequence"] += 1
+        return {"file": file_name, "rows": len(data), "sources": sources, "boost_words_version": self.boost_words_version()}
+
+    # Ghi dữ liệu đã xử lý thành segment mới rồi mới thêm vào manifest
+    def append(self, data, sources):
+        manifest = self.read_manifest()
+        manifest["segments"].append(self._write_segment(manifest, data, sources))
+        self.write_manifest(manifest)
+        return manifest["segments"][-1]
+
+    # Gộp mọi segment thành một segment sắp xếp theo mã sản phẩm (boost words theo file hiện tại).
+    # File cũ chỉ bị xoá sau khi manifest mới đã được ghi
+    def compact(self):
+        manifest = self.read_manifest()
+        entries = manifest["segments"]
+        if len(entries) <= 1:
+            return None
+
+        boost_words_version = self.boost_words_version()
+        data = pd.concat([self.read_segment(entry, boost_words_version=boost_words_version) for entry in entries], ignore_index=True)
+        data = compact_feedbacks(data.sort_values('ma_san_pham', kind='stable').reset_index(drop=True))
+        sources = [source for entry in entries for source in entry["sources"]]
+        manifest["segments"] = [self._write_segment(manifest, data, sources)]
+        self.write_manifest(manifest)
+
+        for entry in entries:
+            try:
+                os.remove(os.path.join(self.folder, entry["file"]))
+            except OSError as error:
+                print(f"Không xoá được segment cũ {entry['file']}: {error}", file=sys.stderr)
+        return manifest["segments"][0]
+
+# Version của dữ liệu feedback gồm cả các segment, giữ nguyên version gốc khi chưa có segment nào
+def combine_data_version(base_version, segment_files):
+    if not segment_files:
+        return base_version
+    return hashlib.sha256("\n".join([base_version] + list(segment_files)).encode('utf-8')).hexdigest()[:16]
+
+# Build sẵn snapshot cho tất cả dữ liệu, dùng khi deploy để process đầu tiên không phải chờ
+def build_snapshots(cache_folder=CACHE_FOLDER):
+    load_products(columns=[], cache_folder=cache_folder)
+    load_prepared_feedbacks(columns=[], cache_folder=cache_folder)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build sẵn snapshot dữ liệu sản phẩm và feedback")
+    parser.add_argument("--memory-report", action="store_true", help="In bộ nhớ các cột feedback trước và sau khi chuyển kiểu")
+    args = parser.parse_args()
+
+    build_snapshots()
+
+    if args.memory_report:
+        columns = PRODUCT_ANALYSIS_FEEDBACK_COLUMNS
+        before = prepare_data_feedbacks(compact=False)[columns]
+        after = load_prepared_feedbacks(columns=columns)
+        print(memory_report(before, after).to_string(float_format='{:.2f}'.format))
@@ -0,0 +1,146 @@
+import copy
+import sys
+import threading
+
+import pandas as pd
+import pyarrow as pa
+
+from hasaki_sentiment_analysis_aggregates import FeedbackAggregates
+from hasaki_sentiment_analysis_data import ARROW_TYPES_MAPPER, FeedbackSegmentStore, ProductRowIndex, SegmentedRowIndex, combine_data_version, feedbacks_data_version, load_prepared_feedbacks, load_products, PRODUCT_ANALYSIS_FEEDBACK_COLUMNS, PRODUCT_ANALYSIS_PRODUCT_COLUMNS
+from hasaki_sentiment_analysis_registry import registry
+from hasaki_sentiment_analysis_search import ProductCodeIndex, ProductNameIndex
+
+# Bộ dữ liệu dùng chung cho mọi session của một process server. Mỗi artifact chỉ được nạp
+# một lần (registry giữ khoá riêng cho từng artifact nên nhiều session mở cùng lúc vẫn chỉ
+# nạp một lần), các session nhận cùng một đối tượng chứ không phải bản copy.
+# Các bảng là read-only: cột số là view trên vùng nhớ Arrow (memory-map từ snapshot) nên
+# ghi vào sẽ báo lỗi "assignment destination is read-only", cột chuỗi là Arrow nên không sửa được
+
+# Chuyển DataFrame sang bảng Arrow rồi đọc lại, mỗi cột thành một block riêng trỏ vào
+# bộ nhớ Arrow (không ghi được) thay vì một mảng numpy 2 chiều dùng chung
+def read_only_frame(data):
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    return table.to_pandas(types_mapper=ARROW_TYPES_MAPPER, split_blocks=True)
+
+# Thêm số lượng đánh giá và chuỗi hiển thị trong ô tìm kiếm, trả về bảng mới read-only
+def build_product_table(data, review_counts):
+    data = data.assign(so_luong_danh_gia=data['ma_san_pham'].map(review_counts).fillna(0).astype(int))
+    data['ten_san_pham_sl_danh_gia'] = data['ten_san_pham'] + " (" + data['so_luong_danh_gia'].astype(str) + " đánh giá)"
+    data['ma_san_pham_sl_danh_gia'] = data['ma_san_pham'].astype(str) + " (" + data['so_luong_danh_gia'].astype(str) + " đánh giá)"
+
+    return read_only_frame(data)
+
+def build_data_products(row_index):
+    return build_product_table(registry.get("base_data_products"), row_index.counts())
+
+def build_product_name_index(data):
+    return ProductNameIndex(data['ten_san_pham'].tolist(), data['so_luong_danh_gia'].values)
+
+def build_product_code_index(data):
+    return ProductCodeIndex(data['ma_san_pham'].values, data['so_luong_danh_gia'].values)
+
+# Thêm các segment vào chỉ mục dòng và bảng đếm đã có: chỉ xử lý dữ liệu của các segment đó
+def extend_feedback_row_index(row_index, frames):
+    return row_index.extend(ProductRowIndex(frame) for frame in frames)
+
+def extend_feedback_aggregates(aggregates, frames):
+    if not frames:
+        return aggregates
+    return aggregates.combine(FeedbackAggregates(pd.concat(frames, ignore_index=True)))
+
+# Dữ liệu feedback dùng chung tại một thời điểm: các segment đã nạp và mọi thứ dựng trên chúng (chỉ mục dòng,
+# bảng đếm, bảng sản phẩm với so_luong_danh_gia, chỉ mục tìm kiếm, version cho khoá cache ảnh biểu đồ).
+# Khi có segment mới, cả snapshot được thay trong một bước nên không session nào thấy các phần lệch nhau
+class FeedbackSnapshot:
+    def __init__(self, segments, row_index, aggregates):
+        self.segments = segments
+        self.row_index = row_index
+        self.aggregates = aggregates
+        self.data_products = build_data_products(row_index)
+        self.product_name_index = build_product_name_index(self.data_products)
+        self.product_code_index = build_product_code_index(self.data_products)
+        self.data_version = combine_data_version(registry.get("base_feedbacks_data_version"), segments.files)
+
+# Dựng phần segment trên chỉ mục dòng và bảng đếm của dữ liệu gốc
+def build_feedback_snapshot(segments):
+    return FeedbackSnapshot(
+        segments,
+        extend_feedback_row_index(registry.get("base_feedback_row_index"), segments.frames),
+        extend_feedback_aggregates(registry.get("base_feedback_aggregates"), segments.frames),
+    )
+
+segment_store = FeedbackSegmentStore()
+
+# Dữ liệu gốc đã xử lý được cache trên đĩa nên các process sau chỉ cần memory-map lại
+registry.register("data_feedbacks", lambda: load_prepared_feedbacks(columns=PRODUCT_ANALYSIS_FEEDBACK_COLUMNS))
+registry.register("base_data_products", lambda: load_products(columns=PRODUCT_ANALYSIS_PRODUCT_COLUMNS))
+registry.register("base_feedbacks_data_version", feedbacks_data_version)
+# Chỉ mục mã sản phẩm -> khoảng dòng và bảng đếm feedback theo từng sản phẩm trên dữ liệu gốc
+registry.register("base_feedback_row_index", lambda: SegmentedRowIndex([ProductRowIndex(registry.get("data_feedbacks"))]))
+registry.register("base_feedback_aggregates", lambda: FeedbackAggregates(registry.get("data_feedbacks")))
+# Dữ liệu gốc cùng các segment feedback nạp thêm sau file CSV gốc
+registry.register("feedback_snapshot", lambda: build_feedback_snapshot(segment_store.load(columns=PRODUCT_ANALYSIS_FEEDBACK_COLUMNS)))
+
+_refresh_lock = threading.Lock()
+
+# Gọi ở đầu mỗi lần rerun: khi manifest segment thay đổi (lệnh ingest hoặc compact vừa chạy) thì cập nhật
+# dữ liệu dùng chung mà không nạp lại dữ liệu gốc. Segment mới được thêm vào sau thì chỉ xử lý các segment đó;
+# danh sách segment đổi khác (sau compact) thì dựng lại phần segment trên chỉ mục và bảng đếm của dữ liệu gốc.
+# Bảng sản phẩm (so_luong_danh_gia) và chỉ mục tìm kiếm được build lại trên số đếm mới, chỉ tỉ lệ với số sản phẩm.
+# Chỉ một session cập nhật, các session khác tiếp tục dùng snapshot cũ cho đến khi snapshot mới được thay vào
+def refresh_feedback_segments():
+    if not registry.is_loaded("feedback_snapshot"):
+        return False
+    if segment_store.signature() == registry.get("feedback_snapshot").segments.signature:
+        return False
+    if not _refresh_lock.acquire(blocking=False):
+        return False
+
+    try:
+        loaded = registry.get("feedback_snapshot")
+        segments = segment_store.load(columns=PRODUCT_ANALYSIS_FEEDBACK_COLUMNS, loaded=loaded.segments)
+        n_loaded = len(loaded.segments.files)
+        if segments.files == loaded.segments.files:
+            # Manifest được ghi lại nhưng danh sách segment không đổi: chỉ cập nhật chữ ký
+            snapshot = copy.copy(loaded)
+            snapshot.segments = segments
+            registry.replace("feedback_snapshot", snapshot)
+            return False
+
+        if segments.files[:n_loaded] == loaded.segments.files:
+            new_frames = segments.frames[n_loaded:]
+            snapshot = FeedbackSnapshot(segments, extend_feedback_row_index(loaded.row_index, new_frames), extend_feedback_aggregates(loaded.aggregates, new_frames))
+        else:
+            snapshot = build_feedback_snapshot(segments)
+
+        registry.replace("feedback_snapshot", snapshot)
+        print(f"Đã nạp thêm dữ liệu feedback: {len(segments.files)} segment, {sum(len(frame) for frame in segments.frames):,} dòng", file=sys.stderr)
+        return True
+    finally:
+        _refresh_lock.release()
+
+# Các session lấy dữ liệu qua các hàm dưới đây, session_state chỉ giữ lựa chọn của người dùng.
+# Khi cần nhiều phần cùng lúc (vd. bảng sản phẩm và chỉ mục tìm kiếm) thì lấy chung một snapshot
+def load_feedback_snapshot():
+    return registry.get("feedback_snapshot")
+
+def load_data_products():
+    return load_feedback_snapshot().data_products
+
+def load_data_feedbacks():
+    return registry.get("data_feedbacks")
+
+def load_product_name_index():
+    return load_feedback_snapshot().product_name_index
+
+def load_product_code_index():
+    return load_feedback_snapshot().product_code_index
+
+def load_feedback_aggregates():
+    return load_feedback_snapshot().aggregates
+
+def load_feedback_row_index():
+    return load_feedback_snapshot().row_index
+
+def load_feedbacks_data_version():
+    return load_feedback_snapshot().data_version
@@ -0,0 +1,141 @@
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+from hasaki_sentiment_analysis_boost_words import BOOST_WORDS_FILE, read_boost_words, build_boost_words_trie
+from hasaki_sentiment_analysis_cli import iter_input_chunks, DEFAULT_CHUNK_SIZE
+from hasaki_sentiment_analysis_data import add_boost_words_column, compact_feedbacks, hash_files, FeedbackSegmentStore, SEGMENTS_FOLDER
+from hasaki_sentiment_analysis_prediction import predict_normalized_labels, preprocess_texts, shutdown_preprocess_pool, PREPROCESS_WORKERS
+
+# Các cột của file feedback gốc, segment mới có cùng các cột này
+FEEDBACK_SOURCE_COLUMNS = [
+    'ma_khach_hang', 'ten_khach_hang', 'noi_dung_binh_luan', 'ngay_binh_luan', 'gio_binh_luan', 'so_sao',
+    'ma_san_pham', 'id', 'normalized_text', 'processed_text', 'sentiment_label', 'topics',
+]
+INGEST_REQUIRED_COLUMNS = ['ma_san_pham', 'noi_dung_binh_luan']
+# Topic của bình luận chưa được gán topic, giống giá trị trong file gốc
+DEFAULT_TOPIC = "No label"
+# Nhãn của dữ liệu gốc được gán theo số sao: 1-3 sao là negative, 4-5 sao là positive
+POSITIVE_MIN_STARS = 4
+# Sau mỗi lần nạp, gộp các segment khi số segment vượt quá giá trị này
+MAX_SEGMENTS = int(os.environ.get("HASAKI_MAX_SEGMENTS", 8))
+
+# Nhãn theo số sao giống dữ liệu gốc, None với số sao thiếu hoặc ngoài 1-5
+def star_sentiment_labels(stars):
+    stars = pd.to_numeric(stars, errors='coerce')
+    labels = pd.Series(None, index=stars.index, dtype=object)
+    labels[stars.between(1, POSITIVE_MIN_STARS - 1)] = "negative"
+    labels[stars.between(POSITIVE_MIN_STARS, 5)] = "positive"
+    return labels
+
+# Xử lý một lô bình luận mới giống dữ liệu gốc: gán nhãn theo số sao (bình luận không có số sao hợp lệ
+# mới dùng model hiện tại), thêm boost words, chuyển kiểu và sắp xếp theo mã sản phẩm.
+# Dòng không có mã sản phẩm hoặc nội dung bị bỏ qua
+def prepare_feedback_segment(data, boost_words_trie, n_workers=None):
+    missing_columns = [column for column in INGEST_REQUIRED_COLUMNS if column not in data.columns]
+    if missing_columns:
+        raise KeyError(f"File đầu vào không có cột {', '.join(missing_columns)}")
+
+    data = data.copy()
+    data['ma_san_pham'] = pd.to_numeric(data['ma_san_pham'], errors='coerce')
+    feedbacks = data['noi_dung_binh_luan']
+    valid = data['ma_san_pham'].notna() & feedbacks.notna() & feedbacks.astype(str).str.strip().ne("")
+    if not valid.all():
+        print(f"Bỏ qua {(~valid).sum():,} dòng không có mã sản phẩm hoặc nội dung bình luận")
+
+    data = data[valid].reindex(columns=FEEDBACK_SOURCE_COLUMNS).reset_index(drop=True)
+    data['ma_san_pham'] = data['ma_san_pham'].astype('int64')
+    data['noi_dung_binh_luan'] = data['noi_dung_binh_luan'].astype(str)
+    data['topics'] = data['topics'].fillna(DEFAULT_TOPIC)
+
+    # Bình luận trùng nhau trong lô chỉ được chuẩn hoá và dự đoán một lần
+    unique_texts = list(dict.fromkeys(data['noi_dung_binh_luan']))
+    normalized_by_text = dict(zip(unique_texts, preprocess_texts(unique_texts, n_workers=n_workers)))
+    data['normalized_text'] = data['noi_dung_binh_luan'].map(normalized_by_text)
+    data['sentiment_label'] = star_sentiment_labels(data['so_sao'])
+
+    unlabeled = data['sentiment_label'].isna()
+    if unlabeled.any():
+        unlabeled_texts = list(dict.fromkeys(data.loc[unlabeled, 'normalized_text']))
+        label_by_text = dict(zip(unlabeled_texts, predict_normalized_labels(unlabeled_texts)))
+        data.loc[unlabeled, 'sentiment_label'] = data.loc[unlabeled, 'normalized_text'].map(label_by_text)
+
+    data = add_boost_words_column(data, boost_words_trie)
+    data = data.sort_values('ma_san_pham', kind='stable').reset_index(drop=True)
+    return compact_feedbacks(data)
+
+# Nạp một file bình luận mới thành một segment. File đã nạp trước đó (cùng nội dung) được bỏ qua.
+# Người gọi giữ store.lock() để không có lệnh khác ghi manifest giữa lúc kiểm tra và lúc thêm segment
+def ingest_file(input_file, store, n_workers=None, chunk_size=DEFAULT_CHUNK_SIZE, max_segments=MAX_SEGMENTS):
+    source = hash_files([input_file])
+    manifest = store.read_manifest()
+    if any(source in entry["sources"] for entry in manifest["segments"]):
+        print(f"{input_file}: đã được nạp trước đó, bỏ qua")
+        return None
+
+    start = time.perf_counter()
+    data = pd.concat(iter_input_chunks(input_file, chunk_size), ignore_index=True)
+    boost_words_trie = build_boost_words_trie(read_boost_words(store.boost_words_file))
+    segment = prepare_feedback_segment(data, boost_words_trie, n_workers=n_workers)
+    if segment.empty:
+        print(f"{input_file}: không có bình luận hợp lệ")
+        return None
+
+    entry = store.append(segment, sources=[source])
+    print(f"{input_file}: {entry['rows']:,} bình luận -> {entry['file']} ({time.perf_counter() - start:.1f} s)")
+
+    if len(store.read_manifest()["segments"]) > max_segments:
+        compact_segments(store)
+    return entry
+
+def compact_segments(store):
+    start = time.perf_counter()
+    entry = store.compact()
+    if entry is None:
+        print("Không có segment nào cần gộp")
+    else:
+        print(f"Đã gộp các segment thành {entry['file']}: {entry['rows']:,} bình luận ({time.perf_counter() - start:.1f} s)")
+    return entry
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Nạp thêm bình luận mới vào dữ liệu phân tích sản phẩm mà không build lại toàn bộ dữ liệu")
+    parser.add_argument("--segments-dir", default=SEGMENTS_FOLDER, help="Thư mục lưu các segment và manifest")
+    parser.add_argument("--boost-words-file", default=BOOST_WORDS_FILE)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Gán nhãn theo số sao các file bình luận mới (csv, parquet, jsonl) và ghi thành segment")
+    ingest_parser.add_argument("inputs", nargs="+")
+    ingest_parser.add_argument("--workers", type=int, default=PREPROCESS_WORKERS, help="Số process dùng để tiền xử lý")
+    ingest_parser.add_argument("--max-segments", type=int, default=MAX_SEGMENTS, help="Gộp các segment khi số segment vượt quá giá trị này")
+
+    subparsers.add_parser("compact", help="Gộp mọi segment thành một segment")
+    subparsers.add_parser("status", help="In danh sách segment")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    store = FeedbackSegmentStore(args.segments_dir, args.boost_words_file)
+
+    try:
+        if args.command == "ingest":
+            with store.lock():
+                for input_file in args.inputs:
+                    ingest_file(input_file, store, n_workers=args.workers, max_segments=args.max_segments)
+        elif args.command == "compact":
+            with store.lock():
+                compact_segments(store)
+        else:
+            for entry in store.read_manifest()["segments"]:
+                print(f"{entry['file']}: {entry['rows']:,} bình luận, {len(entry['sources'])} file nguồn")
+    except (ValueError, KeyError, OSError) as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    finally:
+        shutdown_preprocess_pool()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
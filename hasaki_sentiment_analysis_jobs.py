@@ -0,0 +1,252 @@
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from contextlib import closing
+
+import pandas as pd
+
+from hasaki_sentiment_analysis_metrics import metrics
+from hasaki_sentiment_analysis_streaming import iter_feedback_chunks, score_feedback_chunks, STREAM_PREVIEW_ROWS
+
+# Thư mục lưu file đầu vào và file kết quả của các job phân tích
+JOBS_FOLDER = "data/cache/jobs/"
+# Số job được phân tích cùng lúc. Các job dùng chung pool tiền xử lý nên thêm job không thêm CPU,
+# chỉ giới hạn số file đang mở và bộ nhớ của các lô đang xử lý
+JOB_WORKERS = int(os.environ.get("HASAKI_JOB_WORKERS", 2))
+# Số job tối đa đang chờ, vượt quá thì từ chối job mới
+JOB_QUEUE_LIMIT = int(os.environ.get("HASAKI_JOB_QUEUE_LIMIT", 8))
+# Job đã kết thúc được giữ (cùng file kết quả) trong khoảng thời gian này rồi bị xoá
+JOB_TTL_SECONDS = float(os.environ.get("HASAKI_JOB_TTL_SECONDS", 24 * 3600))
+# File tải lên lớn hơn ngưỡng này được phân tích bằng job nền, file nhỏ vẫn phân tích ngay trong trang
+JOB_MIN_UPLOAD_BYTES = int(os.environ.get("HASAKI_JOB_MIN_UPLOAD_BYTES", 1 * 2**20))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+
+JOB_SECONDS = metrics.histogram("hasaki_job_seconds", "Thời gian phân tích của một job nền", ["status"])
+JOB_WAIT_SECONDS = metrics.histogram("hasaki_job_wait_seconds", "Thời gian một job nền chờ trong hàng đợi")
+JOBS_REJECTED = metrics.counter("hasaki_jobs_rejected_total", "Số job bị từ chối vì hàng đợi đã đầy")
+
+class QueueFullError(RuntimeError):
+    pass
+
+# Một job phân tích file bình luận. Thread worker cập nhật trạng thái và tiến độ,
+# các session chỉ đọc các thuộc tính
+class Job:
+    def __init__(self, job_id, name, owner, input_path, is_text):
+        self.id = job_id
+        self.name = name
+        self.owner = owner
+        self.input_path = input_path
+        self.result_path = None
+        self.is_text = is_text
+        self.status = QUEUED
+        self.progress = 0.0
+        self.n_feedbacks = 0
+        self.preview = pd.DataFrame()
+        self.error = None
+        self.cancel_requested = False
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def is_finished(self):
+        return self.status in FINISHED_STATUSES
+
+# Hàng đợi job phân tích chạy trên một số thread worker cố định. Job tiếp theo được chọn công bằng
+# giữa những người gửi: ưu tiên người đang có ít job chạy nhất, cùng số thì job gửi trước chạy trước,
+# nên một người gửi nhiều file lớn không chiếm hết worker của những người khác
+class JobQueue:
+    def __init__(self, folder=JOBS_FOLDER, max_workers=JOB_WORKERS, max_queued=JOB_QUEUE_LIMIT, ttl_seconds=JOB_TTL_SECONDS):
+        self.folder = folder
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.ttl_seconds = ttl_seconds
+        self._jobs = {}
+        self._pending = []
+        self._running = {}
+        self._workers = []
+        self._condition = threading.Condition()
+        self._stale_files_removed = False
+
+    def _start_workers(self):
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, name=f"scoring-job-{len(self._workers)}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    # Chép file tải lên vào thư mục job rồi đưa vào hàng đợi, báo QueueFullError khi hàng đợi đã đầy.
+    # Job đang chép file đã được tính vào giới hạn hàng đợi nhưng chỉ được chạy khi chép xong
+    def submit(self, source_file, name, owner, is_text=False):
+        with self._condition:
+            if not self._stale_files_removed:
+                self._remove_stale_files()
+                self._stale_files_removed = True
+            self._expire()
+            n_queued = sum(job.status == QUEUED for job in self._jobs.values())
+            if n_queued >= self.max_queued:
+                JOBS_REJECTED.inc()
+                raise QueueFullError(f"Hàng đợi đã có {n_queued} job, vui lòng thử lại sau")
+            job_id = uuid.uuid4().hex[:12]
+            job = Job(job_id, name, owner, os.path.join(self.folder, job_id + ".input"), is_text)
+            self._jobs[job_id] = job
+
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            source_file.seek(0)
+            with open(job.input_path, "wb") as file:
+                shutil.copyfileobj(source_file, file)
+        except OSError as error:
+            with self._condition:
+                self._finish(job, FAILED, error=f"Không lưu được file: {error}")
+            raise
+
+        with self._condition:
+            if job.is_finished:
+                return job
+            self._pending.append(job)
+            self._start_workers()
+            self._condition.notify()
+        return job
+
+    # UI hỏi trạng thái job bằng get nên job hết hạn cũng được xoá tại đây
+    def get(self, job_id):
+        with self._condition:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def jobs(self, owner=None):
+        with self._condition:
+            self._expire()
+            return [job for job in self._jobs.values() if owner is None or job.owner == owner]
+
+    # Vị trí (bắt đầu từ 1) của job trong hàng đợi, 0 nếu job không còn chờ
+    def queue_position(self, job):
+        with self._condition:
+            return self._pending.index(job) + 1 if job in self._pending else 0
+
+    # Job đang chờ bị huỷ ngay, job đang chạy dừng sau lô bình luận hiện tại
+    def cancel(self, job_id):
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.is_finished:
+                return False
+            job.cancel_requested = True
+            if job.status == QUEUED:
+                if job in self._pending:
+                    self._pending.remove(job)
+                self._finish(job, CANCELLED)
+            return True
+
+    def stats(self):
+        with self._condition:
+            statuses = [job.status for job in self._jobs.values()]
+            return {status: statuses.count(status) for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+
+    def _next_job(self):
+        running_by_owner = {}
+        for job in self._running.values():
+            running_by_owner[job.owner] = running_by_owner.get(job.owner, 0) + 1
+        job = min(self._pending, key=lambda job: running_by_owner.get(job.owner, 0))
+        self._pending.remove(job)
+        return job
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                job = self._next_job()
+                job.status = RUNNING
+                job.started_at = time.time()
+                self._running[job.id] = job
+            JOB_WAIT_SECONDS.observe(job.started_at - job.submitted_at)
+
+            status, error = self._run(job)
+            with self._condition:
+                del self._running[job.id]
+                self._finish(job, status, error)
+
+    # Phân tích file của job theo từng lô giống analyze_uploaded_file, kết quả ghi nối tiếp ra file csv
+    def _run(self, job):
+        result_path = os.path.join(self.folder, job.id + ".csv")
+        try:
+            size = os.path.getsize(job.input_path)
+            with open(job.input_path, "rb") as input_file, open(result_path, "wb") as result_file:
+                chunks = iter_feedback_chunks(input_file, is_text=job.is_text)
+                with closing(score_feedback_chunks(chunks, result_file)) as results:
+                    for result in results:
+                        job.n_feedbacks += len(result)
+                        if len(job.preview) < STREAM_PREVIEW_ROWS:
+                            job.preview = pd.concat([job.preview, result.head(STREAM_PREVIEW_ROWS - len(job.preview))], ignore_index=True)
+                        job.progress = min(input_file.tell() / size, 1.0) if size else 1.0
+                        if job.cancel_requested:
+                            return CANCELLED, None
+        except Exception as error:
+            print(f"Job {job.id} ({job.name}) lỗi: {error}", file=sys.stderr)
+            return FAILED, str(error)
+
+        job.result_path = result_path
+        job.progress = 1.0
+        return DONE, None
+
+    # Gọi khi đang giữ khoá
+    def _finish(self, job, status, error=None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        if job.started_at is not None:
+            JOB_SECONDS.observe(job.finished_at - job.started_at, status=status)
+        self._remove_file(job.input_path)
+        if status != DONE:
+            self._remove_file(os.path.join(self.folder, job.id + ".csv"))
+
+    # Xoá các job đã kết thúc quá ttl_seconds cùng file kết quả. Gọi khi đang giữ khoá
+    def _expire(self):
+        now = time.time()
+        for job in list(self._jobs.values()):
+            if job.is_finished and now - job.finished_at > self.ttl_seconds:
+                del self._jobs[job.id]
+                if job.result_path:
+                    self._remove_file(job.result_path)
+
+    # Trạng thái job chỉ nằm trong bộ nhớ nên file input và kết quả của các job trước khi khởi động lại
+    # không bao giờ được _expire xoá. Xoá các file cũ hơn ttl_seconds, gọi khi đang giữ khoá
+    def _remove_stale_files(self):
+        now = time.time()
+        try:
+            file_names = os.listdir(self.folder)
+        except FileNotFoundError:
+            return
+        for file_name in file_names:
+            file_path = os.path.join(self.folder, file_name)
+            try:
+                is_stale = os.path.isfile(file_path) and now - os.path.getmtime(file_path) > self.ttl_seconds
+            except OSError:
+                continue
+            if is_stale:
+                self._remove_file(file_path)
+
+    @staticmethod
+    def _remove_file(file_path):
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as error:
+            print(f"Không xoá được file {file_path}: {error}", file=sys.stderr)
+
+job_queue = JobQueue()
+
+def job_counts():
+    return {(status,): count for status, count in job_queue.stats().items()}
+
+metrics.callback("hasaki_jobs", "Số job nền theo trạng thái", "gauge", job_counts, ["status"])
@@ -0,0 +1,300 @@
+import bisect
+import functools
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Đặt HASAKI_METRICS=0 để tắt việc ghi nhận số liệu (các lệnh observe/inc trả về ngay)
+METRICS_ENABLED = os.environ.get("HASAKI_METRICS", "1") != "0"
+# Ghi số liệu dạng Prometheus text ra file này mỗi METRICS_FILE_INTERVAL giây (node_exporter textfile collector)
+METRICS_FILE = os.environ.get("HASAKI_METRICS_FILE")
+METRICS_FILE_INTERVAL = float(os.environ.get("HASAKI_METRICS_FILE_INTERVAL", 15))
+# Mở endpoint http://127.0.0.1:<port>/metrics cho Prometheus
+METRICS_PORT = int(os.environ.get("HASAKI_METRICS_PORT", 0))
+
+# Mốc histogram thời gian (giây), từ 0.5 ms đến 1 phút
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Mốc histogram số bình luận trong một batch
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 50000)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + "}"
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# Lớp chung của các metric: giá trị được lưu theo tuple giá trị label, mỗi metric có khoá riêng
+class Metric:
+    type_name = "untyped"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, (), value) for key, value in self._values.items()]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+# Histogram số đếm theo mốc cố định: observe chỉ là một lần bisect và vài phép cộng
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [số quan sát theo từng mốc (mốc cuối là +Inf), tổng, số lần]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    # Đo thời gian một đoạn code: with histogram.time(stage="..."):
+    def time(self, **labels):
+        return Timer(self, labels)
+
+    # Decorator đo thời gian mỗi lần gọi hàm
+    def timed(self, **labels):
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def samples(self):
+        with self._lock:
+            states = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+
+        samples = []
+        for key, bucket_counts, total, count in states:
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                samples.append((self.name + "_bucket", key, (("le", format_value(upper_bound)),), cumulative))
+            samples.append((self.name + "_sum", key, (), total))
+            samples.append((self.name + "_count", key, (), count))
+        return samples
+
+    # Ước lượng phân vị bằng nội suy tuyến tính trong mốc chứa nó (như histogram_quantile của Prometheus)
+    @staticmethod
+    def estimate_quantile(quantile, buckets, bucket_counts, count):
+        if count == 0:
+            return 0.0
+        rank = quantile * count
+        cumulative = 0
+        lower_bound = 0.0
+        for upper_bound, bucket_count in zip(buckets, bucket_counts):
+            if cumulative + bucket_count >= rank:
+                return lower_bound + (upper_bound - lower_bound) * (rank - cumulative) / max(bucket_count, 1)
+            cumulative += bucket_count
+            lower_bound = upper_bound
+        return buckets[-1]
+
+    # Tóm tắt từng bộ label: số lần, trung bình và các phân vị ước lượng
+    def summary(self):
+        with self._lock:
+            states = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+
+        rows = []
+        for key, bucket_counts, total, count in states:
+            rows.append({
+                "labels": dict(zip(self.label_names, key)),
+                "count": count,
+                "sum": total,
+                "mean": total / count if count else 0.0,
+                "p50": self.estimate_quantile(0.5, self.buckets, bucket_counts, count),
+                "p95": self.estimate_quantile(0.95, self.buckets, bucket_counts, count),
+                "p99": self.estimate_quantile(0.99, self.buckets, bucket_counts, count),
+            })
+        return rows
+
+# Context manager của Histogram.time, viết thành class vì rẻ hơn contextmanager (không tạo generator)
+class Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+# Metric đọc giá trị lúc xuất từ một hàm, dùng cho số liệu các cache đã tự đếm.
+# function() trả về dict {tuple giá trị label: giá trị}
+class CallbackMetric(Metric):
+    def __init__(self, name, help_text, type_name, function, label_names=()):
+        super().__init__(name, help_text, label_names)
+        self.type_name = type_name
+        self.function = function
+
+    def samples(self):
+        return [(self.name, tuple(str(value) for value in key), (), value) for key, value in self.function().items()]
+
+# Tập hợp các metric của process; tạo metric cùng tên hai lần trả về cùng một đối tượng
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name, create):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = create()
+            return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self._get_or_create(name, lambda: Counter(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(name, lambda: Histogram(name, help_text, label_names, buckets))
+
+    def callback(self, name, help_text, type_name, function, label_names=()):
+        return self._get_or_create(name, lambda: CallbackMetric(name, help_text, type_name, function, label_names))
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    # Xuất toàn bộ metric theo định dạng Prometheus text (exposition format 0.0.4)
+    def render_prometheus(self):
+        lines = []
+        for metric in sorted(self.metrics(), key=lambda metric: metric.name):
+            samples = metric.samples()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for sample_name, key, extra_labels, value in samples:
+                lines.append(f"{sample_name}{format_labels(metric.label_names, key, extra_labels)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    # Ghi file tạm rồi đổi tên để collector không đọc phải file ghi dở
+    def write_prometheus_file(self, file_path):
+        folder = os.path.dirname(file_path) or "."
+        os.makedirs(folder, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as file:
+            file.write(self.render_prometheus())
+        os.replace(temp_path, file_path)
+
+    def histogram_summaries(self):
+        rows = []
+        for metric in sorted(self.metrics(), key=lambda metric: metric.name):
+            if isinstance(metric, Histogram):
+                rows += [{"metric": metric.name, **row} for row in metric.summary()]
+        return rows
+
+    def clear(self):
+        for metric in self.metrics():
+            metric.clear()
+
+metrics = MetricsRegistry()
+
+def make_metrics_handler(registry):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        # Không in mỗi lần Prometheus scrape ra stderr
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+def start_http_exporter(port, registry=metrics):
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_metrics_handler(registry))
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+def start_file_exporter(file_path, interval=METRICS_FILE_INTERVAL, registry=metrics):
+    def write_forever():
+        while True:
+            try:
+                registry.write_prometheus_file(file_path)
+            except OSError as error:
+                print(f"Không ghi được file metrics {file_path}: {error}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=write_forever, name="metrics-file", daemon=True)
+    thread.start()
+    return thread
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+# Mở các kênh xuất số liệu được cấu hình qua biến môi trường, chỉ một lần cho mỗi process
+def start_exporters():
+    global _exporters_started
+
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+        if METRICS_PORT:
+            try:
+                start_http_exporter(METRICS_PORT)
+                print(f"Metrics: http://127.0.0.1:{METRICS_PORT}/metrics")
+            except OSError as error:
+                print(f"Không mở được cổng metrics {METRICS_PORT}: {error}")
+        if METRICS_FILE:
+            start_file_exporter(METRICS_FILE)
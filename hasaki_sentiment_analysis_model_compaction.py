@@ -0,0 +1,155 @@
+import argparse
+import copy
+import json
+import os
+import pickle
+import sys
+
+import lightgbm
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from hasaki_sentiment_analysis_registry import read_pickle, model_source_version, MODEL_FILE, VECTORIZER_FILE, COMPACT_MODEL_FILE, COMPACT_VECTORIZER_FILE, COMPACT_SOURCE_FILE
+
+# File dùng để kiểm tra cặp model rút gọn cho cùng kết quả với cặp gốc
+VALIDATION_FILE = "data/Danh_gia_with_label.csv"
+VALIDATION_COLUMNS = ['normalized_text', 'processed_text']
+
+# TfidfVectorizer giữ nguyên toàn bộ từ vựng vì chuẩn hoá l2 của mỗi bình luận tính trên mọi từ,
+# nhưng các từ model dùng được xếp lên đầu nên chỉ trả về n_used_features_ cột đầu tiên
+class CompactTfidfVectorizer(TfidfVectorizer):
+    def transform(self, raw_documents):
+        return super().transform(raw_documents)[:, :self.n_used_features_]
+
+# Các cột TF-IDF mà cây của LightGBM có dùng để chia nhánh, các cột khác không ảnh hưởng kết quả
+def used_feature_indices(model):
+    return np.flatnonzero(model.booster_.feature_importance(importance_type="split") > 0)
+
+# Đổi chỉ số cột trong model dạng text của LightGBM: cột feature_indices[i] thành cột i.
+# Bỏ dòng tree_sizes vì độ dài các cây thay đổi, LightGBM vẫn đọc được model không có dòng này
+def remap_model_string(model_string, feature_indices):
+    new_index = {int(old_index): new_index for new_index, old_index in enumerate(feature_indices)}
+    old_feature_infos = None
+    lines = []
+    for line in model_string.split("\n"):
+        key, _, value = line.partition("=")
+        if key == "max_feature_idx":
+            line = f"max_feature_idx={len(feature_indices) - 1}"
+        elif key == "feature_names":
+            line = "feature_names=" + " ".join(f"Column_{index}" for index in range(len(feature_indices)))
+        elif key == "feature_infos":
+            old_feature_infos = value.split(" ")
+            line = "feature_infos=" + " ".join(old_feature_infos[index] for index in feature_indices)
+        elif key == "tree_sizes":
+            continue
+        elif key == "split_feature":
+            line = "split_feature=" + " ".join(str(new_index[int(index)]) for index in value.split(" "))
+        elif key.startswith("Column_") and value.isdigit():
+            # Mục trong phần feature_importances ở cuối model
+            line = f"Column_{new_index[int(key[len('Column_'):])]}={value}"
+        lines.append(line)
+
+    if old_feature_infos is None:
+        raise ValueError("Model không có dòng feature_infos")
+    return "\n".join(lines)
+
+# LGBMClassifier dùng booster đã đổi chỉ số cột, các thuộc tính khác (classes_, tham số) giữ nguyên
+def compact_model(model, feature_indices):
+    booster = lightgbm.Booster(model_str=remap_model_string(model.booster_.model_to_string(), feature_indices))
+    compact = copy.copy(model)
+    compact._Booster = booster
+    compact._n_features = len(feature_indices)
+    compact._n_features_in = len(feature_indices)
+    return compact
+
+def compact_vectorizer(vectorizer, feature_indices):
+    n_features = len(vectorizer.vocabulary_)
+    unused_indices = np.setdiff1d(np.arange(n_features), feature_indices)
+    order = np.concatenate([feature_indices, unused_indices])
+    new_index = np.empty(n_features, dtype=int)
+    new_index[order] = np.arange(n_features)
+
+    compact = CompactTfidfVectorizer(**vectorizer.get_params())
+    compact.vocabulary_ = {term: int(new_index[index]) for term, index in vectorizer.vocabulary_.items()}
+    compact.fixed_vocabulary_ = vectorizer.fixed_vocabulary_
+    compact.idf_ = vectorizer.idf_[order]
+    compact.n_used_features_ = len(feature_indices)
+    return compact
+
+def read_validation_texts(file_path=VALIDATION_FILE, columns=VALIDATION_COLUMNS):
+    data = pd.read_csv(file_path, usecols=lambda column: column in columns)
+    texts = pd.concat([data[column] for column in data.columns], ignore_index=True).dropna().astype(str)
+    return list(dict.fromkeys(texts))
+
+# Số bình luận có xác suất dự đoán khác nhau giữa cặp gốc và cặp rút gọn
+def count_mismatches(model, vectorizer, compact_model, compact_vectorizer, texts):
+    probabilities = model.predict_proba(vectorizer.transform(texts))
+    compact_probabilities = compact_model.predict_proba(compact_vectorizer.transform(texts))
+    return int((probabilities != compact_probabilities).any(axis=1).sum())
+
+# Ghi ra file tạm rồi đổi tên để app không bao giờ đọc phải file đang ghi dở
+def write_pickle(artifact, file_path):
+    temporary_path = file_path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        pickle.dump(artifact, file)
+    os.replace(temporary_path, file_path)
+
+def write_json(content, file_path):
+    temporary_path = file_path + ".tmp"
+    with open(temporary_path, "w", encoding="utf-8") as file:
+        json.dump(content, file, indent=2)
+    os.replace(temporary_path, file_path)
+
+# Rút gọn cặp vectorizer và model, chỉ ghi file khi cặp rút gọn cho cùng kết quả trên mọi bình luận kiểm tra.
+# Hash của cặp gốc được ghi vào source_file sau cùng: app chỉ dùng cặp rút gọn khi hash này khớp với cặp gốc hiện tại,
+# nên train lại hoặc thay model gốc mà chưa chạy lại công cụ này thì app quay về dùng cặp gốc
+def compact_pair(model_file, vectorizer_file, output_model_file, output_vectorizer_file, validation_texts, source_file=COMPACT_SOURCE_FILE):
+    model = read_pickle(model_file)
+    vectorizer = read_pickle(vectorizer_file)
+    feature_indices = used_feature_indices(model)
+    compact = compact_model(model, feature_indices)
+    compact_tfidf = compact_vectorizer(vectorizer, feature_indices)
+
+    mismatches = count_mismatches(model, vectorizer, compact, compact_tfidf, validation_texts)
+    print(f"Model dùng {len(feature_indices):,} / {len(vectorizer.vocabulary_):,} cột TF-IDF")
+    print(f"Kiểm tra trên {len(validation_texts):,} bình luận: {mismatches:,} bình luận có kết quả khác")
+    if mismatches:
+        raise ValueError("Cặp model rút gọn cho kết quả khác cặp gốc, không ghi file")
+
+    if os.path.exists(source_file):
+        os.remove(source_file)
+    write_pickle(compact_tfidf, output_vectorizer_file)
+    write_pickle(compact, output_model_file)
+    write_json({"source_version": model_source_version(model_file, vectorizer_file), "model": model_file, "vectorizer": vectorizer_file}, source_file)
+    for file_path in (output_vectorizer_file, output_model_file):
+        print(f"{file_path}: {os.path.getsize(file_path) / 1024:.0f} KiB")
+    return compact, compact_tfidf
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rút gọn vectorizer TF-IDF và model LightGBM về các cột model thực sự dùng. "
+                                                 "App chỉ dùng cặp rút gọn khi đặt HASAKI_COMPACT_MODEL=1")
+    parser.add_argument("--model", default=MODEL_FILE)
+    parser.add_argument("--vectorizer", default=VECTORIZER_FILE)
+    parser.add_argument("--output-model", default=COMPACT_MODEL_FILE)
+    parser.add_argument("--output-vectorizer", default=COMPACT_VECTORIZER_FILE)
+    parser.add_argument("--output-source", default=COMPACT_SOURCE_FILE, help="File ghi hash của cặp gốc, app dùng để phát hiện cặp rút gọn đã cũ")
+    parser.add_argument("--validation-file", default=VALIDATION_FILE, help="File csv có các cột văn bản đã chuẩn hoá dùng để kiểm tra")
+    parser.add_argument("--columns", nargs="+", default=VALIDATION_COLUMNS, help="Các cột văn bản đã chuẩn hoá trong file kiểm tra")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        validation_texts = read_validation_texts(args.validation_file, args.columns)
+        compact_pair(args.model, args.vectorizer, args.output_model, args.output_vectorizer, validation_texts, args.output_source)
+    except (ValueError, KeyError, OSError) as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    # Chạy main của module được import theo tên thật, nếu không CompactTfidfVectorizer được pickle
+    # thành __main__.CompactTfidfVectorizer và app không nạp lại được
+    import hasaki_sentiment_analysis_model_compaction
+    sys.exit(hasaki_sentiment_analysis_model_compaction.main())
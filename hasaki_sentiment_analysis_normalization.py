@@ -0,0 +1,54 @@
+import re
+import time
+
+from hasaki_sentiment_analysis_registry import registry
+
+# Gộp hai lượt re.sub bỏ dấu câu và bỏ chữ số thành một lượt: cả hai đều chỉ xoá ký tự
+# nên xoá cùng lúc cho kết quả giống hệt xoá lần lượt
+STRIP_CHARACTERS_PATTERN = re.compile(r'[^\w\s]|\d')
+
+NORMALIZATION_STAGES = ("lower", "text_normalize", "strip_characters", "lexicon_lookup")
+
+# Gộp ba từ điển emoji -> tiếng Anh -> teencode thành một lần tra cứu,
+# giá trị là kết quả sau khi áp dụng lần lượt cả ba từ điển như normalize_text_manually
+def build_normalization_lookup():
+    emojicon_dict = registry.get("emojicon_dict")
+    english_vnmese_dict = registry.get("english_vnmese_dict")
+    teencode_dict = registry.get("teencode_dict")
+
+    lookup = {}
+    for word in set(emojicon_dict) | set(english_vnmese_dict) | set(teencode_dict):
+        replaced_word = emojicon_dict.get(word, word)
+        replaced_word = english_vnmese_dict.get(replaced_word, replaced_word)
+        replaced_word = teencode_dict.get(replaced_word, replaced_word)
+        if replaced_word != word:
+            lookup[word] = replaced_word
+    return lookup
+
+registry.register("normalization_lookup", build_normalization_lookup)
+
+# Chuẩn hoá cả một batch bình luận (list, numpy array hoặc pandas Series), mỗi bước chạy
+# trên toàn bộ batch. Kết quả giống normalize_text_manually; word_tokenize không được gọi
+# vì kết quả của nó vốn bị bỏ đi trong hàm cũ. Truyền stage_times (dict) để cộng dồn thời gian từng bước
+def normalize_texts(texts, stage_times=None):
+    underthesea = registry.get("underthesea")
+    lookup = registry.get("normalization_lookup")
+    text_normalize = underthesea.text_normalize
+    strip_characters = STRIP_CHARACTERS_PATTERN.sub
+
+    def run_stage(name, function, values):
+        start = time.perf_counter()
+        result = [function(value) for value in values]
+        if stage_times is not None:
+            stage_times[name] = stage_times.get(name, 0.0) + time.perf_counter() - start
+        return result
+
+    values = run_stage("lower", str.lower, texts)
+    values = run_stage("text_normalize", text_normalize, values)
+    values = run_stage("strip_characters", lambda value: strip_characters('', value), values)
+
+    # split() không tham số tách theo đúng các ký tự \s, nên tương đương re.sub(r'\s+', ' ').strip().split()
+    lookup_get = lookup.get
+    values = run_stage("lexicon_lookup", lambda value: ' '.join([lookup_get(word, word) for word in value.split()]), values)
+
+    return values
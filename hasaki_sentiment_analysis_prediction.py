@@ -2,61 +2,81 @@ import pandas as pd
 import numpy as np
 import re
 import os
-import pickle
-import lightgbm as lgb
-
-from sklearn.feature_extraction.text import TfidfVectorizer
-from underthesea import text_normalize, word_tokenize
-from sklearn.preprocessing import LabelEncoder
-
-TOOLS_FOLDER = "data/tools/"
-
-# Đọc nội dung từ các file văn bản
-def read_file_to_list(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-        return [line.strip() for line in lines]
-    except FileNotFoundError:
-        print(f"Error: File not found at {file_path}")
-        return []
-
-EMOJICON_LIST = read_file_to_list(TOOLS_FOLDER + "emojicon.txt")
-ENGLISH_VNMESE_LIST = read_file_to_list(TOOLS_FOLDER + "english-vnmese.txt")
-TEENCODE_LIST = read_file_to_list(TOOLS_FOLDER + "teencode.txt")
-VIETNAMESE_STOPWORDS_LIST = read_file_to_list(TOOLS_FOLDER + "vietnamese-stopwords.txt")
-WRONG_WORD_LIST = set(read_file_to_list(TOOLS_FOLDER + "wrong-word.txt"))
-
-# Chuyển đổi danh sách bằng cách tách dòng theo dấu \t
-EMOJICON_DICT = {emoji.split('\t')[0]:emoji.split('\t')[1] for emoji in EMOJICON_LIST}
-ENGLISH_VNMESE_DICT = {vnmese.split('\t')[0]:vnmese.split('\t')[1] for vnmese in ENGLISH_VNMESE_LIST}
-TEENCODE_DICT = {teen.split('\t')[0]:teen.split('\t')[1] for teen in TEENCODE_LIST}
-
-# load models
-with open("models/model_lgb_weighted.pkl", "rb") as model_file:
-    model_lgb = pickle.load(model_file)
-
-with open("models/vectorizer.pkl", "rb") as vectorizer_file:
-    tfidf_vectorizer = pickle.load(vectorizer_file)
-
-with open("models/label_encoder.pkl", "rb") as label_encoder_file:
-    label_encoder = pickle.load(label_encoder_file)
+import threading
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+from hasaki_sentiment_analysis_data import hash_files
+from hasaki_sentiment_analysis_metrics import metrics, BATCH_SIZE_BUCKETS
+from hasaki_sentiment_analysis_profiling import profiled
+from hasaki_sentiment_analysis_prediction_cache import PredictionCache, PREDICTION_CACHE_SIZE
+from hasaki_sentiment_analysis_normalization import normalize_texts
+from hasaki_sentiment_analysis_registry import registry, serving_model_files, TOOLS_FOLDER, MODEL_FILE, VECTORIZER_FILE, LABEL_ENCODER_FILE
+
+# Số process dùng để tiền xử lý song song, cấu hình qua biến môi trường HASAKI_PREPROCESS_WORKERS
+PREPROCESS_WORKERS = int(os.environ.get("HASAKI_PREPROCESS_WORKERS", os.cpu_count() or 1))
+# Số bình luận trong mỗi chunk gửi sang một worker
+PREPROCESS_CHUNK_SIZE = 500
+# Batch nhỏ hơn ngưỡng này chạy tuần tự vì chi phí gửi dữ liệu sang worker lớn hơn lợi ích
+PARALLEL_PREPROCESS_MIN_TEXTS = 2000
+
+PREDICT_SECONDS = metrics.histogram("hasaki_predict_seconds", "Thời gian một lần gọi predict_sentiment")
+PREDICT_STAGE_SECONDS = metrics.histogram("hasaki_predict_stage_seconds", "Thời gian từng bước của predict_sentiment", ["stage"])
+# Với pool nhiều worker đây là tổng thời gian của các worker, không phải thời gian chờ thực tế
+NORMALIZATION_STAGE_SECONDS = metrics.histogram("hasaki_normalization_stage_seconds", "Thời gian từng bước chuẩn hoá trong một batch", ["stage"])
+PREDICT_BATCH_SIZE = metrics.histogram("hasaki_predict_batch_size", "Số bình luận trong một lần gọi predict_sentiment", buckets=BATCH_SIZE_BUCKETS)
+PREDICTED_TEXTS = metrics.counter("hasaki_predicted_texts_total", "Số bình luận đã trả kết quả, theo nguồn kết quả", ["source"])
+
+# Tên cũ của các lexicon và model, giờ được nạp lười qua registry khi truy cập lần đầu
+_REGISTRY_ATTRIBUTES = {
+    "EMOJICON_LIST": "emojicon_list",
+    "ENGLISH_VNMESE_LIST": "english_vnmese_list",
+    "TEENCODE_LIST": "teencode_list",
+    "VIETNAMESE_STOPWORDS_LIST": "vietnamese_stopwords_list",
+    "WRONG_WORD_LIST": "wrong_word_list",
+    "EMOJICON_DICT": "emojicon_dict",
+    "ENGLISH_VNMESE_DICT": "english_vnmese_dict",
+    "TEENCODE_DICT": "teencode_dict",
+    "model_lgb": "model_lgb",
+    "tfidf_vectorizer": "tfidf_vectorizer",
+    "label_encoder": "label_encoder",
+}
+
+def __getattr__(name):
+    if name in _REGISTRY_ATTRIBUTES:
+        return registry.get(_REGISTRY_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Các file quyết định kết quả dự đoán, dùng để tính version cho cache. Luôn gồm model và vectorizer gốc,
+# thêm cặp rút gọn khi đang dùng cặp đó. Chỉ gọi khi tạo cache để import module không phải hash file model
+def prediction_version_files():
+    return list(dict.fromkeys([
+        MODEL_FILE, VECTORIZER_FILE, *serving_model_files(), LABEL_ENCODER_FILE,
+        TOOLS_FOLDER + "emojicon.txt", TOOLS_FOLDER + "english-vnmese.txt", TOOLS_FOLDER + "teencode.txt",
+    ]))
 
 # Sử dụng normalize_text chuẩn hoá dữ liệu, chuyển thành chữ thường và bỏ các kí tự đặc biệt
 def normalize_text_manually(text):
+    underthesea = registry.get("underthesea")
+
     text = text.lower()
-    text = text_normalize(text)
+    text = underthesea.text_normalize(text)
     text = re.sub(r'[^\w\s]', '', text)
     text = re.sub(r'\d+', '', text)
     text = re.sub(r'\s+', ' ', text).strip()
 
+    emojicon_dict = registry.get("emojicon_dict")
+    english_vnmese_dict = registry.get("english_vnmese_dict")
+    teencode_dict = registry.get("teencode_dict")
+
     words = text.split()
-    replace_emoji_words = [EMOJICON_DICT.get(word, word) for word in words]
+    replace_emoji_words = [emojicon_dict.get(word, word) for word in words]
     text = " ".join(words)
 
-    words = word_tokenize(text)
-    replace_vnmese_words = [ENGLISH_VNMESE_DICT.get(word, word) for word in replace_emoji_words]
-    replace_teencode_words = [TEENCODE_DICT.get(word, word) for word in replace_vnmese_words]
+    words = underthesea.word_tokenize(text)
+    replace_vnmese_words = [english_vnmese_dict.get(word, word) for word in replace_emoji_words]
+    replace_teencode_words = [teencode_dict.get(word, word) for word in replace_vnmese_words]
 
     return ' '.join(replace_teencode_words)
 
@@ -64,22 +84,148 @@ def preprocess_text(text):
     text = normalize_text_manually(text)
     return text
 
-def predict_sentiment(text):
-    original_text = text[:]
-
-    for i in range(len(text)):
-        text[i] = preprocess_text(text[i])
-    text = tfidf_vectorizer.transform(text)
-    prediction = model_lgb.predict(text)
-    prediction = label_encoder.inverse_transform(prediction)
+# ======= Tiền xử lý song song =======
+# Mỗi số worker có pool riêng: đổi số worker không tắt pool mà lời gọi khác có thể đang dùng
+_preprocess_pools = {}
+_preprocess_pool_lock = threading.Lock()
+
+# Chạy một lần trong mỗi worker: chuẩn hoá thử để nạp underthesea và lexicon trước khi nhận chunk đầu tiên
+def _init_preprocess_worker():
+    normalize_texts(["khởi tạo"])
+
+# Mỗi chunk được chuẩn hoá cả batch một lượt, cho kết quả giống preprocess_text từng dòng.
+# Trả về kèm thời gian từng bước chuẩn hoá để process chính ghi nhận
+def _preprocess_chunk(texts):
+    stage_times = {}
+    return normalize_texts(texts, stage_times), stage_times
+
+def record_normalization_times(stage_times):
+    for stage, seconds in stage_times.items():
+        NORMALIZATION_STAGE_SECONDS.observe(seconds, stage=stage)
+
+# Pool được tạo một lần và dùng lại giữa các lần gọi. Dùng "spawn" vì server Streamlit
+# chạy nhiều thread, fork một process nhiều thread có thể bị treo
+def get_preprocess_pool(n_workers):
+    with _preprocess_pool_lock:
+        if n_workers not in _preprocess_pools:
+            _preprocess_pools[n_workers] = ProcessPoolExecutor(
+                max_workers=n_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_preprocess_worker,
+            )
+        return _preprocess_pools[n_workers]
+
+def shutdown_preprocess_pool():
+    with _preprocess_pool_lock:
+        pools = list(_preprocess_pools.values())
+        _preprocess_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+# Tiền xử lý cả batch: chia thành các chunk chạy trên pool, kết quả giữ đúng thứ tự đầu vào
+def preprocess_texts(texts, n_workers=None, chunk_size=PREPROCESS_CHUNK_SIZE):
+    texts = list(texts)
+    if n_workers is None:
+        n_workers = PREPROCESS_WORKERS
+
+    if n_workers <= 1 or len(texts) < PARALLEL_PREPROCESS_MIN_TEXTS:
+        preprocessed_texts, stage_times = _preprocess_chunk(texts)
+        record_normalization_times(stage_times)
+        return preprocessed_texts
+
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    pool = get_preprocess_pool(n_workers)
+
+    preprocessed_texts = []
+    total_stage_times = {}
+    for preprocessed_chunk, stage_times in pool.map(_preprocess_chunk, chunks):
+        preprocessed_texts.extend(preprocessed_chunk)
+        for stage, seconds in stage_times.items():
+            total_stage_times[stage] = total_stage_times.get(stage, 0.0) + seconds
+    record_normalization_times(total_stage_times)
+    return preprocessed_texts
+
+# ======= Cache kết quả dự đoán =======
+_prediction_cache = None
+_prediction_cache_lock = threading.Lock()
+
+def get_prediction_cache():
+    global _prediction_cache
+
+    if PREDICTION_CACHE_SIZE <= 0:
+        return None
+
+    with _prediction_cache_lock:
+        if _prediction_cache is None:
+            _prediction_cache = PredictionCache(hash_files(prediction_version_files()))
+        return _prediction_cache
+
+def prediction_cache_lookups():
+    if _prediction_cache is None:
+        return {}
+    cache_stats = _prediction_cache.stats()
+    return {("hit",): cache_stats["hits"], ("miss",): cache_stats["misses"]}
+
+metrics.callback("hasaki_prediction_cache_lookups_total", "Số lần tra cache kết quả dự đoán", "counter", prediction_cache_lookups, ["result"])
+
+def predict_sentiment_uncached(texts, n_workers=None):
+    with PREDICT_STAGE_SECONDS.time(stage="preprocess"):
+        normalized_texts = preprocess_texts(texts, n_workers=n_workers)
+    return normalized_texts, predict_normalized_labels(normalized_texts)
+
+# Nhãn sentiment của các bình luận đã chuẩn hoá
+def predict_normalized_labels(normalized_texts):
+    if not normalized_texts:
+        return []
 
-    result_df = pd.DataFrame({
-        'noi_dung_binh_luan': original_text,
-        'sentiment': prediction
-    })
+    with PREDICT_STAGE_SECONDS.time(stage="tfidf_transform"):
+        features = registry.get("tfidf_vectorizer").transform(normalized_texts)
+    with PREDICT_STAGE_SECONDS.time(stage="model_predict"):
+        prediction = registry.get("model_lgb").predict(features)
+    with PREDICT_STAGE_SECONDS.time(stage="label_decode"):
+        labels = registry.get("label_encoder").inverse_transform(prediction)
+    return [str(label) for label in labels]
+
+@profiled("predict")
+@PREDICT_SECONDS.timed()
+def predict_sentiment(text, n_workers=None, use_cache=True):
+    original_text = list(text)
+    PREDICT_BATCH_SIZE.observe(len(original_text))
+
+    # Mức 1: mỗi bình luận giống nhau trong batch chỉ xử lý một lần
+    unique_texts = list(dict.fromkeys(original_text))
+
+    # Mức 2: bình luận đã gặp ở các lần trước lấy thẳng từ cache, bỏ qua underthesea, TF-IDF và LightGBM
+    cache = get_prediction_cache() if use_cache else None
+    cached = {}
+    if cache is not None:
+        cache.record_batch_duplicates(len(original_text) - len(unique_texts))
+        with PREDICT_STAGE_SECONDS.time(stage="cache_lookup"):
+            cached = cache.get_many(unique_texts)
+
+    missing_texts = [text for text in unique_texts if text not in cached]
+    normalized_texts, labels = predict_sentiment_uncached(missing_texts, n_workers=n_workers)
+    PREDICTED_TEXTS.inc(len(missing_texts), source="model")
+    PREDICTED_TEXTS.inc(len(cached), source="cache")
+    PREDICTED_TEXTS.inc(len(original_text) - len(unique_texts), source="batch_duplicate")
+
+    label_by_text = {text: label for text, (_, label) in cached.items()}
+    label_by_text.update(zip(missing_texts, labels))
+
+    if cache is not None and missing_texts:
+        with PREDICT_STAGE_SECONDS.time(stage="cache_store"):
+            cache.put_many(zip(missing_texts, normalized_texts, labels))
+
+    with PREDICT_STAGE_SECONDS.time(stage="build_result"):
+        prediction = [label_by_text[text] for text in original_text]
+
+        result_df = pd.DataFrame({
+            'noi_dung_binh_luan': original_text,
+            'sentiment': prediction
+        })
     return result_df
 
 if __name__ == "__main__":
-    sample_text = "Sản phẩm này dùng không tốt"
+    sample_text = ["Sản phẩm này dùng không tốt"]
     sentiment = predict_sentiment(sample_text)
     print(f"The predicted sentiment is: {sentiment}")
\ No newline at end of file
@@ -0,0 +1,107 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+PREDICTION_CACHE_FILE = "data/cache/predictions.sqlite3"
+# Số bình luận tối đa lưu trong cache, đặt HASAKI_PREDICTION_CACHE_SIZE=0 để tắt cache
+PREDICTION_CACHE_SIZE = int(os.environ.get("HASAKI_PREDICTION_CACHE_SIZE", 200_000))
+# SQLite giới hạn số tham số trong một câu lệnh nên tra cứu theo từng lô
+_SQLITE_BATCH_SIZE = 500
+
+# Cache LRU trên đĩa lưu văn bản đã chuẩn hoá và nhãn dự đoán của từng bình luận.
+# Khoá là hash của version (model, vectorizer, lexicon) cùng nội dung bình luận gốc,
+# nên khi đổi model hoặc lexicon thì các kết quả cũ tự động không còn được dùng
+class PredictionCache:
+    def __init__(self, version, file_path=PREDICTION_CACHE_FILE, max_entries=PREDICTION_CACHE_SIZE):
+        self.version = version
+        self.file_path = file_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.batch_duplicates = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        self._connection = sqlite3.connect(file_path, check_same_thread=False, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "key TEXT PRIMARY KEY, normalized_text TEXT NOT NULL, label TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS predictions_last_used ON predictions (last_used)")
+        self._connection.commit()
+
+    def make_key(self, text):
+        return hashlib.sha256((self.version + "\0" + text).encode('utf-8')).hexdigest()
+
+    # Trả về dict {bình luận: (văn bản đã chuẩn hoá, nhãn)} cho các bình luận có trong cache
+    def get_many(self, texts):
+        keys = {self.make_key(text): text for text in texts}
+        found = {}
+        hit_keys = []
+
+        with self._lock:
+            key_list = list(keys)
+            for i in range(0, len(key_list), _SQLITE_BATCH_SIZE):
+                batch = key_list[i:i + _SQLITE_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT key, normalized_text, label FROM predictions WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, normalized_text, label in rows:
+                    found[keys[key]] = (normalized_text, label)
+                    hit_keys.append(key)
+
+            # Cập nhật thời điểm dùng gần nhất để LRU giữ lại các bình luận hay lặp lại
+            now = time.time()
+            self._connection.executemany("UPDATE predictions SET last_used = ? WHERE key = ?", [(now, key) for key in hit_keys])
+            self._connection.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return found
+
+    # entries: danh sách (bình luận, văn bản đã chuẩn hoá, nhãn)
+    def put_many(self, entries):
+        now = time.time()
+        rows = [(self.make_key(text), normalized_text, label, now) for text, normalized_text, label in entries]
+
+        with self._lock:
+            self._connection.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)", rows)
+            self._evict()
+            self._connection.commit()
+
+    # Xoá các bình luận lâu không dùng nhất khi cache vượt quá giới hạn
+    def _evict(self):
+        (num_entries,) = self._connection.execute("SELECT COUNT(*) FROM predictions").fetchone()
+        num_evicted = num_entries - self.max_entries
+        if num_evicted > 0:
+            self._connection.execute(
+                "DELETE FROM predictions WHERE key IN (SELECT key FROM predictions ORDER BY last_used LIMIT ?)",
+                (num_evicted,),
+            )
+
+    def record_batch_duplicates(self, num_duplicates):
+        with self._lock:
+            self.batch_duplicates += num_duplicates
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "batch_duplicates": self.batch_duplicates,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM predictions")
+            self._connection.commit()
+            self.hits = 0
+            self.misses = 0
+            self.batch_duplicates = 0
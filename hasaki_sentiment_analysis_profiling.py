@@ -0,0 +1,159 @@
+import cProfile
+import functools
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+# Các mục tiêu được profile ở mọi lần gọi, vd. HASAKI_PROFILE=page,predict
+# (page: một lần rerun của main_content, predict: một lần gọi predict_sentiment)
+PROFILE_TARGETS = {target.strip() for target in os.environ.get("HASAKI_PROFILE", "").split(",") if target.strip()}
+# Đặt HASAKI_PROFILE_QUERY=1 để cho phép bật profile cho từng trang bằng query ?profile=page hoặc ?profile=predict
+PROFILE_QUERY_ENABLED = os.environ.get("HASAKI_PROFILE_QUERY", "0") == "1"
+PROFILE_FOLDER = os.environ.get("HASAKI_PROFILE_DIR", "data/cache/profiles/")
+# Số dòng code cấp phát nhiều bộ nhớ nhất được ghi lại
+PROFILE_TOP_ALLOCATIONS = 30
+# Số frame lưu cho mỗi lần cấp phát, đủ để thấy hàm nào của app đã gọi vào thư viện
+TRACEMALLOC_FRAMES = 10
+# Bỏ các nhánh flamegraph chiếm ít hơn tỉ lệ này của tổng thời gian, giữ file collapsed ở cỡ vài nghìn dòng
+MIN_STACK_FRACTION = 0.0001
+
+# tracemalloc theo dõi toàn process nên mỗi lúc chỉ profile một lời gọi,
+# lời gọi đến sau trong lúc đang profile (vd. predict_sentiment bên trong trang đang profile) chạy bình thường
+_profile_lock = threading.Lock()
+# Mục tiêu được yêu cầu qua query cho lần rerun hiện tại, riêng cho thread script của mỗi session
+_requests = threading.local()
+
+def is_profiling_available(target):
+    return target in PROFILE_TARGETS or PROFILE_QUERY_ENABLED
+
+# Ghi nhận các mục tiêu cần profile trong lần rerun này (giá trị lấy từ query ?profile=...)
+def request_profile(targets):
+    _requests.targets = {target.strip() for target in targets} if PROFILE_QUERY_ENABLED else set()
+
+def clear_profile_requests():
+    _requests.targets = set()
+
+# Mỗi yêu cầu chỉ áp dụng cho một lần gọi
+def take_profile_request(target):
+    targets = getattr(_requests, "targets", None)
+    if not targets or target not in targets:
+        return False
+    targets.discard(target)
+    return True
+
+def function_label(function_key):
+    file_name, line_number, function_name = function_key
+    if file_name == "~":
+        # Hàm built-in, vd. <method 'transform' of ...>
+        return function_name.replace(";", ",")
+    return f"{os.path.basename(file_name)}:{line_number}({function_name})".replace(";", ",")
+
+# Dựng collapsed stack (định dạng của flamegraph.pl / speedscope) từ số liệu cProfile.
+# cProfile chỉ lưu cặp hàm gọi -> hàm được gọi nên thời gian của một hàm được chia cho các nhánh
+# theo tỉ lệ thời gian mà từng hàm gọi nó đóng góp
+def collapsed_stacks(stats):
+    callees = {}
+    for function_key, (_, _, _, _, callers) in stats.items():
+        for caller_key in callers:
+            callees.setdefault(caller_key, []).append(function_key)
+
+    roots = [function_key for function_key, (_, _, _, _, callers) in stats.items() if not callers]
+    min_seconds = sum(inline_seconds for _, _, inline_seconds, _, _ in stats.values()) * MIN_STACK_FRACTION
+    stacks = {}
+
+    def walk(function_key, path, share):
+        inline_seconds = stats[function_key][2] * share
+        path = path + (function_key,)
+        if inline_seconds >= min_seconds:
+            stack = ";".join(function_label(key) for key in path)
+            stacks[stack] = stacks.get(stack, 0) + inline_seconds
+
+        for callee_key in callees.get(function_key, ()):
+            if callee_key in path:
+                continue
+            callee_total_seconds = stats[callee_key][3]
+            seconds_from_caller = stats[callee_key][4][function_key][3] * share
+            if callee_total_seconds <= 0 or seconds_from_caller < min_seconds:
+                continue
+            walk(callee_key, path, min(seconds_from_caller / callee_total_seconds, 1.0))
+
+    for root_key in roots:
+        walk(root_key, (), 1.0)
+    # Giá trị của mỗi stack tính bằng micro giây
+    return [f"{stack} {round(seconds * 1e6)}" for stack, seconds in stacks.items() if round(seconds * 1e6) > 0]
+
+def top_allocations(snapshot, limit=PROFILE_TOP_ALLOCATIONS):
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ])
+    lines = []
+    for statistic in snapshot.statistics("traceback")[:limit]:
+        lines.append(f"{statistic.size / 1024:.1f} KiB trong {statistic.count} khối")
+        lines += [f"    {line}" for line in statistic.traceback.format(most_recent_first=True)]
+    return lines
+
+# Ghi ba file cùng tên gốc: .prof (mở bằng snakeviz/pstats), .collapsed (flamegraph) và .alloc.txt
+def write_profile(target, profiler, snapshot, seconds, peak_bytes, folder=PROFILE_FOLDER):
+    os.makedirs(folder, exist_ok=True)
+    base_path = os.path.join(folder, f"{time.strftime('%Y%m%d-%H%M%S')}-{target}-{os.getpid()}-{threading.get_ident()}")
+
+    profiler.dump_stats(base_path + ".prof")
+    stats = pstats.Stats(profiler).stats
+    with open(base_path + ".collapsed", "w", encoding="utf-8") as file:
+        file.write("\n".join(collapsed_stacks(stats)) + "\n")
+    with open(base_path + ".alloc.txt", "w", encoding="utf-8") as file:
+        file.write(f"{target}: {seconds * 1000:.1f} ms, đỉnh bộ nhớ Python được theo dõi {peak_bytes / 2**20:.1f} MB\n\n")
+        file.write("\n".join(top_allocations(snapshot)) + "\n")
+    return base_path
+
+# Chạy function dưới cProfile và tracemalloc, lỗi khi ghi file profile không làm hỏng kết quả của function
+def run_profiled(target, function, args, kwargs):
+    if not _profile_lock.acquire(blocking=False):
+        return function(*args, **kwargs)
+
+    try:
+        tracing_before = tracemalloc.is_tracing()
+        if not tracing_before:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.disable()
+        finally:
+            seconds = time.perf_counter() - start
+            snapshot = tracemalloc.take_snapshot()
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            if not tracing_before:
+                tracemalloc.stop()
+            try:
+                base_path = write_profile(target, profiler, snapshot, seconds, peak_bytes)
+                print(f"Profile {target} ({seconds * 1000:.0f} ms): {base_path}.*")
+            except OSError as error:
+                print(f"Không ghi được profile {target}: {error}")
+    finally:
+        _profile_lock.release()
+
+# Decorator profile một mục tiêu. Khi mục tiêu không được bật bằng HASAKI_PROFILE và không cho phép
+# bật qua query, hàm gốc được trả về nguyên vẹn nên không tốn thêm gì
+def profiled(target):
+    def decorator(function):
+        if not is_profiling_available(target):
+            return function
+
+        always = target in PROFILE_TARGETS
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if always or take_profile_request(target):
+                return run_profiled(target, function, args, kwargs)
+            return function(*args, **kwargs)
+        return wrapper
+    return decorator
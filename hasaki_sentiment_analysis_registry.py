@@ -0,0 +1,150 @@
+import functools
+import importlib
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+
+from hasaki_sentiment_analysis_data import hash_files
+from hasaki_sentiment_analysis_metrics import metrics
+
+TOOLS_FOLDER = "data/tools/"
+
+MODEL_FILE = "models/model_lgb_weighted.pkl"
+VECTORIZER_FILE = "models/vectorizer.pkl"
+LABEL_ENCODER_FILE = "models/label_encoder.pkl"
+# Cặp vectorizer và model chỉ giữ các cột TF-IDF model thực sự dùng, tạo bằng hasaki_sentiment_analysis_model_compaction
+COMPACT_MODEL_FILE = "models/model_lgb_compact.pkl"
+COMPACT_VECTORIZER_FILE = "models/vectorizer_compact.pkl"
+# Hash của cặp model và vectorizer gốc mà cặp rút gọn được tạo từ đó
+COMPACT_SOURCE_FILE = "models/compact_source.json"
+# Mặc định app dùng cặp gốc. Cặp rút gọn cho cùng kết quả và giảm ma trận đặc trưng đưa vào model,
+# nhưng vẫn phải giữ toàn bộ từ vựng để chuẩn hoá l2 nên thời gian dự đoán gần như không đổi.
+# Đặt HASAKI_COMPACT_MODEL=1 để dùng cặp rút gọn
+USE_COMPACT_MODEL = os.environ.get("HASAKI_COMPACT_MODEL", "0") == "1"
+
+ARTIFACT_LOAD_SECONDS = metrics.histogram("hasaki_artifact_load_seconds", "Thời gian nạp từng artifact (model, lexicon, dữ liệu, chỉ mục)", ["artifact"])
+
+# Quản lý model và lexicon: chỉ nạp khi được dùng lần đầu, an toàn khi nhiều thread cùng gọi,
+# và ghi lại thời gian nạp của từng artifact
+class ArtifactRegistry:
+    def __init__(self):
+        self._loaders = {}
+        self._artifacts = {}
+        self._load_seconds = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader):
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks[name] = threading.Lock()
+
+    def get(self, name):
+        # Đường nhanh khi artifact đã được nạp, không cần khoá
+        try:
+            return self._artifacts[name]
+        except KeyError:
+            pass
+
+        # Mỗi artifact có khoá riêng để các artifact khác nhau có thể nạp song song
+        with self._locks[name]:
+            if name not in self._artifacts:
+                start = time.perf_counter()
+                artifact = self._loaders[name]()
+                self._load_seconds[name] = time.perf_counter() - start
+                ARTIFACT_LOAD_SECONDS.observe(self._load_seconds[name], artifact=name)
+                self._artifacts[name] = artifact
+        return self._artifacts[name]
+
+    # Thay artifact đã nạp bằng bản mới (vd. khi có thêm dữ liệu), các lần get sau nhận bản mới
+    def replace(self, name, artifact):
+        with self._locks[name]:
+            self._artifacts[name] = artifact
+
+    def is_loaded(self, name):
+        return name in self._artifacts
+
+    def names(self):
+        return list(self._loaders)
+
+    def load_times(self):
+        return dict(self._load_seconds)
+
+    def warmup(self, names=None):
+        for name in names or self.names():
+            self.get(name)
+        return self.load_times()
+
+    # Nạp trước các artifact ở thread nền để request đầu tiên không phải chờ
+    def warmup_in_background(self, names=None):
+        thread = threading.Thread(target=self.warmup, args=(names,), name="artifact-warmup", daemon=True)
+        thread.start()
+        return thread
+
+# Đọc nội dung từ các file văn bản
+def read_file_to_list(file_path):
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            lines = file.readlines()
+        return [line.strip() for line in lines]
+    except FileNotFoundError:
+        print(f"Error: File not found at {file_path}")
+        return []
+
+# Chuyển đổi danh sách bằng cách tách dòng theo dấu \t
+def list_to_dict(lines):
+    return {line.split('\t')[0]:line.split('\t')[1] for line in lines}
+
+def read_pickle(file_path):
+    with open(file_path, "rb") as file:
+        return pickle.load(file)
+
+def model_source_version(model_file=MODEL_FILE, vectorizer_file=VECTORIZER_FILE):
+    return hash_files([model_file, vectorizer_file])
+
+def read_compact_source_version():
+    try:
+        with open(COMPACT_SOURCE_FILE, "r", encoding="utf-8") as file:
+            return json.load(file).get("source_version")
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+# Model và vectorizer phải đi cùng nhau: chỉ dùng cặp rút gọn khi được bật, có đủ cả hai file và cặp rút gọn được tạo
+# từ đúng model, vectorizer gốc hiện tại. Chọn một lần cho mỗi process để model và vectorizer luôn cùng một cặp,
+# lần gọi đầu tiên là khi nạp model hoặc tạo cache kết quả dự đoán
+@functools.cache
+def serving_model_files():
+    if not (USE_COMPACT_MODEL and os.path.exists(COMPACT_MODEL_FILE) and os.path.exists(COMPACT_VECTORIZER_FILE)):
+        return MODEL_FILE, VECTORIZER_FILE
+    if read_compact_source_version() != model_source_version():
+        print(f"Cảnh báo: {COMPACT_MODEL_FILE} không được tạo từ {MODEL_FILE} và {VECTORIZER_FILE} hiện tại, dùng cặp gốc. "
+              "Chạy lại python -m hasaki_sentiment_analysis_model_compaction để tạo lại cặp rút gọn", file=sys.stderr)
+        return MODEL_FILE, VECTORIZER_FILE
+    return COMPACT_MODEL_FILE, COMPACT_VECTORIZER_FILE
+
+registry = ArtifactRegistry()
+
+registry.register("emojicon_list", lambda: read_file_to_list(TOOLS_FOLDER + "emojicon.txt"))
+registry.register("english_vnmese_list", lambda: read_file_to_list(TOOLS_FOLDER + "english-vnmese.txt"))
+registry.register("teencode_list", lambda: read_file_to_list(TOOLS_FOLDER + "teencode.txt"))
+registry.register("vietnamese_stopwords_list", lambda: read_file_to_list(TOOLS_FOLDER + "vietnamese-stopwords.txt"))
+registry.register("vietnamese_stopwords_set", lambda: set(registry.get("vietnamese_stopwords_list")))
+registry.register("wrong_word_list", lambda: set(read_file_to_list(TOOLS_FOLDER + "wrong-word.txt")))
+
+registry.register("emojicon_dict", lambda: list_to_dict(registry.get("emojicon_list")))
+registry.register("english_vnmese_dict", lambda: list_to_dict(registry.get("english_vnmese_list")))
+registry.register("teencode_dict", lambda: list_to_dict(registry.get("teencode_list")))
+
+# underthesea nạp nltk và model CRF nên cũng chỉ import khi cần tiền xử lý
+registry.register("underthesea", lambda: importlib.import_module("underthesea"))
+
+registry.register("model_lgb", lambda: read_pickle(serving_model_files()[0]))
+registry.register("tfidf_vectorizer", lambda: read_pickle(serving_model_files()[1]))
+registry.register("label_encoder", lambda: read_pickle(LABEL_ENCODER_FILE))
+
+if __name__ == "__main__":
+    for name, seconds in registry.warmup().items():
+        print(f"{name}: {seconds * 1000:.1f} ms")
@@ -0,0 +1,196 @@
+import bisect
+import unicodedata
+
+import numpy as np
+
+# Số gợi ý tối đa hiển thị trong ô tìm kiếm
+SEARCH_TOP_K = 50
+NGRAM_SIZE = 3
+_MAX_CHARACTER = chr(0x10FFFF)
+
+# Bỏ dấu tiếng Việt sau khi tách ký tự gốc và dấu (NFD), đ -> d
+_FOLD_TABLE = {code: None for code in range(0x0300, 0x0370)}
+_FOLD_TABLE[ord('đ')] = 'd'
+
+def fold_text(text):
+    return unicodedata.normalize('NFD', text.lower()).translate(_FOLD_TABLE)
+
+def iter_ngrams(text, size):
+    return (text[i:i + size] for i in range(len(text) - size + 1))
+
+# Giao hai mảng đã sắp xếp tăng dần bằng binary search các phần tử của mảng ngắn trong mảng dài
+def intersect_sorted(short_array, long_array):
+    positions = np.searchsorted(long_array, short_array)
+    positions[positions == len(long_array)] = len(long_array) - 1
+    return short_array[long_array[positions] == short_array]
+
+# Chỉ mục đảo theo trigram ký tự trên tên sản phẩm đã bỏ dấu.
+# Sản phẩm được đánh số theo thứ tự phổ biến (nhiều đánh giá trước) nên posting list
+# đã sắp xếp sẵn theo thứ tự xếp hạng và có thể dừng sớm khi lấy top-k.
+# Chỉ đánh chỉ mục tên sản phẩm, không gồm phần " (N đánh giá)" của chuỗi hiển thị như cách quét cũ
+class ProductNameIndex:
+    def __init__(self, names, review_counts=None):
+        names = ["" if name is None else str(name) for name in names]
+        if review_counts is None:
+            review_counts = np.zeros(len(names), dtype=np.int64)
+
+        # rank -> vị trí dòng trong DataFrame gốc
+        self.rows = np.argsort(-np.asarray(review_counts), kind='stable')
+        self.folded_names = [fold_text(names[row]) for row in self.rows]
+
+        postings = {}
+        for rank, folded_name in enumerate(self.folded_names):
+            for gram in set(iter_ngrams(folded_name, NGRAM_SIZE)):
+                postings.setdefault(gram, []).append(rank)
+        self.postings = {gram: np.array(ranks, dtype=np.int32) for gram, ranks in postings.items()}
+
+        # Danh sách tên đã sắp xếp để tìm các tên bắt đầu bằng từ khoá bằng bisect
+        prefix_order = sorted(range(len(self.folded_names)), key=self.folded_names.__getitem__)
+        self.sorted_names = [self.folded_names[rank] for rank in prefix_order]
+        self.sorted_ranks = np.array(prefix_order, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.folded_names)
+
+    def _prefix_ranks(self, folded_query):
+        start = bisect.bisect_left(self.sorted_names, folded_query)
+        end = bisect.bisect_left(self.sorted_names, folded_query + _MAX_CHARACTER, lo=start)
+        return np.sort(self.sorted_ranks[start:end])
+
+    # Các sản phẩm có thể chứa từ khoá, trả về theo từng block để có thể dừng sớm khi đủ top-k.
+    # Giao các posting list bắt đầu từ list ngắn nhất; với từ khoá dài hơn 3 ký tự, giao các trigram
+    # có thể dư nên cần kiểm tra lại. Từ khoá 1-2 ký tự không có trigram nên duyệt toàn bộ theo thứ tự xếp hạng
+    def _iter_candidate_blocks(self, folded_query, block_size):
+        if len(folded_query) < NGRAM_SIZE:
+            yield range(len(self)), True
+            return
+        if len(folded_query) == NGRAM_SIZE:
+            yield self.postings.get(folded_query, np.empty(0, dtype=np.int32)).tolist(), False
+            return
+
+        posting_lists = []
+        for gram in set(iter_ngrams(folded_query, NGRAM_SIZE)):
+            posting = self.postings.get(gram)
+            if posting is None:
+                return
+            posting_lists.append(posting)
+
+        posting_lists.sort(key=len)
+        shortest_posting = posting_lists[0]
+        for start in range(0, len(shortest_posting), block_size):
+            candidates = shortest_posting[start:start + block_size]
+            for posting in posting_lists[1:]:
+                if len(candidates) == 0:
+                    break
+                candidates = intersect_sorted(candidates, posting)
+            yield candidates.tolist(), True
+
+    # Trả về vị trí dòng (trong DataFrame gốc) của các sản phẩm có tên chứa từ khoá, không phân biệt
+    # hoa thường và dấu. Xếp hạng: tên bắt đầu bằng từ khoá trước, sau đó theo số lượng đánh giá
+    def search(self, query, top_k=None):
+        folded_query = fold_text(query.strip())
+        if not folded_query:
+            ranks = np.arange(len(self), dtype=np.int32)
+            return self.rows[ranks if top_k is None else ranks[:top_k]]
+
+        prefix_ranks = self._prefix_ranks(folded_query)
+        if top_k is not None and len(prefix_ranks) >= top_k:
+            return self.rows[prefix_ranks[:top_k]]
+
+        prefix_set = set(prefix_ranks.tolist())
+        result = prefix_ranks.tolist()
+        block_size = len(self) if top_k is None else max(top_k * 8, 256)
+
+        for candidates, needs_check in self._iter_candidate_blocks(folded_query, block_size):
+            for rank in candidates:
+                if rank in prefix_set:
+                    continue
+                if needs_check and folded_query not in self.folded_names[rank]:
+                    continue
+                result.append(rank)
+                if top_k is not None and len(result) >= top_k:
+                    return self.rows[np.array(result, dtype=np.int64)]
+
+        return self.rows[np.array(result, dtype=np.int64)]
+
+# Khoảng [start, end) trong mảng đã sắp xếp chứa các phần tử bắt đầu bằng prefix.
+# Cận trên là prefix với ký tự cuối tăng thêm 1
+def prefix_range(sorted_array, prefix):
+    upper_bound = prefix[:-1] + bytes([prefix[-1] + 1]) if prefix[-1] < 0xFF else prefix + b'\xff'
+    start = np.searchsorted(sorted_array, prefix, side='left')
+    end = np.searchsorted(sorted_array, upper_bound, side='left')
+    return start, end
+
+# Chỉ mục mã sản phẩm: mảng mã đã sắp xếp cho tìm theo prefix và suffix array (mọi hậu tố
+# của mọi mã) cho tìm chuỗi con, đều bằng binary search. Mã được lưu dạng bytes độ dài cố định
+# trong mảng numpy nên 100k mã chỉ tốn vài MB. Sản phẩm cũng được đánh số theo thứ tự phổ biến
+class ProductCodeIndex:
+    def __init__(self, codes, review_counts=None):
+        codes = [str(code).strip().lower().encode('utf-8') for code in codes]
+        if review_counts is None:
+            review_counts = np.zeros(len(codes), dtype=np.int64)
+
+        # rank -> vị trí dòng trong DataFrame gốc
+        self.rows = np.argsort(-np.asarray(review_counts), kind='stable')
+        ranked_codes = [codes[row] for row in self.rows]
+        width = max([len(code) for code in ranked_codes], default=1) or 1
+
+        codes_array = np.array(ranked_codes, dtype=f'S{width}')
+        prefix_order = np.argsort(codes_array, kind='stable')
+        self.sorted_codes = codes_array[prefix_order]
+        self.sorted_code_ranks = prefix_order.astype(np.int32)
+
+        # Hậu tố bắt đầu từ vị trí 1 trở đi; hậu tố từ vị trí 0 chính là mã trong sorted_codes
+        suffixes = []
+        suffix_ranks = []
+        for rank, code in enumerate(ranked_codes):
+            for start in range(1, len(code)):
+                suffixes.append(code[start:])
+                suffix_ranks.append(rank)
+        suffixes_array = np.array(suffixes, dtype=f'S{max(width - 1, 1)}')
+        suffix_order = np.argsort(suffixes_array, kind='stable')
+        self.sorted_suffixes = suffixes_array[suffix_order]
+        self.sorted_suffix_ranks = np.array(suffix_ranks, dtype=np.int32)[suffix_order]
+
+    def __len__(self):
+        return len(self.rows)
+
+    # Từ khoá dài hơn độ rộng mảng không thể khớp, bỏ qua để numpy không phải ép kiểu cả mảng
+    def _prefix_ranks(self, query):
+        if len(query) > self.sorted_codes.dtype.itemsize:
+            return np.empty(0, dtype=np.int32)
+        start, end = prefix_range(self.sorted_codes, query)
+        return np.sort(self.sorted_code_ranks[start:end])
+
+    # Các mã chứa query ở vị trí 1 trở đi (một mã có thể xuất hiện nhiều lần)
+    def _suffix_ranks(self, query):
+        if len(query) > self.sorted_suffixes.dtype.itemsize:
+            return np.empty(0, dtype=np.int32)
+        start, end = prefix_range(self.sorted_suffixes, query)
+        return self.sorted_suffix_ranks[start:end]
+
+    # Trả về vị trí dòng (trong DataFrame gốc) của các sản phẩm có mã chứa từ khoá.
+    # Xếp hạng: mã bắt đầu bằng từ khoá trước, sau đó theo số lượng đánh giá
+    def search(self, query, top_k=None):
+        query = query.strip().lower().encode('utf-8')
+        if not query:
+            ranks = np.arange(len(self), dtype=np.int32)
+            return self.rows[ranks if top_k is None else ranks[:top_k]]
+
+        prefix_ranks = self._prefix_ranks(query)
+        if top_k is not None and len(prefix_ranks) >= top_k:
+            return self.rows[prefix_ranks[:top_k]]
+
+        # Khoảng hậu tố lớn (từ khoá ngắn) thì đánh dấu trên mảng bool nhanh hơn sắp xếp để bỏ trùng
+        suffix_ranks = self._suffix_ranks(query)
+        if len(suffix_ranks) > len(self) // 16:
+            mask = np.zeros(len(self), dtype=bool)
+            mask[suffix_ranks] = True
+            mask[prefix_ranks] = False
+            other_ranks = np.flatnonzero(mask).astype(np.int32)
+        else:
+            other_ranks = np.setdiff1d(suffix_ranks, prefix_ranks)
+        if top_k is not None:
+            other_ranks = other_ranks[:top_k - len(prefix_ranks)]
+
+        return self.rows[np.concatenate([prefix_ranks, other_ranks])]
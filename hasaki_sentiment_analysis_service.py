@@ -0,0 +1,181 @@
+import argparse
+import asyncio
+import json
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import tornado.web
+
+from hasaki_sentiment_analysis_metrics import metrics, BATCH_SIZE_BUCKETS, PROMETHEUS_CONTENT_TYPE
+from hasaki_sentiment_analysis_prediction import predict_sentiment
+from hasaki_sentiment_analysis_registry import registry
+
+DEFAULT_PORT = 8600
+# Số bình luận tối đa trong một micro-batch
+DEFAULT_MAX_BATCH_SIZE = 64
+# Thời gian tối đa chờ gom thêm request sau khi nhận request đầu tiên của batch
+DEFAULT_MAX_WAIT_MS = 5
+# Giới hạn số bình luận trong một request /predict_batch
+MAX_REQUEST_TEXTS = 10_000
+
+REQUEST_SECONDS = metrics.histogram("hasaki_service_request_seconds", "Thời gian xử lý request của service", ["path", "status"])
+MICRO_BATCH_SIZE = metrics.histogram("hasaki_service_micro_batch_size", "Số bình luận trong một micro-batch", buckets=BATCH_SIZE_BUCKETS)
+
+def score_texts(texts):
+    return predict_sentiment(texts)["sentiment"].tolist()
+
+# Gom các request đến cùng lúc thành micro-batch để TF-IDF và LightGBM chạy trên nhiều dòng một lần.
+# Batch được gửi đi khi đủ max_batch_size bình luận hoặc đã chờ quá max_wait_ms
+class MicroBatcher:
+    def __init__(self, score_batch=score_texts, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.score_batch = score_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.num_batches = 0
+        self.num_texts = 0
+        self._queue = asyncio.Queue()
+        # Chỉ một thread chấm điểm: batch sau được gom trong lúc batch trước đang chạy
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scoring")
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, text):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def submit_many(self, texts):
+        return await asyncio.gather(*(self.submit(text) for text in texts))
+
+    async def _collect_batch(self):
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+            texts = [text for text, _ in batch]
+
+            try:
+                labels = await loop.run_in_executor(self._executor, self.score_batch, texts)
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+
+            self.num_batches += 1
+            self.num_texts += len(texts)
+            MICRO_BATCH_SIZE.observe(len(texts))
+            for (_, future), label in zip(batch, labels):
+                if not future.done():
+                    future.set_result(label)
+
+    def stats(self):
+        return {
+            "num_batches": self.num_batches,
+            "num_texts": self.num_texts,
+            "mean_batch_size": self.num_texts / self.num_batches if self.num_batches else 0.0,
+            "queue_size": self._queue.qsize(),
+        }
+
+class BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, batcher):
+        self.batcher = batcher
+
+    def write_json(self, content, status=200):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.finish(json.dumps(content, ensure_ascii=False))
+
+    def read_json(self):
+        try:
+            return json.loads(self.request.body or b"{}")
+        except json.JSONDecodeError:
+            return None
+
+# POST /predict {"text": "..."} -> {"sentiment": "positive"}
+class PredictHandler(BaseHandler):
+    async def post(self):
+        body = self.read_json()
+        text = body.get("text") if isinstance(body, dict) else None
+        if not isinstance(text, str) or not text.strip():
+            return self.write_json({"error": "Cần trường 'text' là chuỗi khác rỗng"}, status=400)
+
+        sentiment = await self.batcher.submit(text)
+        self.write_json({"sentiment": sentiment})
+
+# POST /predict_batch {"texts": ["...", "..."]} -> {"sentiments": [...]}
+class PredictBatchHandler(BaseHandler):
+    async def post(self):
+        body = self.read_json()
+        texts = body.get("texts") if isinstance(body, dict) else None
+        if not isinstance(texts, list) or not all(isinstance(text, str) and text.strip() for text in texts):
+            return self.write_json({"error": "Cần trường 'texts' là danh sách chuỗi khác rỗng"}, status=400)
+        if len(texts) > MAX_REQUEST_TEXTS:
+            return self.write_json({"error": f"Tối đa {MAX_REQUEST_TEXTS} bình luận mỗi request"}, status=413)
+
+        sentiments = await self.batcher.submit_many(texts)
+        self.write_json({"sentiments": sentiments})
+
+class HealthHandler(BaseHandler):
+    def get(self):
+        self.write_json({"status": "ok", "batcher": self.batcher.stats(), "load_times": registry.load_times()})
+
+# GET /metrics: số liệu của process theo định dạng Prometheus text
+class MetricsHandler(BaseHandler):
+    def get(self):
+        self.set_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.finish(metrics.render_prometheus())
+
+# Thay cho access log của tornado: ghi thời gian mỗi request theo đường dẫn và mã trạng thái.
+# Đường dẫn không tồn tại gộp chung một label để số chuỗi label không tăng theo request lạ
+def record_request(handler):
+    status = handler.get_status()
+    path = handler.request.path if status != 404 else "not_found"
+    REQUEST_SECONDS.observe(handler.request.request_time(), path=path, status=status)
+
+def make_app(batcher):
+    handler_args = {"batcher": batcher}
+    return tornado.web.Application([
+        (r"/predict", PredictHandler, handler_args),
+        (r"/predict_batch", PredictBatchHandler, handler_args),
+        (r"/health", HealthHandler, handler_args),
+        (r"/metrics", MetricsHandler, handler_args),
+    ], log_function=record_request)
+
+async def serve(port=DEFAULT_PORT, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+    # Nạp model trước khi nhận request để request đầu tiên không bị chậm
+    registry.warmup()
+
+    batcher = MicroBatcher(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    batcher.start()
+
+    app = make_app(batcher)
+    app.listen(port, address="127.0.0.1")
+    print(f"Sentiment service đang chạy tại http://127.0.0.1:{port}")
+    await asyncio.Event().wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP service phân tích sentiment với micro-batching")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.port, args.max_batch_size, args.max_wait_ms))
@@ -0,0 +1,106 @@
+import gzip
+import io
+import shutil
+import tempfile
+
+from contextlib import closing
+
+import pandas as pd
+
+from hasaki_sentiment_analysis_prediction import predict_sentiment
+
+# Bước phân tích (đọc, dự đoán, ghi kết quả) chỉ giữ một chunk và phần xem trước trong bộ nhớ. Bộ nhớ còn phụ thuộc
+# kích thước file ở hai chỗ do Streamlit:
+# - file tải lên (UploadedFile) nằm trọn trong bộ nhớ đến hết lần chạy script, tối đa server.maxUploadSize
+#   trong .streamlit/config.toml
+# - st.download_button giữ toàn bộ nội dung tải về trong bộ nhớ server cho đến khi session kết thúc: kết quả đến
+#   STREAM_DOWNLOAD_PLAIN_MAX_SIZE là file csv, lớn hơn là bản nén gzip (thường nhỏ hơn csv nhiều lần)
+# Số bình luận được đọc và phân tích trong mỗi chunk
+STREAM_CHUNK_SIZE = 5000
+# Số dòng tối đa hiển thị để xem trước nội dung file và kết quả
+STREAM_PREVIEW_ROWS = 20
+# File kết quả nằm trong bộ nhớ đến ngưỡng này rồi mới được ghi ra đĩa
+STREAM_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+# File kết quả lớn hơn ngưỡng này được nén gzip trước khi đưa vào nút download
+STREAM_DOWNLOAD_PLAIN_MAX_SIZE = STREAM_SPOOL_MAX_SIZE
+STREAM_COPY_BLOCK_SIZE = 1024 * 1024
+
+FEEDBACK_COLUMN = "noi_dung_binh_luan"
+
+def is_text_file(uploaded_file):
+    return uploaded_file.type == "text/plain"
+
+# Đọc file tải lên (hoặc file nhị phân bất kỳ, khi đó is_text cho biết là file txt hay csv) theo từng chunk,
+# file csv chỉ đọc cột noi_dung_binh_luan. Các bình luận rỗng bị bỏ qua giống như khi nhập từ bàn phím
+def iter_feedback_chunks(uploaded_file, chunk_size=STREAM_CHUNK_SIZE, is_text=None):
+    if is_text is None:
+        is_text = is_text_file(uploaded_file)
+    uploaded_file.seek(0)
+    text_stream = io.TextIOWrapper(uploaded_file, encoding="utf-8", newline=None if is_text else "")
+
+    try:
+        if is_text:
+            chunk = []
+            for line in text_stream:
+                line = line.rstrip("\n")
+                if line.strip():
+                    chunk.append(line)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+        else:
+            reader = pd.read_csv(text_stream, usecols=[FEEDBACK_COLUMN], dtype={FEEDBACK_COLUMN: str}, chunksize=chunk_size)
+            for data in reader:
+                feedbacks = data[FEEDBACK_COLUMN].dropna()
+                chunk = [feedback for feedback in feedbacks if feedback.strip()]
+                if chunk:
+                    yield chunk
+    finally:
+        # Tách wrapper ra để không đóng luôn file tải lên
+        text_stream.detach()
+
+# Lấy vài dòng đầu của file để xem trước mà không đọc cả file
+def preview_uploaded_feedbacks(uploaded_file, num_rows=STREAM_PREVIEW_ROWS):
+    chunks = iter_feedback_chunks(uploaded_file, chunk_size=num_rows)
+    with closing(chunks):
+        preview = next(chunks, [])
+    uploaded_file.seek(0)
+    return pd.DataFrame({FEEDBACK_COLUMN: preview})
+
+# Tỉ lệ đã đọc của file tải lên, dùng để hiển thị tiến độ
+def read_progress(uploaded_file):
+    if not uploaded_file.size:
+        return 1.0
+    return min(uploaded_file.tell() / uploaded_file.size, 1.0)
+
+# Phân tích từng chunk ngay khi đọc được và ghi kết quả nối tiếp vào output_file (dạng bytes),
+# trả về kết quả của từng chunk để giao diện cập nhật tiến độ và phần xem trước
+def score_feedback_chunks(chunks, output_file):
+    header = True
+    for chunk in chunks:
+        result = predict_sentiment(chunk)
+        output_file.write(result.to_csv(index=False, header=header).encode("utf-8"))
+        header = False
+        yield result
+
+    # File không có bình luận nào vẫn có dòng tiêu đề
+    if header:
+        output_file.write(predict_sentiment([]).to_csv(index=False).encode("utf-8"))
+
+def create_result_file():
+    return tempfile.SpooledTemporaryFile(max_size=STREAM_SPOOL_MAX_SIZE, mode="w+b")
+
+# Nội dung cho st.download_button: (dữ liệu, tên file, mime). st.download_button luôn giữ toàn bộ nội dung
+# trong bộ nhớ nên kết quả lớn được nén gzip theo từng khối từ file kết quả, bộ nhớ chỉ tốn bằng bản nén
+def result_download(result_file, file_name):
+    size = result_file.seek(0, io.SEEK_END)
+    result_file.seek(0)
+    if size <= STREAM_DOWNLOAD_PLAIN_MAX_SIZE:
+        return result_file.read(), file_name + ".csv", "text/csv"
+
+    compressed = io.BytesIO()
+    with gzip.GzipFile(fileobj=compressed, mode="wb") as gzip_file:
+        shutil.copyfileobj(result_file, gzip_file, STREAM_COPY_BLOCK_SIZE)
+    return compressed, file_name + ".csv.gz", "application/gzip"
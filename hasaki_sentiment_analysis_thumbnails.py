@@ -0,0 +1,208 @@
+import hashlib
+import io
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from PIL import Image
+
+from hasaki_sentiment_analysis_metrics import metrics
+
+THUMBNAIL_FOLDER = "data/cache/thumbnails/"
+# Cạnh dài nhất (px) của ảnh thu nhỏ, lưới sản phẩm hiển thị ảnh rộng tối đa 400px
+THUMBNAIL_SIZE = int(os.environ.get("HASAKI_THUMBNAIL_SIZE", 400))
+# Dung lượng tối đa (MB) của cache ảnh thu nhỏ trong bộ nhớ
+THUMBNAIL_CACHE_MAX_BYTES = int(float(os.environ.get("HASAKI_THUMBNAIL_CACHE_MB", 32)) * 2**20)
+# Ảnh thu nhỏ trên đĩa không được dùng quá số ngày này bị xoá khi process bắt đầu dùng cache
+THUMBNAIL_TTL_SECONDS = float(os.environ.get("HASAKI_THUMBNAIL_TTL_DAYS", 30)) * 24 * 3600
+# Đặt HASAKI_IMAGE_DIR để lấy ảnh sản phẩm từ một thư mục local thay vì tải qua mạng
+IMAGE_DIR = os.environ.get("HASAKI_IMAGE_DIR")
+IMAGE_TIMEOUT_SECONDS = 5
+THUMBNAIL_WORKERS = 8
+
+# Nguồn ảnh mặc định: tải ảnh http(s) qua mạng, còn lại là đường dẫn file (vd. media/logo.jpg)
+class DefaultImageSource:
+    def __init__(self, timeout=IMAGE_TIMEOUT_SECONDS):
+        self.timeout = timeout
+
+    def read(self, reference):
+        if urlparse(reference).scheme in ("http", "https"):
+            response = requests.get(reference, timeout=self.timeout)
+            response.raise_for_status()
+            return response.content
+        with open(reference, "rb") as file:
+            return file.read()
+
+# Nguồn ảnh từ một thư mục local: ảnh được tìm theo tên file trong đường dẫn/URL gốc
+class LocalImageSource:
+    def __init__(self, folder):
+        self.folder = folder
+
+    def read(self, reference):
+        file_name = os.path.basename(urlparse(reference).path)
+        with open(os.path.join(self.folder, file_name), "rb") as file:
+            return file.read()
+
+def make_image_source():
+    return LocalImageSource(IMAGE_DIR) if IMAGE_DIR else DefaultImageSource()
+
+# Thu nhỏ ảnh về cạnh dài nhất size px và lưu JPEG, ảnh có nền trong suốt được đặt lên nền trắng
+def make_thumbnail(image_bytes, size=THUMBNAIL_SIZE):
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.thumbnail((size, size))
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85, optimize=True)
+        return buffer.getvalue()
+
+# Cache ảnh sản phẩm đã thu nhỏ: mỗi ảnh chỉ được tải và thu nhỏ một lần, lưu trên đĩa cho các
+# process sau và giữ các ảnh dùng gần đây trong bộ nhớ (LRU theo tổng số bytes).
+# Ảnh không đọc được trả về None và không thử lại trong process này
+class ThumbnailCache:
+    def __init__(self, source=None, folder=THUMBNAIL_FOLDER, size=THUMBNAIL_SIZE, max_bytes=THUMBNAIL_CACHE_MAX_BYTES, ttl_seconds=THUMBNAIL_TTL_SECONDS):
+        self.source = source or make_image_source()
+        self.folder = folder
+        self.size = size
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._failed = set()
+        self._total_bytes = 0
+        self._stale_files_removed = False
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumbnail")
+
+    def _file_path(self, reference):
+        key = hashlib.sha1(f"{self.size}:{reference}".encode("utf-8")).hexdigest()
+        return os.path.join(self.folder, key + ".jpg")
+
+    def _put(self, reference, thumbnail):
+        if len(thumbnail) > self.max_bytes:
+            return
+        with self._lock:
+            old_thumbnail = self._images.pop(reference, None)
+            if old_thumbnail is not None:
+                self._total_bytes -= len(old_thumbnail)
+            self._images[reference] = thumbnail
+            self._total_bytes += len(thumbnail)
+
+            while self._total_bytes > self.max_bytes:
+                _, evicted_thumbnail = self._images.popitem(last=False)
+                self._total_bytes -= len(evicted_thumbnail)
+
+    # Ghi file tạm rồi đổi tên để process khác không đọc phải ảnh ghi dở
+    def _write_file(self, file_path, thumbnail):
+        os.makedirs(self.folder, exist_ok=True)
+        temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(thumbnail)
+        os.replace(temp_path, file_path)
+
+    # Xoá ảnh (và file tạm ghi dở) không được dùng quá ttl_seconds: thời điểm sửa file được cập nhật
+    # mỗi lần đọc ảnh từ đĩa, nên ảnh cũ vẫn đang được dùng không bị xoá. Chạy một lần mỗi process trên thread nền
+    def _remove_stale_files(self):
+        now = time.time()
+        try:
+            file_names = os.listdir(self.folder)
+        except FileNotFoundError:
+            return
+        for file_name in file_names:
+            file_path = os.path.join(self.folder, file_name)
+            try:
+                if os.path.isfile(file_path) and now - os.path.getmtime(file_path) > self.ttl_seconds:
+                    os.remove(file_path)
+            except FileNotFoundError:
+                pass
+            except OSError as error:
+                print(f"Không xoá được ảnh thu nhỏ {file_path}: {error}", file=sys.stderr)
+
+    def get(self, reference):
+        with self._lock:
+            if not self._stale_files_removed:
+                self._stale_files_removed = True
+                self._executor.submit(self._remove_stale_files)
+            thumbnail = self._images.get(reference)
+            if thumbnail is not None:
+                self._images.move_to_end(reference)
+                self.hits += 1
+                return thumbnail
+            if reference in self._failed:
+                return None
+
+        file_path = self._file_path(reference)
+        try:
+            with open(file_path, "rb") as file:
+                thumbnail = file.read()
+            with self._lock:
+                self.disk_hits += 1
+            try:
+                os.utime(file_path)
+            except OSError:
+                pass
+        except FileNotFoundError:
+            try:
+                thumbnail = make_thumbnail(self.source.read(reference), self.size)
+            except Exception as error:
+                print(f"Không đọc được ảnh {reference}: {error}", file=sys.stderr)
+                with self._lock:
+                    self._failed.add(reference)
+                return None
+            with self._lock:
+                self.misses += 1
+            try:
+                self._write_file(file_path, thumbnail)
+            except OSError as error:
+                print(f"Không lưu được ảnh thu nhỏ {file_path}: {error}", file=sys.stderr)
+
+        self._put(reference, thumbnail)
+        return thumbnail
+
+    # Lấy ảnh cho cả một trang sản phẩm, các ảnh chưa có trong cache được tải song song
+    # (mỗi ảnh chỉ một lần dù nhiều sản phẩm dùng chung ảnh)
+    def get_many(self, references):
+        unique_references = list(dict.fromkeys(references))
+        thumbnails = dict(zip(unique_references, self._executor.map(self.get, unique_references)))
+        return [thumbnails[reference] for reference in references]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "failed": len(self._failed),
+                "entries": len(self._images),
+                "bytes": self._total_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self._failed.clear()
+            self._total_bytes = 0
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+
+thumbnail_cache = ThumbnailCache()
+
+def thumbnail_lookups():
+    cache_stats = thumbnail_cache.stats()
+    return {("memory",): cache_stats["hits"], ("disk",): cache_stats["disk_hits"], ("fetch",): cache_stats["misses"], ("failed",): cache_stats["failed"]}
+
+metrics.callback("hasaki_thumbnail_lookups_total", "Số ảnh thu nhỏ theo nơi lấy ảnh", "counter", thumbnail_lookups, ["source"])
@@ -2,169 +2,154 @@ import numpy as np
 import pandas as pd
 import streamlit as st
 import json
+import math
+import os
 import time
+import uuid
 
 
-from hasaki_sentiment_analysis_prediction import predict_sentiment
+from hasaki_sentiment_analysis_prediction import predict_sentiment, get_prediction_cache
+from hasaki_sentiment_analysis_registry import registry
+from hasaki_sentiment_analysis_metrics import metrics, start_exporters
+from hasaki_sentiment_analysis_profiling import profiled, request_profile, clear_profile_requests, PROFILE_QUERY_ENABLED
+from hasaki_sentiment_analysis_streaming import is_text_file, iter_feedback_chunks, preview_uploaded_feedbacks, read_progress, score_feedback_chunks, create_result_file, result_download, STREAM_PREVIEW_ROWS, STREAM_DOWNLOAD_PLAIN_MAX_SIZE
 from hasaki_sentiment_analysis_visualization import analyze_and_visualize
+from hasaki_sentiment_analysis_charts import chart_cache, make_chart_key
+from hasaki_sentiment_analysis_thumbnails import thumbnail_cache
+from hasaki_sentiment_analysis_jobs import job_queue, QueueFullError, JOB_MIN_UPLOAD_BYTES, QUEUED, RUNNING, DONE, FAILED
+from hasaki_sentiment_analysis_search import SEARCH_TOP_K
+from hasaki_sentiment_analysis_dataset import refresh_feedback_segments, load_feedback_snapshot, load_data_products
 from streamlit_searchbox import st_searchbox
 
 FIND_ALL_TEXT = "Tìm tất cả sản phẩm có chứa từ khóa "
+# Giá trị của lựa chọn "tìm tất cả" trong ô tìm kiếm là (FIND_ALL_OPTION, từ khoá)
+FIND_ALL_OPTION = "find_all"
+# Số sản phẩm hiển thị trên mỗi trang của lưới sản phẩm
+PRODUCTS_PER_PAGE = 10
+# Chu kỳ (giây) cập nhật tiến độ các job nền đang chạy
+JOB_POLL_SECONDS = 2
+# Đặt HASAKI_ADMIN_PANEL=1 để hiện bảng số liệu hiệu năng ở sidebar
+ADMIN_PANEL_ENABLED = os.environ.get("HASAKI_ADMIN_PANEL", "0") == "1"
+
+SEARCH_SECONDS = metrics.histogram("hasaki_search_seconds", "Thời gian tìm kiếm sản phẩm", ["kind", "mode"])
+PRODUCT_INFO_SECONDS = metrics.histogram("hasaki_product_info_seconds", "Thời gian lấy thông tin của các sản phẩm được chọn")
 
 # ======= Load data part =======
-@st.cache_data
-def load_boost_words():
-    with open('data/tools/boost_words.txt', 'r', encoding='utf-8') as file:
-        boost_words = [line.strip() for line in file]
-    return boost_words
-
-@st.cache_data
-def load_data_products():
-    data = pd.read_csv('data/san_pham_processed.csv')
-
-    if "data_feedbacks" not in st.session_state:
-        st.session_state.data_feedbacks = load_data_feedbacks()
-
-    data_feedbacks = st.session_state.data_feedbacks
-
-    data['so_luong_danh_gia'] = data['ma_san_pham'].map(data_feedbacks['ma_san_pham'].value_counts()).fillna(0).astype(int)
-
-    data['ten_san_pham_sl_danh_gia'] = data['ten_san_pham'] + " (" + data['so_luong_danh_gia'].astype(str) + " đánh giá)"
-    data['ma_san_pham_sl_danh_gia'] = data['ma_san_pham'].astype(str) + " (" + data['so_luong_danh_gia'].astype(str) + " đánh giá)"
-
-    return data
-
-@st.cache_data
-def load_product_mapping():
-    if "data_products" not in st.session_state:
-        st.session_state.data_products = load_data_products()
-    
-    data = st.session_state.data_products
-
-    product_mapping = dict(zip(data['ten_san_pham_sl_danh_gia'], data['ma_san_pham']))
-    return product_mapping
-
-def is_existed(addded_words, word):
-    for x in addded_words:
-        if word in x:
-            return True
-    return False
-
-def apply_boost_words(text, boost_words):
-    parts = text.split()
-    added_words = []
-
-    for i in range(5, 0, -1):
-        for j in range(len(parts) - i + 1):
-            sub_text = ' '.join(parts[j:j+i])
-            if sub_text in boost_words and not is_existed(added_words, sub_text):
-                added_words.append(sub_text)
-
-    for word in added_words:
-        num_boost = word.count(' ')
-        text = text.replace(word, word.replace(" ", "_"))
-        for i in range(num_boost):
-            text = text + " " + word.replace(" ", "_")
-
-    return text
-
-@st.cache_data
-def load_data_feedbacks():
-    data = pd.read_csv('data/Danh_gia_with_label.csv')
-    boost_words = load_boost_words()
-
-    data['normalized_text_with_boost_words'] = data['normalized_text'].apply(lambda x: apply_boost_words(x, boost_words))
-
-    return data
+# Chỉ chạy một lần cho mỗi process server: nạp model và lexicon ở thread nền
+# để trang đầu tiên không phải chờ và các trang tĩnh không phụ thuộc vào kích thước model
+@st.cache_resource(show_spinner=False)
+def start_artifact_warmup():
+    start_exporters()
+    return registry.warmup_in_background()
 
 # ======= Logic part =======
+# Gợi ý cho ô tìm kiếm: mỗi lựa chọn là (chuỗi hiển thị, giá trị trả về). Giá trị là mã sản phẩm,
+# riêng lựa chọn "tìm tất cả" mang theo từ khoá để lấy toàn bộ mã sản phẩm trực tiếp từ chỉ mục
+@SEARCH_SECONDS.timed(kind="name", mode="suggest")
 def search_product_name(product_name):
-    if "data_products" not in st.session_state:
-        st.session_state.data_products = load_data_products()
-    data_products = st.session_state.data_products
-    filter_rules = data_products['ten_san_pham_sl_danh_gia'].str.contains(product_name, case=False)
-    product = data_products[filter_rules]
+    # Bảng sản phẩm và chỉ mục lấy từ cùng một snapshot để số dòng luôn khớp nhau
+    snapshot = load_feedback_snapshot()
+    data_products = snapshot.data_products
+    rows = snapshot.product_name_index.search(product_name, top_k=SEARCH_TOP_K)
 
     search_all_text = FIND_ALL_TEXT + '"' + product_name + '"'
-    result = [search_all_text] + list(product["ten_san_pham_sl_danh_gia"].values)
+    result = [(search_all_text, (FIND_ALL_OPTION, product_name))]
+    result += list(zip(data_products['ten_san_pham_sl_danh_gia'].values[rows], data_products['ma_san_pham'].values[rows]))
 
     return result
 
+@SEARCH_SECONDS.timed(kind="name", mode="find_all")
+def find_product_ids_by_name(product_name):
+    snapshot = load_feedback_snapshot()
+    data_products = snapshot.data_products
+    rows = snapshot.product_name_index.search(product_name)
+
+    return data_products['ma_san_pham'].values[rows].tolist()
+
+@SEARCH_SECONDS.timed(kind="code", mode="suggest")
 def search_product_code(product_code):
-    if "data_products" not in st.session_state:
-        st.session_state.data_products = load_data_products()
-    
-    data_products = st.session_state.data_products
-    filter_rules = data_products['ma_san_pham_sl_danh_gia'].astype(str).str.contains(product_code, case=False)
-    product = data_products[filter_rules]
+    snapshot = load_feedback_snapshot()
+    data_products = snapshot.data_products
+    rows = snapshot.product_code_index.search(product_code, top_k=SEARCH_TOP_K)
 
     search_all_text = FIND_ALL_TEXT + '"' + product_code + '"'
-    result = [search_all_text] + list(product["ma_san_pham_sl_danh_gia"].values)
+    result = [(search_all_text, (FIND_ALL_OPTION, product_code))]
+    result += list(zip(data_products['ma_san_pham_sl_danh_gia'].values[rows], data_products['ma_san_pham'].values[rows]))
 
     return result
 
-def get_product_info(product_ids):
-    if "data_products" not in st.session_state:
-        st.session_state.data_products = load_data_products()
-
-    if "data_feedbacks" not in st.session_state:
-        st.session_state.data_feedbacks = load_data_feedbacks()
-    
-    data_products = st.session_state.data_products
-    data_feedbacks = st.session_state.data_feedbacks
+@SEARCH_SECONDS.timed(kind="code", mode="find_all")
+def find_product_ids_by_code(product_code):
+    snapshot = load_feedback_snapshot()
+    data_products = snapshot.data_products
+    rows = snapshot.product_code_index.search(product_code)
 
-    product_feedbacks = data_feedbacks[data_feedbacks['ma_san_pham'].isin(product_ids)]
-    product_info = data_products[data_products['ma_san_pham'].isin(product_ids)]
+    return data_products['ma_san_pham'].values[rows].tolist()
 
-    return product_info, product_feedbacks
+@PRODUCT_INFO_SECONDS.timed()
+def get_product_info(product_ids):
+    data_products = load_data_products()
+    return data_products[data_products['ma_san_pham'].isin(product_ids)]
 
 # ======= Analysis part =======
 
 
 # ======= UI part =======
+def show_product_card(product_info, thumbnail):
+    #st.write(f"""##### {product_info.ten_san_pham}\n""")
+    st.markdown(
+        f"""
+        <h5 style='color: green;'>{product_info.ten_san_pham}</h5>
+        """,
+        unsafe_allow_html=True,
+    )
+    # Ảnh không tải được thì để trình duyệt tự tải ảnh gốc
+    st.image(thumbnail if thumbnail is not None else product_info.hinh_san_pham, width=400)
+    st.write(f"""[Xem chi tiết sản phẩm]({product_info.link_san_pham})""")
+
+    formatted_price = f"{product_info.gia_ban:,}đ"
+    st.markdown(
+        f"""
+        **Mã sản phẩm**: {product_info.ma_san_pham}  
+        **Giá bán**: <span style='color: red;'>{formatted_price}</span>
+
+        **Điểm trung bình**: {product_info.diem_trung_binh} ⭐
+        """,
+        unsafe_allow_html=True,
+    )
+    st.write("---")
+
+# Lưới sản phẩm chỉ render các sản phẩm của trang đang xem nên thời gian render không phụ thuộc
+# số sản phẩm tìm được. Là fragment nên chuyển trang chỉ chạy lại phần lưới, không vẽ lại biểu đồ
+@st.fragment
+def show_product_grid(product_infos, page_key):
+    n_pages = max(math.ceil(len(product_infos) / PRODUCTS_PER_PAGE), 1)
+    page = 1
+    if n_pages > 1:
+        page = st.number_input(f"Trang (tổng {n_pages} trang, {len(product_infos)} sản phẩm)", min_value=1, max_value=n_pages, value=1, step=1, key=page_key)
+
+    page_infos = product_infos.iloc[(page - 1) * PRODUCTS_PER_PAGE:page * PRODUCTS_PER_PAGE]
+    thumbnails = thumbnail_cache.get_many(page_infos['hinh_san_pham'].tolist())
+
+    with st.container(height=600):
+        col1, col2 = st.columns(2)
+        for index_counter, (product_info, thumbnail) in enumerate(zip(page_infos.itertuples(), thumbnails)):
+            with col1 if index_counter % 2 == 0 else col2:
+                show_product_card(product_info, thumbnail)
+
 def show_product_info(product_ids):
-    product_infos, product_feedbacks = get_product_info(product_ids)
+    snapshot = load_feedback_snapshot()
+    product_infos = get_product_info(product_ids)
 
     if product_infos.empty:
         st.write("Không tìm thấy sản phẩm.")
         return
     
-    def show_product_info_internal(product_info):
-        #st.write(f"""##### {product_info.ten_san_pham}\n""")
-        st.markdown(
-            f"""
-            <h5 style='color: green;'>{product_info.ten_san_pham}</h5>
-            """,
-            unsafe_allow_html=True,
-        )
-        st.image(product_info.hinh_san_pham, width=400)
-        st.write(f"""[Xem chi tiết sản phẩm]({product_info.link_san_pham})""")
-        
-        formatted_price = f"{product_info.gia_ban:,}đ"
-        st.markdown(
-            f"""
-            **Mã sản phẩm**: {product_info.ma_san_pham}  
-            **Giá bán**: <span style='color: red;'>{formatted_price}</span>
-
-            **Điểm trung bình**: {product_info.diem_trung_binh} ⭐
-            """,
-            unsafe_allow_html=True,
-        )
-        st.write("---")
+    product_ids = product_infos['ma_san_pham'].values
+    chart_key = make_chart_key(product_ids, snapshot.data_version)
+    # Trang đang xem được lưu theo nhóm sản phẩm đã chọn, chọn nhóm khác thì quay về trang đầu
+    show_product_grid(product_infos, page_key="product_page_" + chart_key[1])
 
-    with st.container(height=600):
-        index_counter = 0
-        col1, col2 = st.columns(2)
-        for product_info in product_infos.itertuples():
-            if index_counter % 2 == 0:
-                with col1:
-                    show_product_info_internal(product_info)
-            else:
-                with col2:
-                    show_product_info_internal(product_info)
-            
-            index_counter += 1
-        
     st.markdown(
         """
         <div style='background-color: #66BB6A; padding: 10px; border-radius: 5px; text-align: center;'>
@@ -177,7 +162,10 @@ def show_product_info(product_ids):
     # Thêm khoảng cách trước hàng ảnh
     st.markdown("<br>", unsafe_allow_html=True)
 
-    analyze_and_visualize(product_infos, product_feedbacks)
+    # Biểu đồ và word cloud lấy từ bảng tổng hợp nên không cần đọc feedback của các sản phẩm
+    feedback_summary = snapshot.aggregates.summarize(product_ids)
+    analyze_and_visualize(product_infos, None, feedback_summary, chart_key)
+    show_chart_cache_stats()
 
 def business_objective_content():
     #st.image("media/hasaki_banner.jpg", width=800)
@@ -480,11 +468,6 @@ def build_project_construction():
 ##
 
 def build_product_analysis():
-    if "product_mapping" not in st.session_state:
-        st.session_state.product_mapping = load_product_mapping()
-    
-    product_mapping = st.session_state.product_mapping
-
     search_type = st.radio("Chọn cách tìm kiếm sản phẩm:", ("Tìm kiếm theo tên sản phẩm", "Tìm kiếm theo mã sản phẩm"))
 
     if search_type == "Tìm kiếm theo tên sản phẩm":
@@ -494,17 +477,9 @@ def build_product_analysis():
         )
 
         if selected_value is not None:
-            if selected_value.startswith(FIND_ALL_TEXT):
-                input_text = selected_value[len(FIND_ALL_TEXT):]
-                input_text = input_text.replace('"', '')
-
-                search_result = search_product_name(input_text)
-                selected_value = []
-
-                for x in search_result[1:]:
-                    selected_value.append(product_mapping.get(x, "Không tìm thấy mã sản phẩm"))
+            if isinstance(selected_value, tuple) and selected_value[0] == FIND_ALL_OPTION:
+                selected_value = find_product_ids_by_name(selected_value[1])
             else:
-                selected_value = product_mapping.get(selected_value, "Không tìm thấy mã sản phẩm")
                 selected_value = [selected_value]
         else:
             selected_value = []
@@ -515,30 +490,157 @@ def build_product_analysis():
         )
         
         if selected_value is not None:
-            if selected_value.startswith(FIND_ALL_TEXT):
-                input_text = selected_value[len(FIND_ALL_TEXT):]
-                input_text = input_text.replace('"', '')
-
-                search_result = search_product_code(input_text)
-                selected_value = []
-
-                for x in search_result[1:]:
-                    selected_value.append(int(x.split(" ")[0]))
+            if isinstance(selected_value, tuple) and selected_value[0] == FIND_ALL_OPTION:
+                selected_value = find_product_ids_by_code(selected_value[1])
             else:
-                try:
-                    selected_value = int(selected_value.split(" ")[0])
-                    selected_value = [selected_value]
-                except:
-                    selected_value = []
+                selected_value = [selected_value]
         else:
             selected_value = []
-    
+
     show_product_info(selected_value)
    
+def show_chart_cache_stats():
+    cache_stats = chart_cache.stats()
+    st.caption(f"Cache biểu đồ: tỉ lệ hit {cache_stats['hit_ratio']:.1%} ({cache_stats['hits']:,} hit / {cache_stats['misses']:,} miss, {cache_stats['entries']:,} ảnh, {cache_stats['bytes'] / 2**20:.1f} MB)")
+
+# Bảng số liệu hiệu năng của process: thời gian theo từng histogram và file Prometheus để tải về
+def show_metrics_panel():
+    with st.sidebar.expander("Số liệu hiệu năng"):
+        summaries = metrics.histogram_summaries()
+        if not summaries:
+            st.caption("Chưa có số liệu.")
+            return
+
+        table = pd.DataFrame([{
+            "metric": row["metric"].removeprefix("hasaki_"),
+            "labels": ", ".join(f"{name}={value}" for name, value in row["labels"].items()),
+            "count": row["count"],
+            "mean": row["mean"],
+            "p50": row["p50"],
+            "p95": row["p95"],
+        } for row in summaries])
+        st.dataframe(table, hide_index=True, use_container_width=True)
+
+        st.download_button(
+            label="Download metrics (Prometheus)",
+            data=metrics.render_prometheus(),
+            file_name="hasaki_metrics.prom",
+            mime="text/plain",
+        )
+
+def show_prediction_cache_stats():
+    prediction_cache = get_prediction_cache()
+    if prediction_cache is not None:
+        cache_stats = prediction_cache.stats()
+        st.caption(f"Cache bình luận: tỉ lệ hit {cache_stats['hit_ratio']:.1%} ({cache_stats['hits']:,} hit / {cache_stats['misses']:,} miss, {cache_stats['batch_duplicates']:,} bình luận trùng trong batch)")
+
+# Phân tích file tải lên theo từng chunk: bộ nhớ không phụ thuộc kích thước file,
+# chỉ giữ phần xem trước giới hạn số dòng và ghi kết quả ra file tạm để download.
+# Trang chỉ phân tích trực tiếp file nhỏ hơn JOB_MIN_UPLOAD_BYTES, file lớn hơn đi qua job nền
+def analyze_uploaded_file(uploaded_file):
+    progress_bar = st.progress(0.0, text="Đang phân tích dữ liệu...")
+    preview_placeholder = st.empty()
+    preview = pd.DataFrame()
+    num_feedbacks = 0
+
+    result_file = create_result_file()
+    chunks = iter_feedback_chunks(uploaded_file)
+    for result in score_feedback_chunks(chunks, result_file):
+        num_feedbacks += len(result)
+
+        if len(preview) < STREAM_PREVIEW_ROWS:
+            preview = pd.concat([preview, result.head(STREAM_PREVIEW_ROWS - len(preview))], ignore_index=True)
+            preview_placeholder.write(preview)
+
+        progress_bar.progress(read_progress(uploaded_file), text=f"Đã phân tích {num_feedbacks:,} bình luận")
+
+    progress_bar.progress(1.0, text=f"Đã phân tích {num_feedbacks:,} bình luận")
+    if num_feedbacks > STREAM_PREVIEW_ROWS:
+        st.caption(f"Hiển thị {STREAM_PREVIEW_ROWS} / {num_feedbacks:,} kết quả, download file để xem đầy đủ.")
+    show_prediction_cache_stats()
+
+    show_result_download(result_file, "sentiment_result")
+    result_file.close()
+
+# Kết quả lớn được nén trước khi gửi, xem result_download
+def show_result_download(result_file, file_name, key=None):
+    data, file_name, mime = result_download(result_file, file_name)
+    st.download_button(
+        label=f"Download kết quả (.{file_name.partition('.')[2]})",
+        data=data,
+        file_name=file_name,
+        mime=mime,
+        key=key,
+    )
+
+# File lớn được đưa vào hàng đợi job nền: trang không bị chặn trong lúc phân tích và có thể
+# xem tiến độ, tải kết quả từ session khác bằng mã job
+def submit_scoring_job(uploaded_file):
+    st.session_state.setdefault("job_owner", uuid.uuid4().hex)
+    try:
+        job = job_queue.submit(uploaded_file, uploaded_file.name, st.session_state["job_owner"], is_text=is_text_file(uploaded_file))
+    except QueueFullError as error:
+        st.error(str(error))
+        return
+    st.session_state.setdefault("job_ids", []).append(job.id)
+    st.info(f"Đã đưa file vào hàng đợi phân tích, mã job: `{job.id}`")
+
+def show_job(job):
+    st.markdown(f"**{job.name}**, mã job `{job.id}`")
+    if job.status in (QUEUED, RUNNING):
+        if job.status == QUEUED:
+            st.caption(f"Đang chờ, vị trí {job_queue.queue_position(job)} trong hàng đợi")
+        else:
+            st.progress(job.progress, text=f"Đã phân tích {job.n_feedbacks:,} bình luận")
+        if st.button("Huỷ", key=f"cancel_job_{job.id}"):
+            job_queue.cancel(job.id)
+    elif job.status == DONE:
+        st.success(f"Đã phân tích {job.n_feedbacks:,} bình luận trong {job.finished_at - job.started_at:.0f} giây")
+        st.write(job.preview)
+        with open(job.result_path, "rb") as result_file:
+            show_result_download(result_file, f"sentiment_result_{job.id}", key=f"download_job_{job.id}")
+    elif job.status == FAILED:
+        st.error(f"Phân tích lỗi: {job.error}")
+    else:
+        st.caption("Đã huỷ")
+
+def show_jobs_content(jobs):
+    for job in jobs:
+        show_job(job)
+
+# Cập nhật tiến độ mỗi JOB_POLL_SECONDS giây mà không chạy lại cả trang. Khi có job vừa xong thì chạy lại
+# cả trang một lần để job đó được hiển thị ngoài fragment: nút download đọc file kết quả, không được chạy lại mỗi lần cập nhật
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_running_jobs(job_ids):
+    jobs = [job for job in map(job_queue.get, job_ids) if job is not None]
+    if any(job.is_finished for job in jobs) or not jobs:
+        st.rerun()
+    show_jobs_content(jobs)
+
+# Các job của session này và job tra cứu theo mã (job do session khác gửi)
+def show_scoring_jobs():
+    lookup_id = st.text_input("Tra cứu job theo mã").strip()
+    job_ids = list(st.session_state.get("job_ids", []))
+    if lookup_id and lookup_id not in job_ids:
+        if job_queue.get(lookup_id) is None:
+            st.caption("Không tìm thấy job (job có thể đã hết hạn).")
+        else:
+            job_ids.append(lookup_id)
+
+    jobs = [job for job in map(job_queue.get, job_ids) if job is not None]
+    if not jobs:
+        return
+    st.markdown("##### Các job phân tích")
+    show_jobs_content([job for job in jobs if job.is_finished])
+    running_job_ids = [job.id for job in jobs if not job.is_finished]
+    if running_job_ids:
+        show_running_jobs(running_job_ids)
+
 def new_product_analysis():
     input_type = st.radio("Chọn cách nhập dữ liệu:", ("Nhập từ bàn phím", "Nhập từ file"))
 
     input_feedbacks = []
+    uploaded_file = None
 
     if input_type == "Nhập từ bàn phím":
         feedback_content = st.text_area("Nội dung bình luận", height=200)
@@ -547,6 +649,9 @@ def new_product_analysis():
         input_feedbacks = feedback_content.split('\n')
     else:
         uploaded_file = st.file_uploader("Chọn file dữ liệu mới (csv hoặc txt)", type=["csv", "txt"], accept_multiple_files=False)
+        st.caption(f"Dung lượng tối đa mỗi file: {st.get_option('server.maxUploadSize')} MB. "
+                   f"File lớn hơn {JOB_MIN_UPLOAD_BYTES / 2**20:g} MB được phân tích bằng job nền và kết quả được lưu trên đĩa. "
+                   f"Kết quả lớn hơn {STREAM_DOWNLOAD_PLAIN_MAX_SIZE / 2**20:g} MB được tải về dạng nén .csv.gz.")
 
         if uploaded_file is None:
             st.write("Ví dụ file dữ liệu csv:")
@@ -559,33 +664,46 @@ def new_product_analysis():
 
         if uploaded_file is not None:
             st.write("Nội dung dữ liệu vừa tải lên:")
-
-            if uploaded_file.type == "text/plain":
-                input_feedbacks = uploaded_file.read().decode("utf-8").splitlines()
-                for feedback in input_feedbacks:
-                    st.write(feedback)
-            else:
-                data = pd.read_csv(uploaded_file)
-                st.write(data.head())
-                input_feedbacks = data["noi_dung_binh_luan"].tolist()
+            st.write(preview_uploaded_feedbacks(uploaded_file))
     
     input_feedbacks = [feedback for feedback in input_feedbacks if feedback.strip()]
 
     if st.button("Phân tích dữ liệu"):
         st.write("Kết quả phân tích dữ liệu:")
-        result = predict_sentiment(input_feedbacks)
-        st.write(result)
 
-        st.download_button(
-            label="Download kết quả (.csv)",
-            data=result.to_csv(index=False),
-            file_name="sentiment_result.csv",
-            mime="text/csv",
-        )
-            
+        if uploaded_file is not None and uploaded_file.size > JOB_MIN_UPLOAD_BYTES:
+            submit_scoring_job(uploaded_file)
+        elif uploaded_file is not None:
+            analyze_uploaded_file(uploaded_file)
+        else:
+            result = predict_sentiment(input_feedbacks)
+            st.write(result)
+            show_prediction_cache_stats()
+
+            st.download_button(
+                label="Download kết quả (.csv)",
+                data=result.to_csv(index=False),
+                file_name="sentiment_result.csv",
+                mime="text/csv",
+            )
+
+    show_scoring_jobs()
 
 # ======= Main content =======
+# Mỗi lần rerun đọc yêu cầu profile từ query (vd. ?profile=page hoặc ?profile=page,predict) rồi dựng trang
 def main_content():
+    if not PROFILE_QUERY_ENABLED:
+        show_page()
+        return
+
+    request_profile(target for value in st.query_params.get_all("profile") for target in value.split(","))
+    try:
+        show_page()
+    finally:
+        clear_profile_requests()
+
+@profiled("page")
+def show_page():
     # Tiêu đề với màu xanh lục
     # Đặt cấu hình trang rộng hơn
     st.set_page_config(
@@ -593,6 +711,9 @@ def main_content():
         #page_icon="🌟",       # Biểu tượng hiển thị trên tab
         layout="wide",        # Chế độ hiển thị: "wide" hoặc "centered"
     )
+    start_artifact_warmup()
+    # Bình luận mới được nạp bằng hasaki_sentiment_analysis_ingestion thì cập nhật dữ liệu dùng chung
+    refresh_feedback_segments()
     
 # Hiển thị tiêu đề với màu chữ trắng và khung nền xanh lá
     # Hiển thị tiêu đề với khung nền
@@ -646,6 +767,9 @@ def main_content():
     </div>
     """, unsafe_allow_html=True) 
 
+    if ADMIN_PANEL_ENABLED:
+        show_metrics_panel()
+
     if choice == 'Mục tiêu dự án':
         business_objective_content()
     elif choice == 'Thực hiện dự án':
@@ -1,44 +1,69 @@
 import matplotlib.pyplot as plt
 import streamlit as st
-import pandas as pd
 
 from wordcloud import WordCloud
-from hasaki_sentiment_analysis_prediction import VIETNAMESE_STOPWORDS_LIST
-
-def show_overview(product_infos, product_feedbacks):
+from hasaki_sentiment_analysis_aggregates import FeedbackAggregates
+from hasaki_sentiment_analysis_charts import chart_cache
+from hasaki_sentiment_analysis_metrics import metrics
+
+CHART_SECONDS = metrics.histogram("hasaki_chart_seconds", "Thời gian hiển thị một biểu đồ (lấy từ cache hoặc vẽ lại)", ["chart"])
+ANALYZE_SECONDS = metrics.histogram("hasaki_analyze_seconds", "Thời gian một lần analyze_and_visualize")
+
+# Hiển thị một biểu đồ dưới dạng ảnh: lấy từ cache theo (tên biểu đồ, chart_key) hoặc gọi draw()
+# để vẽ figure rồi render. chart_key là None (ví dụ dữ liệu tải lên) thì luôn vẽ lại và không lưu cache.
+# draw() trả về None khi không có dữ liệu để vẽ, khi đó trả về False
+def show_chart(chart_name, chart_key, draw):
+    key = None if chart_key is None else (chart_name,) + tuple(chart_key)
+    with CHART_SECONDS.time(chart=chart_name):
+        image = chart_cache.get_or_render(key, draw)
+    if image is None:
+        return False
+
+    if chart_cache.image_format == "svg":
+        st.image(image.decode('utf-8'), use_container_width=True)
+    else:
+        st.image(image, use_container_width=True)
+    return True
+
+# Các biểu đồ đếm đọc số liệu từ feedback_summary (FeedbackAggregates.summarize) thay vì value_counts trên feedback
+def show_overview(product_infos, feedback_summary, chart_key=None):
     # === Đếm số lượng feedback và vẽ piechart ===
-    #st.write(f"Số lượng feedback: {len(product_feedbacks)}")
+    #st.write(f"Số lượng feedback: {feedback_summary['total']}")
     st.markdown(
-    f"<h4 style='font-weight: bold;'>Số lượng feedback: {len(product_feedbacks)}</h4>",
+    f"<h4 style='font-weight: bold;'>Số lượng feedback: {feedback_summary['total']}</h4>",
     unsafe_allow_html=True,
 )
 
     # === Thống kê theo số lượng so_sao từ 5 đến 1, nếu không có thì mặc định là 0 ===
-    star_counts = product_feedbacks["so_sao"].value_counts().reindex([5, 4, 3, 2, 1], fill_value=0)
+    star_counts = feedback_summary["star_counts"]
 
     # Vẽ bar chart
-    fig, ax = plt.subplots(figsize=(10, 6))
-    star_counts.plot(kind='bar', ax=ax, color='blue')
-    ax.set_xlabel('Số sao')
-    ax.set_ylabel('Số lượng')
-    ax.set_title('Số lượng feedback theo số sao')
-    ax.grid(True)
+    def draw_star_counts():
+        fig, ax = plt.subplots(figsize=(10, 6))
+        star_counts.plot(kind='bar', ax=ax, color='blue')
+        ax.set_xlabel('Số sao')
+        ax.set_ylabel('Số lượng')
+        ax.set_title('Số lượng feedback theo số sao')
+        ax.grid(True)
+        return fig
 
     # Hiển thị bar chart bằng streamlit
-    st.pyplot(fig)
+    show_chart("star_counts", chart_key, draw_star_counts)
     
     # === Vẽ piechart thể hiện phân phối sentiment_label ===
     # Đếm số lượng feedback theo cột sentiment_label
-    feedback_counts = product_feedbacks["sentiment_label"].value_counts()
+    feedback_counts = feedback_summary["sentiment_counts"]
 
     # Vẽ piechart
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.pie(feedback_counts, labels=feedback_counts.index, autopct='%1.1f%%', startangle=90)
-    ax.axis('equal')
-    ax.legend()
+    def draw_sentiment_counts():
+        fig, ax = plt.subplots(figsize=(10, 6))
+        ax.pie(feedback_counts, labels=feedback_counts.index, autopct='%1.1f%%', startangle=90)
+        ax.axis('equal')
+        ax.legend()
+        return fig
 
     # Hiển thị piechart bằng streamlit
-    st.pyplot(fig)
+    show_chart("sentiment_counts", chart_key, draw_sentiment_counts)
 
     # === Vẽ piechart cho các topics theo từng sentiment_label ===
     for label in ["positive", "negative"]:
@@ -47,128 +72,113 @@ def show_overview(product_infos, product_feedbacks):
     f"<h4 style='font-weight: bold;'>Phân phối topics cho sentiment: {label}</h4>",
     unsafe_allow_html=True,
 )
-        # Lọc các feedback theo sentiment_label hiện tại
-        feedbacks = product_feedbacks[product_feedbacks["sentiment_label"] == label]
+        # Số lượng feedback theo cột topic của sentiment_label hiện tại
+        topic_counts = feedback_summary["topic_counts"].get(label)
 
-        if len(feedbacks) == 0:
+        if topic_counts is None or len(topic_counts) == 0:
             #st.write(f"Không có feedback cho sentiment: {label}")
             st.markdown(
     f"<h4> => Không có feedback cho sentiment {label}</h4>",
     unsafe_allow_html=True,
 )
             continue
-        
-        # Đếm số lượng feedback theo cột topic
-        topic_counts = feedbacks["topics"].value_counts()
 
         # Thay thế "No label" bằng "others"
         topic_counts.index = topic_counts.index.str.replace("No label", "others")
         
         # Vẽ piechart
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.pie(topic_counts, labels=None, autopct='%1.1f%%', startangle=90)
-        ax.axis('equal')
-        ax.legend(topic_counts.index, title="Topics", loc="lower left", bbox_to_anchor=(1, 0, 0.5, 1))
-        
+        def draw_topic_counts(topic_counts=topic_counts):
+            fig, ax = plt.subplots(figsize=(10, 6))
+            ax.pie(topic_counts, labels=None, autopct='%1.1f%%', startangle=90)
+            ax.axis('equal')
+            ax.legend(topic_counts.index, title="Topics", loc="lower left", bbox_to_anchor=(1, 0, 0.5, 1))
+            return fig
+
         # Hiển thị piechart bằng streamlit
-        st.pyplot(fig)
+        show_chart(f"topic_counts_{label}", chart_key, draw_topic_counts)
 
-def show_feedback_count(product_infos, product_feedbacks):
+def show_feedback_count(product_infos, feedback_summary, chart_key=None):
     # --- Vẽ biểu đồ thể hiện số lượng feedback theo tháng ---
-    # Chuyển cột ngay_binh_luan sang kiểu datetime
-    product_feedbacks['ngay_binh_luan'] = pd.to_datetime(product_feedbacks['ngay_binh_luan'], format='%d/%m/%Y')
-
-    # Thêm cột month_year để lưu trữ tháng và năm của ngay_binh_luan
-    product_feedbacks['month_year'] = product_feedbacks['ngay_binh_luan'].dt.to_period('M')
-
-    # Đếm số lượng feedback theo từng tháng
-    monthly_feedback_counts = product_feedbacks['month_year'].value_counts().sort_index()
-
-    # Tạo một khoảng thời gian từ tháng đầu tiên đến tháng cuối cùng
-    all_months = pd.period_range(start=monthly_feedback_counts.index.min(), end=monthly_feedback_counts.index.max(), freq='M')
-
-    # Đảm bảo tất cả các tháng đều có dữ liệu, nếu không thì mặc định là 0
-    monthly_feedback_counts = monthly_feedback_counts.reindex(all_months, fill_value=0)
+    # Số lượng feedback từ tháng đầu tiên đến tháng cuối cùng, tháng không có feedback là 0
+    monthly_feedback_counts = feedback_summary["monthly_counts"]
 
     # Vẽ biểu đồ số lượng feedback theo từng tháng bằng linechart màu đỏ
-    fig, ax = plt.subplots(figsize=(10, 6))
-    monthly_feedback_counts.plot(kind='bar', ax=ax, color='red')
-    ax.set_xlabel('Tháng')
-    ax.set_ylabel('Số lượng feedback')
-    ax.set_title('Số lượng feedback theo từng tháng')
-    ax.grid(True)
+    def draw_monthly_counts():
+        fig, ax = plt.subplots(figsize=(10, 6))
+        monthly_feedback_counts.plot(kind='bar', ax=ax, color='red')
+        ax.set_xlabel('Tháng')
+        ax.set_ylabel('Số lượng feedback')
+        ax.set_title('Số lượng feedback theo từng tháng')
+        ax.grid(True)
+        return fig
 
     # Hiển thị biểu đồ bằng streamlit
-    st.pyplot(fig)
+    show_chart("monthly_counts", chart_key, draw_monthly_counts)
 
     # --- Vẽ biểu đồ thể hiện số lượng feedback theo giờ ---
-    # Chuyển cột gio_binh_luan sang kiểu datetime
-    product_feedbacks['gio_binh_luan'] = product_feedbacks['gio_binh_luan'].str.replace(' ', '')
-    product_feedbacks['gio_binh_luan'] = pd.to_datetime(product_feedbacks['gio_binh_luan'], format='%H:%M').dt.hour
-
-    # Đếm số lượng feedback theo từng giờ
-    hourly_feedback_counts = product_feedbacks['gio_binh_luan'].value_counts().sort_index()
-
-    # Đảm bảo tất cả các giờ đều có dữ liệu, nếu không thì mặc định là 0
+    # Số lượng feedback theo từng giờ từ 0 đến 23, giờ không có feedback là 0
+    hourly_feedback_counts = feedback_summary["hourly_counts"]
     all_hours = range(24)
-    hourly_feedback_counts = hourly_feedback_counts.reindex(all_hours, fill_value=0)
 
     # Vẽ biểu đồ số lượng feedback theo từng giờ bằng bar chart màu xanh lá cây
-    fig, ax = plt.subplots(figsize=(10, 6))
-    hourly_feedback_counts.plot(kind='bar', ax=ax, color='green')
-    ax.set_xlabel('Giờ')
-    ax.set_ylabel('Số lượng feedback')
-    ax.set_title('Số lượng feedback theo từng giờ')
-    ax.set_xticks(all_hours)
-    ax.set_xticklabels([f'{hour}:00' for hour in all_hours])
-    ax.grid(True)
+    def draw_hourly_counts():
+        fig, ax = plt.subplots(figsize=(10, 6))
+        hourly_feedback_counts.plot(kind='bar', ax=ax, color='green')
+        ax.set_xlabel('Giờ')
+        ax.set_ylabel('Số lượng feedback')
+        ax.set_title('Số lượng feedback theo từng giờ')
+        ax.set_xticks(all_hours)
+        ax.set_xticklabels([f'{hour}:00' for hour in all_hours])
+        ax.grid(True)
+        return fig
 
     # Hiển thị biểu đồ bằng streamlit
-    st.pyplot(fig)
+    show_chart("hourly_counts", chart_key, draw_hourly_counts)
 
-def show_word_cloud(product_infos, product_feedbacks):
+def show_word_cloud(product_infos, feedback_summary, chart_key=None):
     # --- Vẽ word cloud cho từng nhãn sentiment ---
     for label in ["positive", "negative"]:
-        try:
-            #st.write(f"Word Cloud cho nhãn sentiment: {label}")
-            st.markdown(
+        #st.write(f"Word Cloud cho nhãn sentiment: {label}")
+        st.markdown(
     f"<h4 style='font-weight: bold;'>Word Cloud cho nhãn sentiment: {label}</h4>",
     unsafe_allow_html=True,
 )
-            
-            # Lấy tất cả các feedback cho nhãn sentiment hiện tại
-            feedbacks = ' '.join(product_feedbacks[product_feedbacks['sentiment_label'] == label]['normalized_text_with_boost_words'].values)
-            
+
+        # Tần suất từ đã bỏ stopwords được cộng từ bảng đếm theo sản phẩm, chỉ tính khi phải vẽ lại
+        def draw_word_cloud(label=label):
+            frequencies = feedback_summary["word_frequencies"](label)
+            if not frequencies:
+                return None
+
             # Tạo word cloud
-            wordcloud = WordCloud(width=800, 
-                                height=400, 
-                                background_color='white').generate(feedbacks)
-            
-            # Lấy danh sách từ và trọng số
-            words = wordcloud.words_
-
-            # Xóa các từ không mong muốn
-            filtered_words = {word: weight for word, weight in words.items() if word not in VIETNAMESE_STOPWORDS_LIST}
-
-            # Tạo lại WordCloud sau khi xóa từ
-            wordcloud_filtered = WordCloud(
+            wordcloud = WordCloud(
                 width=800,
                 height=400,
                 background_color='white'
-            ).generate_from_frequencies(filtered_words)
+            ).generate_from_frequencies(frequencies)
 
             # Vẽ word cloud
             fig, ax = plt.subplots(figsize=(10, 6))
-            ax.imshow(wordcloud_filtered, interpolation='bilinear')
+            ax.imshow(wordcloud, interpolation='bilinear')
             ax.axis('off')
-            
-            # Hiển thị word cloud bằng streamlit
-            st.pyplot(fig)
-        except:
-            continue
+            return fig
+
+        # Hiển thị word cloud bằng streamlit
+        if not show_chart(f"word_cloud_{label}", chart_key, draw_word_cloud):
+            st.markdown(
+    f"<h4> => Không có feedback cho sentiment {label}</h4>",
+    unsafe_allow_html=True,
+)
+
+# feedback_summary có thể tính sẵn từ bảng tổng hợp của toàn bộ dữ liệu; nếu không truyền
+# (ví dụ file người dùng tải lên) thì tổng hợp trực tiếp từ product_feedbacks.
+# chart_key (make_chart_key) xác định nhóm sản phẩm và version dữ liệu để cache ảnh biểu đồ
+@ANALYZE_SECONDS.timed()
+def analyze_and_visualize(product_infos, product_feedbacks, feedback_summary=None, chart_key=None):
+    if feedback_summary is None:
+        feedback_summary = FeedbackAggregates(product_feedbacks).summarize()
 
-def analyze_and_visualize(product_infos, product_feedbacks):
-    if len(product_feedbacks) == 0:
+    if feedback_summary["total"] == 0:
         #st.write("Không có dữ liệu feedback để phân tích")
         st.markdown(
     f"<h4>Không có dữ liệu feedback để phân tích</h4>",
@@ -176,6 +186,6 @@ def analyze_and_visualize(product_infos, product_feedbacks):
 )
         return
 
-    show_overview(product_infos, product_feedbacks)
-    show_feedback_count(product_infos, product_feedbacks)
-    show_word_cloud(product_infos, product_feedbacks)
\ No newline at end of file
+    show_overview(product_infos, feedback_summary, chart_key)
+    show_feedback_count(product_infos, feedback_summary, chart_key)
+    show_word_cloud(product_infos, feedback_summary, chart_key)
\ No newline at end of file
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from hasaki_sentiment_analysis_data import FEEDBACKS_FILE
+from hasaki_sentiment_analysis_normalization import normalize_texts
+from hasaki_sentiment_analysis_prediction import normalize_text_manually
+
+# Các trường hợp đặc biệt: chuỗi rỗng, chỉ có số, emoji, teencode, tiếng Anh và chuỗi dấu câu liên tiếp
+EDGE_CASES = [
+    "",
+    " ",
+    "   \t\n ",
+    "123",
+    "100000 2024 09:28",
+    "😍",
+    "😍😍😍 thích lắm 👍",
+    "ctrai mih bme cta",
+    "sp ok lắm, ctrai mih rất thik 😍",
+    "good comment, wedding gift",
+    "!!!",
+    "...???!!!",
+    "hay quá!!!...   ,,, ;;; đẹp",
+    "Khử mùi 10 điểm!!! Xài 1 lần/tuần :))",
+    "THÂM NÁCH NHẸ nha mn",
+]
+
+def assert_same_as_manual(texts):
+    expected = [normalize_text_manually(text) for text in texts]
+    assert normalize_texts(texts) == expected
+
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_edge_case_matches_manual(text):
+    assert_same_as_manual([text])
+
+def test_edge_cases_as_one_batch():
+    assert_same_as_manual(EDGE_CASES)
+
+def test_real_comments_match_manual():
+    comments = pd.read_csv(FEEDBACKS_FILE, usecols=['noi_dung_binh_luan'])['noi_dung_binh_luan'].dropna().astype(str).tolist()
+    assert_same_as_manual(comments)